@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from typing import Dict, List
 from app.services.twitter_service import twitter_service
-from app.core.database import get_database
+from app.services.hashtag_index import hashtag_index
+from app.services.metrics_collector import tweet_metrics_collector
+from app.core.config import settings
+from app.core.database import get_database, id_variants
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -78,7 +81,7 @@ async def get_post_analytics(post_id: str):
         db = get_database()
         
         # Gönderiyi al
-        post = await db.social_media_posts.find_one({"_id": post_id})
+        post = await db.social_media_posts.find_one({"_id": {"$in": id_variants([post_id])}})
         if not post:
             raise HTTPException(status_code=404, detail="Gönderi bulunamadı")
         
@@ -89,19 +92,31 @@ async def get_post_analytics(post_id: str):
                 "message": "Gönderi henüz yayınlanmamış"
             }
         
-        # Platform'a göre analitik al
+        # Veritabanından kaydedilmiş analitikleri al; toplayıcı gönderinin _id'sini olduğu gibi yazar
+        saved_analytics = await db.analytics.find(
+            {"post_id": {"$in": id_variants([post["_id"]])}}, {"_id": 0, "post_id": 0}
+        ).sort("collected_at", -1).to_list(30)  # Son 30 kayıt
+        
+        # Güncel metrikler arka plandaki toplayıcıdan gelir; sayfa görüntülemesi API çağrısı yapmaz
         analytics_data = {}
         
-        if post["platform"] == "twitter" and post.get("post_id"):
+        if post.get("last_metrics"):
+            analytics_data = {
+                "tweet_id": post.get("post_id"),
+                **post["last_metrics"],
+                "collected_at": post.get("metrics_collected_at")
+            }
+        elif saved_analytics:
+            analytics_data = {
+                "tweet_id": post.get("post_id"),
+                **(saved_analytics[0].get("metrics") or {}),
+                "collected_at": saved_analytics[0].get("collected_at")
+            }
+        elif post["platform"] == "twitter" and post.get("post_id") and not settings.METRICS_COLLECTOR_ENABLED:
             twitter_analytics = await twitter_service.get_tweet_analytics(post["post_id"])
             if twitter_analytics:
                 analytics_data = twitter_analytics
         
-        # Veritabanından kaydedilmiş analitikleri al
-        saved_analytics = await db.analytics.find(
-            {"post_id": post_id}
-        ).sort("collected_at", -1).to_list(30)  # Son 30 kayıt
-        
         return {
             "post_id": post_id,
             "platform": post["platform"],
@@ -126,27 +141,45 @@ async def get_post_analytics(post_id: str):
 async def get_trending_hashtags():
     """Trend hashtag'leri ve öneriler"""
     try:
-        # Gerçek implementasyonda Twitter API'den trend verisi alınır
+        # Yayınlanan gönderilerin performansına göre sıralanmış hashtag'ler
+        ranked = hashtag_index.top(k=10)
+        top_score = ranked[0]["score"] if ranked else 0
         trending_hashtags = [
-            {"hashtag": "#BlackFriday", "tweet_count": 1500000, "trend_score": 95},
-            {"hashtag": "#İndirim", "tweet_count": 45000, "trend_score": 78},
-            {"hashtag": "#Amazon", "tweet_count": 890000, "trend_score": 85},
-            {"hashtag": "#AlışverişFırsatı", "tweet_count": 12000, "trend_score": 65},
-            {"hashtag": "#TeknolojiHaber", "tweet_count": 23000, "trend_score": 72}
+            {
+                **item,
+                "tweet_count": item["posts"],
+                "trend_score": round(item["score"] / top_score * 100) if top_score else 0
+            }
+            for item in ranked
         ]
-        
-        # Kategori bazlı öneriler
         category_suggestions = {
+            category: [item["hashtag"] for item in hashtag_index.top(category, k=4)]
+            for category in hashtag_index.categories()
+        }
+
+        # Henüz yeterli analitik yoksa varsayılan öneriler
+        if not trending_hashtags:
+            trending_hashtags = [
+                {"hashtag": "#BlackFriday", "tweet_count": 1500000, "trend_score": 95},
+                {"hashtag": "#İndirim", "tweet_count": 45000, "trend_score": 78},
+                {"hashtag": "#Amazon", "tweet_count": 890000, "trend_score": 85},
+                {"hashtag": "#AlışverişFırsatı", "tweet_count": 12000, "trend_score": 65},
+                {"hashtag": "#TeknolojiHaber", "tweet_count": 23000, "trend_score": 72}
+            ]
+        default_suggestions = {
             "Elektronik": ["#teknoloji", "#gadget", "#elektronik", "#innovation"],
             "Giyim": ["#moda", "#stil", "#trend", "#fashion"],
             "Ev & Yaşam": ["#ev", "#dekorasyon", "#yaşam", "#home"],
             "Kitap": ["#kitap", "#okuma", "#edebiyat", "#book"]
         }
+        for category, hashtags in default_suggestions.items():
+            category_suggestions.setdefault(category, hashtags)
         
         return {
             "trending_hashtags": trending_hashtags,
             "category_suggestions": category_suggestions,
             "updated_at": datetime.utcnow().isoformat(),
+            "index": hashtag_index.stats_summary(),
             "location": "Turkey"
         }
         
@@ -196,4 +229,9 @@ async def get_performance_comparison():
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Performans karşılaştırması alınamadı: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Performans karşılaştırması alınamadı: {str(e)}")
+
+@router.get("/collector/stats")
+async def get_metrics_collector_stats():
+    """Tweet metrik toplayıcısının istek ve anlık görüntü sayıları"""
+    return tweet_metrics_collector.stats()
@@ -1,10 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 from app.services.ai_service import ai_content_service
-from app.services.twitter_service import twitter_service
+from app.services.content_cache import generated_content_cache
+from app.services.generation_jobs import generation_job_runner
+from app.services.duplicate_index import duplicate_index
+from app.services.media_pipeline import media_pipeline
+from app.services.publish_queue import publish_queue
+from app.services.post_scheduler import post_scheduler
 from app.models.models import SocialMediaPost
-from app.core.database import get_database
+from app.core.database import get_database, id_variants
+import asyncio
+import json
 
 router = APIRouter()
 
@@ -13,6 +23,20 @@ class PostCreateRequest(BaseModel):
     platform: str = "twitter"
     custom_content: Optional[str] = None
     generate_ai: bool = True
+    force_refresh: bool = False  # Cache'i atlayıp yeniden üret
+
+class ProductFilter(BaseModel):
+    category: Optional[str] = None
+    brand: Optional[str] = None
+    asins: Optional[List[str]] = None
+
+class GenerationJobRequest(BaseModel):
+    product_filter: ProductFilter = ProductFilter()
+    platforms: List[str] = Field(default_factory=lambda: ["twitter"], min_length=1)
+    style: str = "engaging"
+
+class ScheduleRequest(BaseModel):
+    due_at: datetime  # saat dilimi verilmezse UTC kabul edilir
 
 class PostResponse(BaseModel):
     id: str
@@ -20,6 +44,8 @@ class PostResponse(BaseModel):
     platform: str
     ai_generated: bool
     posted: bool
+    due_at: Optional[datetime] = None
+    schedule_status: Optional[str] = None
 
 @router.post("/generate")
 async def generate_post(request: PostCreateRequest):
@@ -34,25 +60,54 @@ async def generate_post(request: PostCreateRequest):
             raise HTTPException(status_code=404, detail="Ürün bulunamadı")
 
         # AI içerik oluştur veya custom content kullan
+        user_id = "user_id_example"  # Gerçek implementasyonda current user
+        usage = None
         if request.generate_ai:
-            content = await ai_content_service.generate_social_media_post(
-                product, request.platform
+            generated = await ai_content_service.generate_post_result(
+                product, request.platform, force_refresh=request.force_refresh, user_id=user_id
             )
+            if generated.get("duplicate_of"):
+                raise HTTPException(status_code=409, detail={
+                    "message": "Üretilen içerik mevcut bir gönderiyle neredeyse aynı",
+                    "duplicate_of": generated["duplicate_of"]
+                })
+            if generated.get("existing_post"):
+                # Bu ürün için aynı içerik zaten kaydedilmiş; ikinci kopya eklenmez
+                existing = await db.social_media_posts.find_one(
+                    {"_id": {"$in": id_variants([generated["existing_post"]["post_id"]])}}
+                )
+                if existing:
+                    return {
+                        "id": str(existing["_id"]),
+                        "content": existing["content"],
+                        "platform": existing["platform"],
+                        "ai_generated": existing.get("ai_generated", True),
+                        "posted": existing.get("posted", False),
+                        "existing": True
+                    }
+                raise HTTPException(status_code=409, detail={
+                    "message": "Üretilen içerik mevcut bir gönderiyle neredeyse aynı",
+                    "duplicate_of": generated["existing_post"]
+                })
+            content = generated["content"]
+            usage = generated["usage"]
         else:
             content = request.custom_content or "Varsayılan içerik"
 
         # Gönderiyi veritabanına kaydet
         post_data = {
-            "user_id": "user_id_example",  # Gerçek implementasyonda current user
+            "user_id": user_id,
             "product_id": request.product_id,
             "platform": request.platform,
             "content": content,
             "ai_generated": request.generate_ai,
-            "posted": False
+            "posted": False,
+            "token_usage": usage
         }
 
         result = await db.social_media_posts.insert_one(post_data)
         post_data["_id"] = str(result.inserted_id)
+        duplicate_index.add(user_id, result.inserted_id, content)
 
         return {
             "id": str(result.inserted_id),
@@ -62,55 +117,169 @@ async def generate_post(request: PostCreateRequest):
             "posted": False
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gönderi oluşturulamadı: {str(e)}")
 
-@router.post("/{post_id}/publish")
+@router.post("/generate/stream")
+async def generate_post_stream(request: PostCreateRequest):
+    """AI gönderisini token'lar geldikçe Server-Sent Events ile akıt ve sonunda kaydet"""
+    db = get_database()
+    
+    # Gerçek implementasyonda ObjectId conversion gerekir
+    product = await db.products.find_one({"_id": request.product_id})
+    if not product:
+        raise HTTPException(status_code=404, detail="Ürün bulunamadı")
+
+    async def events():
+        parts = []
+        try:
+            async for delta in ai_content_service.stream_social_media_post(product, request.platform):
+                parts.append(delta)
+                yield f"event: token\ndata: {json.dumps({'text': delta}, ensure_ascii=False)}\n\n"
+
+            content = "".join(parts).strip()
+            user_id = "user_id_example"  # Gerçek implementasyonda current user
+            # Akış sırasında yeniden üretim yapılamaz; kopya içerik kaydedilmez
+            duplicate = duplicate_index.find(user_id, content)
+            if duplicate:
+                error = {"detail": "Üretilen içerik mevcut bir gönderiyle neredeyse aynı", "status": 409, "duplicate_of": duplicate}
+                yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+                return
+            post_data = {
+                "user_id": user_id,
+                "product_id": request.product_id,
+                "platform": request.platform,
+                "content": content,
+                "ai_generated": True,
+                "posted": False
+            }
+            result = await db.social_media_posts.insert_one(post_data)
+            duplicate_index.add(user_id, result.inserted_id, content)
+            done = {
+                "id": str(result.inserted_id),
+                "content": content,
+                "platform": request.platform,
+                "ai_generated": True,
+                "posted": False
+            }
+            yield f"event: done\ndata: {json.dumps(done, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Gönderi oluşturulamadı: {str(e)}'}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def serialize_publish_job(job: Dict) -> Dict:
+    job["id"] = str(job.pop("_id"))
+    job["post_id"] = str(job["post_id"])
+    job.pop("active", None)
+    return jsonable_encoder(job)
+
+@router.post("/{post_id}/publish", status_code=202)
 async def publish_post(post_id: str):
-    """Gönderiyi sosyal medyada yayınla"""
+    """Gönderiyi yayın kuyruğuna ekle; yayın arka planda işçiler tarafından yapılır"""
     try:
         db = get_database()
         
         # Gönderiyi al
-        post = await db.social_media_posts.find_one({"_id": post_id})
+        post = await db.social_media_posts.find_one({"_id": {"$in": id_variants([post_id])}})
         if not post:
             raise HTTPException(status_code=404, detail="Gönderi bulunamadı")
 
         if post["posted"]:
             raise HTTPException(status_code=400, detail="Gönderi zaten yayınlanmış")
 
-        # Platform'a göre yayınla
-        if post["platform"] == "twitter":
-            result = await twitter_service.post_tweet(post["content"])
-            
-            if result["success"]:
-                # Gönderiyi güncelle
-                await db.social_media_posts.update_one(
-                    {"_id": post_id},
-                    {
-                        "$set": {
-                            "posted": True,
-                            "post_id": result["tweet_id"],
-                            "posted_at": "2024-01-01T00:00:00Z"  # Gerçek timestamp
-                        }
-                    }
-                )
-                
-                return {
-                    "success": True,
-                    "platform": "twitter",
-                    "post_url": result["tweet_url"],
-                    "message": "Tweet başarıyla yayınlandı"
-                }
-            else:
-                raise HTTPException(status_code=500, detail=f"Tweet yayınlanamadı: {result.get('error', 'Bilinmeyen hata')}")
-        
-        else:
+        if post["platform"] != "twitter":
             raise HTTPException(status_code=400, detail=f"Platform '{post['platform']}' henüz desteklenmiyor")
 
+        job = await publish_queue.submit(post)
+        return {
+            "success": True,
+            "job_id": str(job["_id"]),
+            "status": job["status"],
+            "message": "Gönderi yayın kuyruğuna eklendi"
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Yayınlama hatası: {str(e)}")
 
+@router.post("/{post_id}/schedule")
+async def schedule_post(post_id: str, request: ScheduleRequest):
+    """Gönderiyi ileri bir zamanda yayınlanmak üzere zamanla veya zamanını değiştir"""
+    try:
+        db = get_database()
+        
+        post = await db.social_media_posts.find_one({"_id": {"$in": id_variants([post_id])}}, {"posted": 1, "platform": 1})
+        if not post:
+            raise HTTPException(status_code=404, detail="Gönderi bulunamadı")
+
+        if post["posted"]:
+            raise HTTPException(status_code=400, detail="Gönderi zaten yayınlanmış")
+
+        if post["platform"] != "twitter":
+            raise HTTPException(status_code=400, detail=f"Platform '{post['platform']}' henüz desteklenmiyor")
+
+        due_at = request.due_at
+        if due_at.tzinfo is not None:
+            due_at = due_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if due_at < datetime.utcnow() - timedelta(minutes=1):
+            raise HTTPException(status_code=400, detail="Zamanlama geçmişte olamaz")
+
+        if not await post_scheduler.schedule(post_id, due_at):
+            raise HTTPException(status_code=400, detail="Gönderi zamanlanamadı")
+        return {
+            "success": True,
+            "post_id": post_id,
+            "due_at": due_at.isoformat(),
+            "schedule_status": "scheduled",
+            "message": "Gönderi zamanlandı"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Zamanlama hatası: {str(e)}")
+
+@router.delete("/{post_id}/schedule")
+async def cancel_scheduled_post(post_id: str):
+    """Henüz yayın kuyruğuna aktarılmamış zamanlamayı iptal et"""
+    if not await post_scheduler.cancel(post_id):
+        raise HTTPException(status_code=404, detail="Bekleyen zamanlama bulunamadı")
+    return {"message": "Zamanlama iptal edildi"}
+
+@router.get("/schedule/stats")
+async def get_scheduler_stats():
+    """Bu süreçteki zamanlayıcının bekleyen ve ateşlenen gönderileri"""
+    return post_scheduler.stats()
+
+@router.get("/{post_id}/publish")
+async def get_post_publish_status(post_id: str):
+    """Gönderinin en son yayın işinin durumu"""
+    job = await publish_queue.latest_for_post(post_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Yayın işi bulunamadı")
+    return serialize_publish_job(job)
+
+@router.get("/publish/jobs/{job_id}")
+async def get_publish_job(job_id: str):
+    """Yayın işinin durumu, deneme sayısı ve sonucu"""
+    job = await publish_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Yayın işi bulunamadı")
+    return serialize_publish_job(job)
+
+@router.get("/publish/stats")
+async def get_publish_queue_stats():
+    """Duruma göre yayın işi sayıları ve rate limit'e takılmış hesaplar"""
+    return await publish_queue.stats()
+
 @router.get("/", response_model=List[PostResponse])
 async def get_posts(skip: int = 0, limit: int = 10):
     """Kullanıcının gönderilerini listele"""
@@ -128,7 +297,9 @@ async def get_posts(skip: int = 0, limit: int = 10):
                 "content": post["content"],
                 "platform": post["platform"],
                 "ai_generated": post["ai_generated"],
-                "posted": post["posted"]
+                "posted": post["posted"],
+                "due_at": post.get("due_at"),
+                "schedule_status": post.get("schedule_status")
             })
         
         return result
@@ -149,7 +320,7 @@ async def get_post_variations(product_id: str, platform: str = "twitter", count:
 
         # AI ile varyasyonlar oluştur
         variations = await ai_content_service.generate_multiple_variations(
-            product, platform, count
+            product, platform, count, user_id="user_id_example"  # Gerçek implementasyonda current user
         )
 
         return {
@@ -161,6 +332,76 @@ async def get_post_variations(product_id: str, platform: str = "twitter", count:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Varyasyonlar oluşturulamadı: {str(e)}")
 
+@router.get("/cache/stats")
+async def get_content_cache_stats():
+    """Üretilen içerik cache'inin isabet oranı ve kazanılan token sayısı"""
+    return generated_content_cache.stats()
+
+@router.get("/usage/stats")
+async def get_token_usage_stats():
+    """Platform bazında model çağrısı başına prompt ve completion token sayıları"""
+    return ai_content_service.usage_stats()
+
+@router.get("/circuit/stats")
+async def get_circuit_stats():
+    """AI sağlayıcısı devre kesicisinin durumu; açıkken gönderiler yerel şablonlardan üretilir"""
+    return ai_content_service.breaker.stats()
+
+@router.get("/duplicates/stats")
+async def get_duplicate_index_stats():
+    """Yakın-kopya gönderi indeksinin durumu"""
+    return duplicate_index.stats()
+
+@router.get("/media/stats")
+async def get_media_pipeline_stats():
+    """Medya cache'i, indirme/dönüştürme sayıları ve media_id yeniden kullanımı"""
+    return media_pipeline.stats()
+
+def serialize_job(job: Dict) -> Dict:
+    job["id"] = str(job.pop("_id"))
+    job["user_id"] = str(job["user_id"])
+    return jsonable_encoder(job)
+
+@router.post("/jobs")
+async def create_generation_job(request: GenerationJobRequest):
+    """Ürün filtresi ve platformlar için toplu gönderi üretim işi başlat"""
+    try:
+        job = await generation_job_runner.submit(
+            "user_id_example",  # Gerçek implementasyonda current user
+            request.product_filter.model_dump(exclude_none=True),
+            request.platforms,
+            request.style
+        )
+        return serialize_job(job)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Üretim işi oluşturulamadı: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+async def get_generation_job(job_id: str):
+    """Toplu üretim işinin ilerlemesi"""
+    job = await generation_job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Üretim işi bulunamadı")
+    return serialize_job(job)
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_generation_job(job_id: str):
+    """Toplu üretim işinin ilerlemesini Server-Sent Events olarak akıt"""
+    job = await generation_job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Üretim işi bulunamadı")
+
+    async def events():
+        current = job
+        while True:
+            yield f"event: progress\ndata: {json.dumps(serialize_job(current))}\n\n"
+            if current["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(1)
+            current = await generation_job_runner.get(job_id)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.delete("/{post_id}")
 async def delete_post(post_id: str):
     """Gönderiyi sil"""
@@ -171,6 +412,7 @@ async def delete_post(post_id: str):
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Gönderi bulunamadı")
+        duplicate_index.remove("user_id_example", post_id)  # Gerçek implementasyonda current user
         
         return {"message": "Gönderi başarıyla silindi"}
 
@@ -1,26 +1,121 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional
 from app.services.amazon_service import amazon_service
+from app.services.sync_scheduler import catalog_sync_scheduler, SyncAlreadyRunning
+from app.services.product_cache import product_detail_cache
+from app.services.search_index import product_search_service
+from app.services.price_history import price_history_service
+from app.core.config import settings
 from app.models.models import Product
 from app.core.database import get_database
+import base64
+import json
+import time
 
 router = APIRouter()
 
-@router.get("/", response_model=List[dict])
-async def get_products(skip: int = 0, limit: int = 10):
-    """Kullanıcının Amazon ürünlerini listele"""
+MAX_BATCH_ASINS = 200
+
+# Listeleme yanıtında dönen alanlar
+LIST_PROJECTION = {
+    "asin": 1, "title": 1, "description": 1, "price": 1, "currency": 1,
+    "image_urls": 1, "category": 1, "brand": 1, "last_updated": 1
+}
+
+def encode_cursor(asin: str) -> str:
+    """Son ASIN'i opak bir sayfa imlecine dönüştür"""
+    return base64.urlsafe_b64encode(json.dumps({"a": asin}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    padded = cursor + "=" * (-len(cursor) % 4)
     try:
-        # Gerçek implementasyonda user_id gerekir
-        products = await amazon_service.get_products("seller_id_example")
-        return products[skip:skip + limit]
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))["a"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+
+@router.get("/")
+async def get_products(
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    asins: Optional[str] = None
+):
+    """Kullanıcının ürünlerini listele veya virgülle ayrılmış ASIN'leri toplu getir"""
+    try:
+        if asins:
+            requested = [a for a in asins.split(",") if a.strip()]
+            if len(requested) > MAX_BATCH_ASINS:
+                raise HTTPException(status_code=400, detail=f"En fazla {MAX_BATCH_ASINS} ASIN sorgulanabilir")
+            details = await product_detail_cache.get_many(requested)
+            return {"items": [product for product in details.values() if product], "next_cursor": None}
+
+        db = get_database()
+        
+        # Gerçek implementasyonda current user
+        query = {"user_id": "user_id_example"}
+        if category:
+            query["category"] = category
+        if brand:
+            query["brand"] = brand
+        if cursor:
+            query["asin"] = {"$gt": decode_cursor(cursor)}
+        
+        # (user_id[, category|brand], asin) indeksleri üzerinde keyset sayfalama
+        docs = await db.products.find(query, LIST_PROJECTION).sort("asin", 1).limit(limit + 1).to_list(limit + 1)
+        
+        items = []
+        for doc in docs[:limit]:
+            doc["id"] = str(doc.pop("_id"))
+            items.append(doc)
+        
+        next_cursor = encode_cursor(items[-1]["asin"]) if len(docs) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ürünler alınamadı: {str(e)}")
 
+@router.get("/search")
+async def search_products(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100)):
+    """Başlık, açıklama, marka ve kategoride Türkçe duyarlı ürün araması"""
+    try:
+        started = time.perf_counter()
+        
+        # Gerçek implementasyonda current user
+        items = await product_search_service.search("user_id_example", q, limit)
+        
+        return {
+            "query": q,
+            "items": items,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Arama yapılamadı: {str(e)}")
+
+@router.get("/deals")
+async def get_deals(
+    threshold: float = Query(settings.DEAL_DROP_THRESHOLD, gt=0, lt=1),
+    window_days: int = Query(settings.DEAL_WINDOW_DAYS, ge=1, le=365),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Fiyatı son pencere içindeki zirvesine göre eşik kadar düşen ürünler"""
+    try:
+        # Gerçek implementasyonda current user
+        return await price_history_service.scan_deals("user_id_example", threshold, window_days, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"İndirimler taranamadı: {str(e)}")
+
+@router.get("/cache/stats")
+async def get_product_cache_stats():
+    """Ürün detay cache'inin isabet/ıska sayaçları"""
+    return product_detail_cache.stats()
+
 @router.get("/{asin}")
 async def get_product_detail(asin: str):
     """Belirli bir ASIN için ürün detayı"""
     try:
-        product = await amazon_service.get_product_details(asin)
+        product = await product_detail_cache.get(asin)
         if not product:
             raise HTTPException(status_code=404, detail="Ürün bulunamadı")
         return product
@@ -28,31 +123,47 @@ async def get_product_detail(asin: str):
         raise HTTPException(status_code=500, detail=f"Ürün detayı alınamadı: {str(e)}")
 
 @router.post("/sync")
-async def sync_products():
+async def sync_products(
+    batch_size: Optional[int] = Query(None, ge=1, le=10000),
+    mode: str = Query("catalog", pattern="^(catalog|report)$")
+):
     """Amazon'dan ürünleri senkronize et"""
     try:
         # Gerçek implementasyonda user authentication gerekir
-        products = await amazon_service.get_products("seller_id_example")
+        # Rapor modunda büyük kataloglar paket paket işlenir
+        result = await catalog_sync_scheduler.run_sync(
+            "user_id_example", amazon_service, "seller_id_example", mode, batch_size
+        )
         
-        # Ürünleri veritabanına kaydet
+        changes = result["changes"]
+        return {
+            "message": f"{len(changes['new'])} yeni, {len(changes['updated'])} güncellenen, "
+                       f"{len(changes['removed'])} kaldırılan ürün senkronize edildi",
+            "inserted": result["inserted"],
+            "modified": result["modified"],
+            "unchanged": result["unchanged"],
+            "removed": result["removed"],
+            "removal_skipped": result.get("removal_skipped"),
+            "changes": changes
+        }
+    except SyncAlreadyRunning:
+        raise HTTPException(status_code=409, detail="Senkronizasyon zaten devam ediyor")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Senkronizasyon hatası: {str(e)}")
+
+@router.get("/sync/status")
+async def get_sync_status():
+    """Son senkronizasyon işinin durumu ve geçmişi"""
+    try:
         db = get_database()
         
-        saved_count = 0
-        for product_data in products:
-            # Ürün zaten varsa güncelle, yoksa ekle
-            existing = await db.products.find_one({"asin": product_data["asin"]})
-            if existing:
-                await db.products.update_one(
-                    {"asin": product_data["asin"]}, 
-                    {"$set": product_data}
-                )
-            else:
-                await db.products.insert_one(product_data)
-                saved_count += 1
-        
-        return {"message": f"{saved_count} yeni ürün senkronize edildi"}
+        # Gerçek implementasyonda current user
+        job = await db.sync_jobs.find_one({"user_id": "user_id_example"}, {"_id": 0, "owner": 0})
+        if not job:
+            return {"status": "never_run"}
+        return job
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Senkronizasyon hatası: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Senkronizasyon durumu alınamadı: {str(e)}")
 
 @router.get("/categories/")
 async def get_categories():
@@ -0,0 +1,90 @@
+from collections import deque
+from typing import Deque, Dict, Tuple
+import time
+
+class CircuitOpenError(Exception):
+    """Devre açıkken yapılan çağrı denemesi"""
+    pass
+
+class CircuitBreaker:
+    """Hata oranı ya da yavaş çağrı oranına göre açılan devre kesici.
+
+    Son `window_seconds` içindeki çağrılar izlenir. En az `min_calls` çağrı
+    varken hata oranı veya `slow_call_seconds`'tan uzun süren çağrıların
+    oranı eşiği aşarsa devre `open_seconds` boyunca açılır; bu sürede çağrılar
+    hemen reddedilir. Süre dolunca sınırlı sayıda deneme çağrısına izin verilir
+    (half-open); deneme başarılıysa devre kapanır, başarısızsa yeniden açılır.
+    """
+
+    def __init__(self, window_seconds: float, min_calls: int, error_rate_threshold: float,
+                 slow_call_seconds: float, slow_rate_threshold: float, open_seconds: float,
+                 half_open_max_calls: int = 1):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._half_open_calls = 0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (zaman, hata, yavaş)
+        self.counters = {"rejected": 0, "opened": 0}
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float):
+        self.state = "open"
+        self.opened_at = now
+        self._calls.clear()
+        self.counters["opened"] += 1
+
+    def allow(self) -> bool:
+        """Çağrı yapılabilir mi; açık devrede False döner"""
+        now = time.monotonic()
+        if self.state == "open":
+            if now - self.opened_at < self.open_seconds:
+                self.counters["rejected"] += 1
+                return False
+            self.state = "half_open"
+            self._half_open_calls = 0
+        if self.state == "half_open":
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.counters["rejected"] += 1
+                return False
+            self._half_open_calls += 1
+        return True
+
+    def record(self, duration: float, failed: bool):
+        """Tamamlanan çağrının sonucunu kaydet"""
+        now = time.monotonic()
+        slow = duration >= self.slow_call_seconds
+        if self.state == "half_open":
+            if failed or slow:
+                self._open(now)
+            else:
+                self.state = "closed"
+            return
+
+        self._calls.append((now, failed, slow))
+        self._prune(now)
+        total = len(self._calls)
+        if total < self.min_calls:
+            return
+        errors = sum(1 for _, is_error, _ in self._calls if is_error)
+        slow_calls = sum(1 for _, _, is_slow in self._calls if is_slow)
+        if errors / total >= self.error_rate_threshold or slow_calls / total >= self.slow_rate_threshold:
+            self._open(now)
+
+    def stats(self) -> Dict:
+        self._prune(time.monotonic())
+        return {
+            "state": self.state,
+            "window_calls": len(self._calls),
+            "window_errors": sum(1 for _, is_error, _ in self._calls if is_error),
+            "window_slow_calls": sum(1 for _, _, is_slow in self._calls if is_slow),
+            **self.counters
+        }
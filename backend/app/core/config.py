@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     # Database
@@ -11,9 +11,73 @@ class Settings(BaseSettings):
     AMAZON_CLIENT_SECRET: str = ""
     AMAZON_REFRESH_TOKEN: str = ""
     AMAZON_REGION: str = "TR"  # Turkey region
+    AMAZON_MAX_WORKERS: int = 8  # bloklayan SP-API çağrıları için thread sayısı
+    PRODUCT_SYNC_BATCH_SIZE: int = 1000  # bulk_write başına upsert sayısı
+    PRODUCT_SYNC_REMOVE_MISSING: bool = False  # kaynakta görülmeyen ürünleri sil
+    PRODUCT_SYNC_MAX_REMOVAL_RATIO: float = 0.2  # tek senkronda silinebilecek katalog oranı
+    
+    # Background catalog sync
+    CATALOG_SYNC_ENABLED: bool = True
+    CATALOG_SYNC_MODE: str = "report"  # "catalog" veya "report"
+    CATALOG_SYNC_INTERVAL_SECONDS: int = 21600
+    CATALOG_SYNC_JITTER_SECONDS: int = 900
+    CATALOG_SYNC_MAX_WORKERS: int = 2
+    CATALOG_SYNC_LEASE_SECONDS: int = 3600
+    CATALOG_SYNC_TICK_SECONDS: int = 60
+    
+    # Product search index
+    SEARCH_INDEX_REFRESH_SECONDS: float = 5.0  # diğer süreçlerin senkron değişiklikleri en geç bu sürede görülür
+    SEARCH_INDEX_CHANGE_RETENTION_SECONDS: int = 86400
+    
+    # Price history & deals
+    PRICE_HISTORY_BUCKET_SIZE: int = 200  # kova başına gözlem sayısı
+    DEAL_DROP_THRESHOLD: float = 0.15
+    DEAL_WINDOW_DAYS: int = 30
+    
+    # Product detail cache
+    PRODUCT_CACHE_MAX_ENTRIES: int = 10000
+    PRODUCT_CACHE_TTL_SECONDS: int = 900  # fiyat güncelliği belirler; kayıt bütün olarak yenilenir
+    PRODUCT_CACHE_MAX_STALE_SECONDS: int = 604800  # bu süreden eski kayıtlar beklenerek yenilenir
     
     # OpenAI
+    LLM_PROVIDER: str = "openai"
     OPENAI_API_KEY: str = ""
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    OPENAI_BASE_URL: Optional[str] = None  # ör. yerel stand-in sunucusu: http://127.0.0.1:8100/v1
+    OPENAI_TIMEOUT_SECONDS: float = 20.0
+    OPENAI_MAX_RETRIES: int = 3
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    AI_MAX_CONCURRENT_PER_USER: int = 4
+    AI_VARIATIONS_SINGLE_REQUEST: bool = True  # varyasyonlar tek prompt'tan n ile örneklenir; stil başına prompt için False
+    AI_CONTENT_CACHE_TTL_SECONDS: int = 604800
+    AI_BREAKER_WINDOW_SECONDS: float = 60.0
+    AI_BREAKER_MIN_CALLS: int = 10
+    AI_BREAKER_ERROR_RATE: float = 0.5
+    AI_BREAKER_SLOW_CALL_SECONDS: float = 8.0
+    AI_BREAKER_SLOW_RATE: float = 0.5
+    AI_BREAKER_OPEN_SECONDS: float = 30.0  # açık devrede gönderiler yerel şablonlardan üretilir
+    
+    # Hashtag performance index
+    HASHTAG_INDEX_ENABLED: bool = True
+    HASHTAG_INDEX_REFRESH_SECONDS: int = 300
+    HASHTAG_INDEX_SNAPSHOT_SECONDS: int = 900
+    HASHTAG_MIN_POSTS: int = 3  # daha az gönderide geçen hashtag sıralanmaz
+    HASHTAG_PROMPT_COUNT: int = 5
+    
+    # Near-duplicate post detection
+    DUPLICATE_INDEX_ENABLED: bool = True
+    DUPLICATE_SIMILARITY_THRESHOLD: float = 0.7  # tahmini Jaccard (karakter 4-gram)
+    DUPLICATE_REGENERATE_ATTEMPTS: int = 2
+    
+    # Bulk generation jobs
+    GENERATION_JOBS_ENABLED: bool = True
+    GENERATION_MAX_CONCURRENCY: int = 16
+    GENERATION_TOKENS_PER_MINUTE: int = 200000
+    GENERATION_TOKENS_PER_POST_ESTIMATE: int = 700
+    GENERATION_INSERT_BATCH_SIZE: int = 200
+    GENERATION_JOB_LEASE_SECONDS: int = 300
+    GENERATION_JOB_POLL_SECONDS: int = 5
     
     # Twitter/X API
     TWITTER_CONSUMER_KEY: str = ""
@@ -21,6 +85,46 @@ class Settings(BaseSettings):
     TWITTER_ACCESS_TOKEN: str = ""
     TWITTER_ACCESS_TOKEN_SECRET: str = ""
     TWITTER_BEARER_TOKEN: str = ""
+    TWITTER_MAX_CONCURRENCY: int = 8
+    TWITTER_MAX_CONNECTIONS: int = 20
+    TWITTER_KEEPALIVE_SECONDS: float = 30.0
+    TWITTER_TIMEOUT_SECONDS: float = 15.0
+    TWITTER_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    
+    # Publish queue
+    PUBLISH_QUEUE_ENABLED: bool = True
+    PUBLISH_WORKER_CONCURRENCY: int = 4
+    PUBLISH_JOB_LEASE_SECONDS: int = 120
+    PUBLISH_POLL_SECONDS: float = 2.0
+    PUBLISH_MAX_ATTEMPTS: int = 5
+    PUBLISH_RETRY_BASE_SECONDS: float = 5.0
+    PUBLISH_RETRY_MAX_SECONDS: float = 900.0
+    PUBLISH_RATE_LIMIT_JITTER_SECONDS: float = 10.0  # sıfırlanma anından sonra işler bu aralığa yayılır
+    PUBLISH_RATE_LIMIT_FALLBACK_SECONDS: int = 900  # x-rate-limit-reset başlığı yoksa
+    
+    # Scheduled posting
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_POLL_SECONDS: float = 5.0
+    SCHEDULER_HORIZON_SECONDS: float = 15.0  # bu kadar saniye içinde zamanı gelenler bellekteki yığına alınır
+    SCHEDULER_LEASE_SECONDS: int = 60
+    SCHEDULER_CLAIM_BATCH_SIZE: int = 500
+    
+    # Tweet metrics collector
+    METRICS_COLLECTOR_ENABLED: bool = True
+    METRICS_COLLECTOR_POLL_SECONDS: float = 60.0
+    METRICS_COLLECTOR_LEASE_SECONDS: int = 300
+    METRICS_COLLECTOR_MAX_BATCHES_PER_CYCLE: int = 50  # döngü başına en fazla 100'lük get_tweets çağrısı
+    METRICS_FIRST_COLLECTION_DELAY_SECONDS: int = 900
+    METRICS_RATE_LIMIT_FALLBACK_SECONDS: int = 900
+    
+    # Media pipeline
+    MEDIA_CACHE_DIR: str = "./media_cache"
+    MEDIA_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    MEDIA_DOWNLOAD_CONCURRENCY: int = 8
+    MEDIA_DOWNLOAD_MAX_BYTES: int = 20 * 1024 * 1024
+    MEDIA_DOWNLOAD_TIMEOUT_SECONDS: float = 15.0
+    MEDIA_ID_TTL_SECONDS: int = 86400  # yanıtta expires_after_secs yoksa
+    MEDIA_ID_REUSE_MARGIN_SECONDS: int = 900  # bitişine bu kadar kalan media_id yeniden yüklenir
     
     # Security
     SECRET_KEY: str = "your-secret-key-here"
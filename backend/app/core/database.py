@@ -1,4 +1,7 @@
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
+from typing import List
 from app.core.config import settings
 
 class Database:
@@ -11,10 +14,102 @@ async def connect_to_mongo():
     """Create database connection"""
     db.client = AsyncIOMotorClient(settings.MONGODB_URL)
     db.database = db.client[settings.DATABASE_NAME]
+    await create_indexes()
+
+async def create_indexes():
+    """Create indexes required by query paths"""
+    # Ürün upsert'leri (user_id, asin) anahtarıyla yapılır
+    await db.database.products.create_index(
+        [("user_id", ASCENDING), ("asin", ASCENDING)], unique=True
+    )
+    # Filtreli listeleme için keyset sayfalama indeksleri
+    await db.database.products.create_index(
+        [("user_id", ASCENDING), ("category", ASCENDING), ("asin", ASCENDING)]
+    )
+    await db.database.products.create_index(
+        [("user_id", ASCENDING), ("brand", ASCENDING), ("asin", ASCENDING)]
+    )
+
+    # Arama indeksi değişiklik günlüğü; süreçler kendi sürümlerinden sonrasını okur
+    await db.database.search_index_changes.create_index(
+        [("user_id", ASCENDING), ("version", ASCENDING)], unique=True
+    )
+    await db.database.search_index_changes.create_index(
+        "created_at", expireAfterSeconds=settings.SEARCH_INDEX_CHANGE_RETENTION_SECONDS
+    )
+
+    # Fiyat geçmişi kovaları ve tespit edilen indirimler
+    await db.database.price_history.create_index(
+        [("user_id", ASCENDING), ("bucket_start", ASCENDING), ("asin", ASCENDING)]
+    )
+    await db.database.price_history.create_index(
+        [("user_id", ASCENDING), ("asin", ASCENDING), ("bucket_start", ASCENDING)]
+    )
+    await db.database.deals.create_index(
+        [("user_id", ASCENDING), ("asin", ASCENDING)], unique=True
+    )
+    
+    # Satıcı başına tek senkron işi
+    await db.database.sync_jobs.create_index("user_id", unique=True)
+    
+    # Toplu üretim işleri ve iş başına tekrarsız gönderiler
+    await db.database.generation_jobs.create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+    await db.database.social_media_posts.create_index(
+        [("job_id", ASCENDING), ("product_id", ASCENDING), ("platform", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"job_id": {"$exists": True}}
+    )
+    
+    # Zamanlanmış gönderiler: ufuk içindeki ve lease'i dolan sahiplenmeler indeksten okunur
+    await db.database.social_media_posts.create_index(
+        [("schedule_status", ASCENDING), ("due_at", ASCENDING)],
+        partialFilterExpression={"due_at": {"$exists": True}}
+    )
+    await db.database.social_media_posts.create_index(
+        [("schedule_status", ASCENDING), ("schedule_lease_until", ASCENDING)],
+        partialFilterExpression={"schedule_lease_until": {"$exists": True}}
+    )
+    
+    # Yayın kuyruğu: işçiler zamanı gelen ve lease'i dolan işleri alır; gönderi başına tek aktif iş
+    await db.database.publish_jobs.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+    await db.database.publish_jobs.create_index([("status", ASCENDING), ("lease_until", ASCENDING)])
+    await db.database.publish_jobs.create_index(
+        [("post_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"active": True}
+    )
+    await db.database.publish_jobs.create_index([("post_id", ASCENDING), ("created_at", ASCENDING)])
+    
+    # Hashtag indeksi analitikleri (collected_at, _id) filigranından okur
+    await db.database.analytics.create_index([("collected_at", ASCENDING), ("_id", ASCENDING)])
+    await db.database.analytics.create_index([("post_id", ASCENDING), ("collected_at", ASCENDING)])
+    
+    # Metrik toplayıcı zamanı gelen yayınlanmış gönderileri okur
+    await db.database.social_media_posts.create_index(
+        "metrics_next_at",
+        partialFilterExpression={"metrics_next_at": {"$exists": True}}
+    )
+    
+    # Üretilen içerik cache'i süresi dolunca Mongo tarafından silinir
+    await db.database.generated_content_cache.create_index("expires_at", expireAfterSeconds=0)
+    
+    # Yüklenen medyanın media_id'leri geçerlilik süresi dolunca silinir
+    await db.database.media_uploads.create_index("expires_at", expireAfterSeconds=0)
 
 async def close_mongo_connection():
     """Close database connection"""
     db.client.close()
 
 def get_database():
-    return db.database
\ No newline at end of file
+    return db.database
+
+def id_variants(ids) -> List:
+    """String ve ObjectId biçimli kimliklerin ikisini de sorgula"""
+    variants = []
+    for value in ids:
+        variants.append(value)
+        if isinstance(value, str) and ObjectId.is_valid(value):
+            variants.append(ObjectId(value))
+        elif isinstance(value, ObjectId):
+            variants.append(str(value))
+    return variants
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """Asenkron token bucket: saniyede `rate` token dolar, en fazla `burst` token birikir"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Yeterli token birikene kadar bekle ve tüket"""
+        # Burst'ten büyük talepler kovayı tamamen boşaltarak geçer
+        tokens = min(tokens, self.burst)
+        # Kilit bekleyenleri sırayla (FIFO) geçirir
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
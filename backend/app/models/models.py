@@ -45,6 +45,7 @@ class Product(BaseModel):
     image_urls: List[str] = []
     category: Optional[str] = None
     brand: Optional[str] = None
+    content_digest: Optional[str] = None  # Normalize alanların özeti
     last_updated: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
@@ -63,6 +64,8 @@ class SocialMediaPost(BaseModel):
     post_id: Optional[str] = None  # Platform-specific post ID
     created_at: datetime = Field(default_factory=datetime.utcnow)
     posted_at: Optional[datetime] = None
+    due_at: Optional[datetime] = None  # zamanlanmış yayın zamanı (UTC)
+    schedule_status: Optional[str] = None  # "scheduled", "claimed", "enqueued", "cancelled"
     
     class Config:
         allow_population_by_field_name = True
@@ -1,83 +1,401 @@
 import openai
 from app.core.config import settings
-from typing import Dict, List
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.database import get_database, id_variants
+from app.services.content_cache import generated_content_cache
+from app.services.duplicate_index import duplicate_index
+from app.services.hashtag_index import hashtag_index
+from app.services.llm_provider import LLMProvider, create_provider
+from app.services.local_generator import local_post_generator
+from app.services.prompt_builder import build_post_prompt, build_trend_prompt, fit_to_limit, token_counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import random
+import time
+
+# Prompt şablonu değiştiğinde artırılır; eski cache kayıtları kullanılmaz
+# 3: token bütçeli şablon, 4: en iyi hashtag kuralı
+PROMPT_VERSION = "4"
+
+# Tekrar denenebilir sağlayıcı hataları
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
 
 class AIContentService:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        self.provider = provider or create_provider()
+        self.max_retries = settings.OPENAI_MAX_RETRIES
+        self._user_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.usage_counters: Dict[str, Dict[str, int]] = {}
+        # Sağlayıcı yavaşladığında ya da hata verdiğinde çağrılar beklemeden yerel motora düşer
+        self.breaker = CircuitBreaker(
+            window_seconds=settings.AI_BREAKER_WINDOW_SECONDS,
+            min_calls=settings.AI_BREAKER_MIN_CALLS,
+            error_rate_threshold=settings.AI_BREAKER_ERROR_RATE,
+            slow_call_seconds=settings.AI_BREAKER_SLOW_CALL_SECONDS,
+            slow_rate_threshold=settings.AI_BREAKER_SLOW_RATE,
+            open_seconds=settings.AI_BREAKER_OPEN_SECONDS
+        )
 
-    async def generate_social_media_post(self, product: Dict, platform: str = "twitter", style: str = "engaging") -> str:
-        """OpenAI GPT-4o-mini ile sosyal medya gönderisi oluştur"""
-        
-        try:
-            # Platform-specific character limits and styles
-            platform_configs = {
-                "twitter": {"max_chars": 280, "hashtags": True, "style": "kısa ve çarpıcı"},
-                "instagram": {"max_chars": 2200, "hashtags": True, "style": "görsel odaklı"},
-                "tiktok": {"max_chars": 150, "hashtags": True, "style": "trend ve eğlenceli"}
+    async def close(self):
+        await self.provider.close()
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff; sağlayıcı retry-after verdiyse ona uy"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, 0.5)
+            except ValueError:
+                pass
+        return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+    async def _chat_candidates(self, messages: List[Dict], max_tokens: int, temperature: float,
+                               n: int = 1, timeout: Optional[float] = None) -> Tuple[List[str], Dict]:
+        """Chat completion isteğini zaman aşımı ve jitter'lı yeniden deneme ile çalıştır;
+        adayları ve token kullanımını döndürür"""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("AI sağlayıcısı devresi açık")
+            started = time.monotonic()
+            failed = True
+            try:
+                result = await self.provider.complete(messages, max_tokens, temperature, n=n, timeout=timeout)
+                failed = False
+                return result
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                attempt += 1
+            except openai.APIStatusError:
+                # İstemci kaynaklı hatalar (4xx) sağlayıcı sağlığını göstermez
+                failed = False
+                raise
+            finally:
+                self.breaker.record(time.monotonic() - started, failed)
+            await asyncio.sleep(delay)
+
+    async def _chat_batch(self, requests: List[Dict], concurrency: int) -> List:
+        """İstekleri sağlayıcının batch'iyle eşzamanlı çalıştır; geçici hatalar tek tek yeniden denenir.
+
+        Sonuç listesi istek sırasındadır; başarısız istekler exception olarak döner.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("AI sağlayıcısı devresi açık")
+        outcomes = await self.provider.batch(requests, concurrency=concurrency)
+        results = []
+        retry = []
+        for i, (outcome, elapsed) in enumerate(outcomes):
+            failed = isinstance(outcome, Exception) and not (
+                # İstemci kaynaklı hatalar (4xx) sağlayıcı sağlığını göstermez
+                isinstance(outcome, openai.APIStatusError) and not isinstance(outcome, RETRYABLE_ERRORS)
+            )
+            self.breaker.record(elapsed, failed)
+            results.append(outcome)
+            if isinstance(outcome, RETRYABLE_ERRORS) and self.max_retries > 0:
+                retry.append(i)
+        if retry:
+            retried = await asyncio.gather(
+                *(self._chat_candidates(**requests[i]) for i in retry), return_exceptions=True
+            )
+            for i, result in zip(retry, retried):
+                results[i] = result
+        return results
+
+    def _record_usage(self, platform: str, usage: Dict):
+        """Çağrı başına prompt/completion token sayılarını platform bazında biriktir"""
+        counters = self.usage_counters.setdefault(
+            platform, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        )
+        counters["calls"] += 1
+        counters["prompt_tokens"] += usage["prompt_tokens"]
+        counters["completion_tokens"] += usage["completion_tokens"]
+
+    def usage_stats(self) -> Dict:
+        return {
+            platform: {
+                **counters,
+                "avg_prompt_tokens": round(counters["prompt_tokens"] / counters["calls"], 1) if counters["calls"] else 0.0,
+                "avg_completion_tokens": round(counters["completion_tokens"] / counters["calls"], 1) if counters["calls"] else 0.0
             }
-            
-            config = platform_configs.get(platform, platform_configs["twitter"])
-            
-            prompt = f"""
-            Türkçe bir {platform} gönderisi oluştur. Aşağıdaki ürün için {config['style']} bir içerik yaz:
-
-            Ürün Adı: {product.get('title', '')}
-            Açıklama: {product.get('description', '')}
-            Fiyat: {product.get('price', '')} {product.get('currency', 'TRY')}
-            Kategori: {product.get('category', '')}
-            Marka: {product.get('brand', '')}
-
-            Gereksinimler:
-            - Maksimum {config['max_chars']} karakter
-            - Türkçe dilinde
-            - Satış odaklı ve çekici
-            - Ürünün öne çıkan özelliklerini vurgula
-            - Amazon'da satıldığını belirt
-            {"- Uygun hashtag'ler ekle" if config['hashtags'] else ""}
-            - Emoji kullan ama abartma
-            - Call-to-action ekle
-
-            Sadece gönderi içeriğini döndür, başka açıklama ekleme.
-            """
-
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Sen Amazon satıcıları için sosyal medya içeriği oluşturan bir AI asistanısın. Türkçe, çekici ve satış odaklı içerikler üretiyorsun."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300,
-                temperature=0.7
+            for platform, counters in self.usage_counters.items()
+        }
+
+    def _top_hashtags(self, product: Dict) -> List[str]:
+        """Ürün kategorisinde en iyi performans gösteren hashtag'ler (bellekteki indeksten)"""
+        return [item["hashtag"] for item in hashtag_index.top(product.get("category"), settings.HASHTAG_PROMPT_COUNT)]
+
+    def _fallback_post(self, product: Dict, platform: str = "twitter", style: str = "engaging", variant: int = 0) -> str:
+        """Model kullanılamadığında yerel şablon motoruyla anında gönderi üret"""
+        return local_post_generator.generate(product, platform, style, variant, hashtags=self._top_hashtags(product))
+
+    async def _generate_posts(self, product: Dict, platform: str, style: str, n: int = 1,
+                              temperature: float = 0.7) -> Tuple[List[str], Dict]:
+        """Gönderi üret; hata durumunda exception fırlatır"""
+        prompt = build_post_prompt(product, platform, style, self._top_hashtags(product))
+        # max_tokens aday başına uygulanır
+        candidates, usage = await self._chat_candidates(
+            prompt["messages"], max_tokens=prompt["max_tokens"], temperature=temperature, n=n
+        )
+        self._record_usage(platform, usage)
+        return [fit_to_limit(content, prompt["max_chars"]) for content in candidates], usage
+
+    def _find_duplicate(self, user_id, content: str) -> Optional[Dict]:
+        if user_id is None:
+            return None
+        return duplicate_index.find(user_id, content)
+
+    async def _is_product_post(self, duplicate: Dict, product: Dict, platform: str) -> bool:
+        """Kopya, aynı ürün ve platform için daha önce kaydedilmiş gönderi mi"""
+        db = get_database()
+        post = await db.social_media_posts.find_one(
+            {"_id": {"$in": id_variants([duplicate["post_id"]])}}, {"product_id": 1, "platform": 1}
+        )
+        return (post is not None and post.get("platform") == platform
+                and str(post.get("product_id")) == str(product.get("_id")))
+
+    def _unique_fallback(self, product: Dict, platform: str, style: str, user_id) -> Tuple[str, Optional[Dict]]:
+        """Yerel şablon varyasyonlarından kullanıcının gönderilerine benzemeyen ilkini seç"""
+        content, duplicate = "", None
+        for variant in range(settings.DUPLICATE_REGENERATE_ATTEMPTS + 1):
+            content = self._fallback_post(product, platform, style, variant)
+            duplicate = self._find_duplicate(user_id, content)
+            if duplicate is None:
+                break
+        return content, duplicate
+
+    async def generate_post_result(self, product: Dict, platform: str = "twitter", style: str = "engaging",
+                                   force_refresh: bool = False, user_id=None) -> Dict:
+        """Gönderiyi üret ve kaynağını (cache, model, fallback) ile token kullanımını döndür.
+
+        `user_id` verilirse içerik kullanıcının mevcut gönderileriyle karşılaştırılır;
+        yakın kopya çıkan içerik yeniden üretilir, yine kopya kalırsa sonuçta
+        `duplicate_of` döner. Cache'teki içerik kullanıcının aynı ürün ve platform
+        için kaydettiği gönderiye benziyorsa içerik kullanılır, ancak sonuçta
+        `existing_post` döner; çağıran yeni kopya eklemek yerine o gönderiyi kullanır.
+        """
+        cache_key = generated_content_cache.make_key(product, platform, style, PROMPT_VERSION)
+        empty_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+        own_post: Dict = {}
+
+        async def accept_cached(content: str) -> bool:
+            # Cache kaydının kendi ürettiği gönderiye benzemesi kopya sayılmaz
+            duplicate = self._find_duplicate(user_id, content)
+            if duplicate is None:
+                return True
+            if await self._is_product_post(duplicate, product, platform):
+                own_post.update(duplicate)
+                return True
+            return False
+
+        try:
+            if not force_refresh:
+                cached = await generated_content_cache.get(cache_key, accept=accept_cached)
+                if cached is not None:
+                    result = {"content": cached, "source": "cache", "usage": empty_usage}
+                    if own_post:
+                        result["existing_post"] = own_post
+                    return result
+        except Exception as e:
+            print(f"Content cache read error: {e}")
+
+        usage = dict(empty_usage)
+        content, duplicate = None, None
+        for attempt in range(settings.DUPLICATE_REGENERATE_ATTEMPTS + 1):
+            try:
+                # Yeniden üretimde çeşitlilik için sıcaklık artırılır
+                posts, attempt_usage = await self._generate_posts(
+                    product, platform, style, temperature=min(1.2, 0.7 + 0.2 * attempt)
+                )
+            except Exception as e:
+                if content is not None:
+                    break
+                if not isinstance(e, CircuitOpenError):
+                    print(f"AI Content Generation Error: {e}")
+                # Fallback content
+                fallback, duplicate = self._unique_fallback(product, platform, style, user_id)
+                result = {"content": fallback, "source": "fallback", "usage": empty_usage, "error": str(e)}
+                if duplicate:
+                    result["duplicate_of"] = duplicate
+                return result
+            for key in usage:
+                usage[key] += attempt_usage[key]
+            content = posts[0]
+            duplicate = self._find_duplicate(user_id, content)
+            if duplicate is None:
+                break
+
+        if duplicate:
+            return {"content": content, "source": "model", "usage": usage, "duplicate_of": duplicate}
+
+        try:
+            await generated_content_cache.put(
+                cache_key, content, usage["total_tokens"], platform, style, PROMPT_VERSION
             )
+        except Exception as e:
+            print(f"Content cache write error: {e}")
+        return {"content": content, "source": "model", "usage": usage}
 
-            content = response.choices[0].message.content.strip()
-            
-            # Karakter limitini kontrol et
-            if len(content) > config['max_chars']:
-                content = content[:config['max_chars']-3] + "..."
-            
-            return content
+    async def generate_social_media_post(self, product: Dict, platform: str = "twitter", style: str = "engaging",
+                                         force_refresh: bool = False) -> str:
+        """OpenAI ile sosyal medya gönderisi oluştur; aynı ürün/platform/stil için cache'i kullan"""
+        result = await self.generate_post_result(product, platform, style, force_refresh)
+        return result["content"]
 
+    async def stream_social_media_post(self, product: Dict, platform: str = "twitter",
+                                       style: str = "engaging") -> AsyncIterator[str]:
+        """Gönderiyi model token'ları geldikçe parça parça üret; platform limitini akış sırasında uygula"""
+        cache_key = generated_content_cache.make_key(product, platform, style, PROMPT_VERSION)
+        try:
+            cached = await generated_content_cache.get(cache_key)
         except Exception as e:
-            print(f"AI Content Generation Error: {e}")
-            # Fallback content
-            return f"🛍️ {product.get('title', 'Harika ürün')} - Amazon'da şimdi {product.get('price', '')} {product.get('currency', 'TRY')}! #Amazon #Alışveriş #İndirim"
+            print(f"Content cache read error: {e}")
+            cached = None
+        if cached is not None:
+            yield cached
+            return
 
-    async def generate_multiple_variations(self, product: Dict, platform: str = "twitter", count: int = 3) -> List[str]:
-        """Aynı ürün için birden fazla gönderi varyasyonu oluştur"""
-        variations = []
-        styles = ["engaging", "informative", "promotional"]
-        
-        for i in range(min(count, len(styles))):
+        prompt = build_post_prompt(product, platform, style, self._top_hashtags(product))
+        limit = prompt["max_chars"]
+        emitted: List[str] = []
+        length = 0
+        if not self.breaker.allow():
+            yield self._fallback_post(product, platform, style)
+            return
+        # Devre kesici için gecikme ilk token'a kadar geçen süredir
+        started = time.monotonic()
+        recorded = False
+        stream = self.provider.stream(prompt["messages"], prompt["max_tokens"], temperature=0.7)
+        try:
+            async for delta in stream:
+                if not recorded:
+                    self.breaker.record(time.monotonic() - started, False)
+                    recorded = True
+                if not length:
+                    delta = delta.lstrip()
+                if not delta:
+                    continue
+
+                remaining = limit - length
+                if len(delta) > remaining:
+                    # Limiti aşan parçayı mümkünse kelime sınırında kes ve akışı bitir
+                    cut = delta[:remaining]
+                    if " " in cut:
+                        cut = cut[:cut.rfind(" ")]
+                    if cut:
+                        emitted.append(cut)
+                        yield cut
+                    break
+
+                emitted.append(delta)
+                length += len(delta)
+                yield delta
+        except Exception as e:
+            print(f"AI Content Streaming Error: {e}")
+            # İstemci kaynaklı hatalar (4xx) sağlayıcı sağlığını göstermez
+            failed = isinstance(e, RETRYABLE_ERRORS) or not isinstance(e, openai.APIStatusError)
+            if not recorded or failed:
+                # İlk token başarı sayılmıştı; yarıda kesilen akış ayrıca hata olarak kaydedilir
+                self.breaker.record(time.monotonic() - started, failed)
+                recorded = True
+            if emitted:
+                # Yarım içerik tamamlanmış gönderi gibi bitmemeli; çağıran hata olarak bildirir
+                raise
+            yield self._fallback_post(product, platform, style)
+            return
+        finally:
+            if not recorded:
+                # Akış token gelmeden kapandı ya da iptal edildi
+                self.breaker.record(time.monotonic() - started, True)
+            await stream.aclose()
+
+        content = "".join(emitted).rstrip()
+        if content:
+            # Akış yanıtında kullanım bilgisi yok; token sayıları yerel olarak hesaplanır
+            usage = {"prompt_tokens": prompt["prompt_tokens"], "completion_tokens": token_counter.count(content)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            self._record_usage(platform, usage)
+            try:
+                await generated_content_cache.put(cache_key, content, usage["total_tokens"], platform, style, PROMPT_VERSION)
+            except Exception as e:
+                print(f"Content cache write error: {e}")
+
+    def _user_semaphore(self, user_id: str) -> asyncio.Semaphore:
+        semaphore = self._user_semaphores.get(user_id)
+        if semaphore is None:
+            semaphore = self._user_semaphores[user_id] = asyncio.Semaphore(settings.AI_MAX_CONCURRENT_PER_USER)
+        return semaphore
+
+    async def generate_multiple_variations(self, product: Dict, platform: str = "twitter", count: int = 3,
+                                           user_id: str = "default") -> List[str]:
+        """Aynı ürün için birden fazla gönderi varyasyonunu eşzamanlı oluştur.
+
+        AI_VARIATIONS_SINGLE_REQUEST açıkken tüm varyasyonlar tek prompt'tan
+        (ilk stil, "engaging") n ile örneklenir ve yalnızca örneklemeyle
+        farklılaşır; stil başına ayrı prompt için ayar kapatılmalıdır.
+        """
+        styles = ["engaging", "informative", "promotional"][:max(count, 0)]
+        if not styles:
+            return []
+        semaphore = self._user_semaphore(user_id)
+
+        if settings.AI_VARIATIONS_SINGLE_REQUEST:
+            # Tüm adaylar tek istekte (n) üretilir; çeşitlilik için sıcaklık biraz yüksek
+            posts: List[str] = []
             try:
-                content = await self.generate_social_media_post(product, platform, styles[i])
-                variations.append(content)
+                async with semaphore:
+                    # Sağlayıcı istenenden az aday döndürebilir; eksikler bir kez daha istenir
+                    for _ in range(2):
+                        missing = len(styles) - len(posts)
+                        if missing <= 0:
+                            break
+                        candidates, _ = await self._generate_posts(
+                            product, platform, styles[0], n=missing, temperature=0.9
+                        )
+                        posts.extend(candidates[:missing])
             except Exception as e:
-                print(f"Error generating variation {i+1}: {e}")
+                print(f"Error generating variations in a single request: {e}")
+            # Hâlâ eksik kalan varyasyonlar yerel şablonlardan tamamlanır
+            posts.extend(
+                self._fallback_post(product, platform, styles[i], variant=i)
+                for i in range(len(posts), len(styles))
+            )
+            return posts
+
+        # Stil başına ayrı prompt; istekler sağlayıcının batch'iyle birlikte gönderilir
+        hashtags = self._top_hashtags(product)
+        prompts = [build_post_prompt(product, platform, style, hashtags) for style in styles]
+        requests = [
+            {"messages": prompt["messages"], "max_tokens": prompt["max_tokens"], "temperature": 0.7}
+            for prompt in prompts
+        ]
+        try:
+            async with semaphore:
+                results = await self._chat_batch(requests, concurrency=settings.AI_MAX_CONCURRENT_PER_USER)
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                print(f"Error generating variations: {e}")
+            results = []
+
+        variations = []
+        for i, (prompt, result) in enumerate(zip(prompts, results)):
+            if isinstance(result, BaseException):
+                # Başarısız varyasyon atlanır, diğerleri döndürülür
+                print(f"Error generating variation {i+1}: {result}")
                 continue
-        
-        return variations
+            candidates, usage = result
+            self._record_usage(platform, usage)
+            variations.append(fit_to_limit(candidates[0], prompt["max_chars"]))
+
+        return variations or [self._fallback_post(product, platform, style, variant=i) for i, style in enumerate(styles)]
 
     async def optimize_for_trends(self, product: Dict, platform: str = "twitter") -> str:
         """Trend analizi ile optimize edilmiş içerik oluştur"""
@@ -86,35 +404,12 @@ class AIContentService:
         # Şu anda temel optimizasyon uygulayacağız
         
         try:
-            trend_prompt = f"""
-            {product.get('title', '')} ürünü için güncel Türkiye trendlerini göz önünde bulundurarak 
-            {platform} gönderisi oluştur. 
-
-            Ürün Bilgileri:
-            - Başlık: {product.get('title', '')}
-            - Fiyat: {product.get('price', '')} {product.get('currency', 'TRY')}
-            - Kategori: {product.get('category', '')}
-
-            Güncel trend faktörleri:
-            - Türkiye'deki alışveriş trendleri
-            - Mevsimsel özellikler
-            - Popüler hashtag'ler
-            - Lokal ifadeler ve kültürel referanslar
-
-            Türkçe, çekici ve trend uyumlu bir gönderi oluştur.
-            """
-
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Sen Türkiye pazarını çok iyi bilen bir sosyal medya uzmanısın."},
-                    {"role": "user", "content": trend_prompt}
-                ],
-                max_tokens=250,
-                temperature=0.8
+            prompt = build_trend_prompt(product, platform)
+            candidates, usage = await self._chat_candidates(
+                prompt["messages"], max_tokens=prompt["max_tokens"], temperature=0.8
             )
-
-            return response.choices[0].message.content.strip()
+            self._record_usage(platform, usage)
+            return fit_to_limit(candidates[0], prompt["max_chars"])
 
         except Exception as e:
             print(f"Trend optimization error: {e}")
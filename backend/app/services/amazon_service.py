@@ -1,27 +1,65 @@
 from sp_api.api import CatalogItems, Reports
 from sp_api.base import Marketplaces
 from app.core.config import settings
+from app.services.sp_api_client import sp_api_client
+from typing import AsyncIterator, Iterator, List, Dict, Optional
 import asyncio
-from typing import List, Dict, Optional
+import csv
+import gzip
+import io
+import itertools
+import requests
+
+CATALOG_ITEMS_VERSION = "2022-04-01"
+CATALOG_INCLUDED_DATA = "summaries,images,attributes"
+SEARCH_CATALOG_MAX_IDENTIFIERS = 20  # searchCatalogItems identifiers sınırı
+MERCHANT_LISTINGS_REPORT = "GET_MERCHANT_LISTINGS_ALL_DATA"
+REPORT_POLL_INTERVAL_SECONDS = 30
 
 class AmazonService:
-    def __init__(self):
-        self.credentials = {
+    def __init__(self, credentials: Optional[Dict] = None):
+        self.credentials = credentials or {
             'refresh_token': settings.AMAZON_REFRESH_TOKEN,
             'lwa_app_id': settings.AMAZON_CLIENT_ID,
             'lwa_client_secret': settings.AMAZON_CLIENT_SECRET,
         }
         self.marketplace = Marketplaces.TR  # Turkey marketplace
+        self.client = sp_api_client
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Event loop görevlere yalnızca zayıf referans tutar; uçuştaki sorgular burada yaşar
+        self._fetch_tasks = set()
+
+    @classmethod
+    def for_seller(cls, amazon_credentials: Dict) -> "AmazonService":
+        """Kullanıcının bağladığı SP-API hesabı için servis örneği"""
+        return cls({
+            'refresh_token': amazon_credentials.get('refresh_token', ''),
+            'lwa_app_id': amazon_credentials.get('client_id', ''),
+            'lwa_client_secret': amazon_credentials.get('client_secret', ''),
+        })
+
+    @property
+    def has_credentials(self) -> bool:
+        return bool(self.credentials['refresh_token'])
+
+    async def _catalog_call(self, operation: str, **kwargs):
+        """Catalog Items API'yi paylaşılan client havuzu üzerinden çağır"""
+        return await self.client.call(
+            CatalogItems, operation, self.credentials, self.marketplace,
+            client_kwargs={"version": CATALOG_ITEMS_VERSION},
+            **kwargs
+        )
+
+    async def _reports_call(self, operation: str, **kwargs):
+        """Reports API'yi paylaşılan client havuzu üzerinden çağır"""
+        return await self.client.call(Reports, operation, self.credentials, self.marketplace, **kwargs)
 
     async def get_products(self, seller_id: str) -> List[Dict]:
         """Amazon SP-API'den ürün verilerini çek"""
         try:
-            # Catalog Items API kullanarak ürünleri çek
-            catalog_api = CatalogItems(credentials=self.credentials, marketplace=self.marketplace)
-            
             # Bu örnek implementation'dır - gerçek kullanımda seller'ın ürünlerini çekmek için
             # Reports API veya Listings API kullanılması gerekebilir
-            
+
             # Simulated product data for development
             products = [
                 {
@@ -35,45 +73,207 @@ class AmazonService:
                     "brand": "Örnek Marka"
                 }
             ]
-            
+
             return products
-            
+
         except Exception as e:
+            # Boş liste "satıcının ürünü yok" anlamına gelir; hata yukarı iletilir
             print(f"Amazon API Error: {e}")
-            return []
+            raise
+
+    async def iter_listing_chunks(self, seller_id: str, chunk_size: int) -> AsyncIterator[List[Dict]]:
+        """Merchant listings raporunu akış olarak indirip sabit boyutlu ürün paketleri üret"""
+        if not self.has_credentials:
+            # Development ortamında simulated ürünler
+            products = await self.get_products(seller_id)
+            for i in range(0, len(products), chunk_size):
+                yield products[i:i + chunk_size]
+            return
+
+        document = await self._request_listings_report()
+        rows = self._iter_report_rows(document["url"], document.get("compressionAlgorithm"))
+        try:
+            while True:
+                # Her paket executor'da okunur; bellekte yalnızca bir paket tutulur
+                chunk = await self.client.run_blocking(lambda: list(itertools.islice(rows, chunk_size)))
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await self.client.run_blocking(rows.close)
+
+    async def _request_listings_report(self) -> Dict:
+        """Raporu oluştur, hazır olana kadar bekle ve doküman bilgisini döndür"""
+        created = await self._reports_call(
+            "create_report",
+            reportType=MERCHANT_LISTINGS_REPORT,
+            marketplaceIds=[self.marketplace.marketplace_id]
+        )
+        report_id = created.payload["reportId"]
+
+        while True:
+            report = (await self._reports_call("get_report", reportId=report_id)).payload
+            status = report.get("processingStatus")
+            if status == "DONE":
+                break
+            if status in ("CANCELLED", "FATAL"):
+                raise RuntimeError(f"Rapor {report_id} oluşturulamadı: {status}")
+            await asyncio.sleep(REPORT_POLL_INTERVAL_SECONDS)
+
+        document = await self._reports_call(
+            "get_report_document", reportDocumentId=report["reportDocumentId"]
+        )
+        return document.payload
+
+    def _iter_report_rows(self, url: str, compression: Optional[str]) -> Iterator[Dict]:
+        """Rapor dokümanını indirirken satır satır ayrıştır"""
+        with requests.get(url, stream=True, timeout=(10, 300)) as response:
+            response.raise_for_status()
+            raw = response.raw
+            raw.decode_content = True
+            if compression == "GZIP":
+                raw = gzip.GzipFile(fileobj=raw)
+
+            text = io.TextIOWrapper(raw, encoding=response.encoding or "utf-8", errors="replace", newline="")
+            reader = csv.DictReader(text, delimiter="\t", quoting=csv.QUOTE_NONE)
+            for row in reader:
+                product = self._parse_listing_row(row)
+                if product:
+                    yield product
+
+    def _parse_listing_row(self, row: Dict) -> Optional[Dict]:
+        """Merchant listings rapor satırını ürün formatına dönüştür"""
+        asin = row.get("asin1") or (row.get("product-id") if row.get("product-id-type") == "1" else None)
+        if not asin:
+            return None
+
+        try:
+            price = float((row.get("price") or "").replace(",", "."))
+        except ValueError:
+            price = None
+
+        # Raporda olmayan alanlar (kategori, marka) mevcut değerleri ezmesin diye eklenmez
+        product = {
+            "asin": asin.strip().upper(),
+            "sku": row.get("seller-sku"),
+            "title": row.get("item-name") or "",
+            "description": row.get("item-description") or "",
+            "currency": "TRY"
+        }
+        if price is not None:
+            product["price"] = price
+        if row.get("image-url"):
+            product["image_urls"] = [row["image-url"]]
+        return product
 
     async def get_product_details(self, asin: str) -> Optional[Dict]:
         """Belirli bir ASIN için ürün detaylarını çek"""
+        details = await self.get_products_details([asin])
+        return details.get(asin.strip().upper())
+
+    async def get_products_details(self, asins: List[str]) -> Dict[str, Optional[Dict]]:
+        """Birden fazla ASIN için detayları toplu ve birleştirilmiş çağrılarla çek"""
+        loop = asyncio.get_running_loop()
+        normalized = list(dict.fromkeys(a.strip().upper() for a in asins if a and a.strip()))
+
+        waiting: Dict[str, asyncio.Future] = {}
+        to_fetch = []
+        for asin in normalized:
+            # Aynı anda uçuşta olan bir sorgu varsa ona katıl
+            future = self._inflight.get(asin)
+            if future is None:
+                future = loop.create_future()
+                self._inflight[asin] = future
+                to_fetch.append(asin)
+            waiting[asin] = future
+
+        for i in range(0, len(to_fetch), SEARCH_CATALOG_MAX_IDENTIFIERS):
+            chunk = to_fetch[i:i + SEARCH_CATALOG_MAX_IDENTIFIERS]
+            # Çağıran iptal edilse de diğer bekleyenler için sorgu tamamlanır
+            task = asyncio.create_task(self._fetch_details_batch(chunk))
+            self._fetch_tasks.add(task)
+            task.add_done_callback(self._fetch_tasks.discard)
+
+        results = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+        return dict(zip(waiting.keys(), results))
+
+    async def _fetch_details_batch(self, asins: List[str]):
+        """En fazla 20 ASIN'i tek searchCatalogItems çağrısıyla çek ve bekleyenleri çöz"""
+        found: Dict[str, Dict] = {}
         try:
-            catalog_api = CatalogItems(credentials=self.credentials, marketplace=self.marketplace)
-            
-            # Gerçek API çağrısı için:
-            # result = catalog_api.get_catalog_item(asin=asin)
-            
-            # Simulated response for development
-            product_detail = {
-                "asin": asin,
-                "title": "Örnek Ürün Detayı",
-                "description": "Detaylı ürün açıklaması buraya gelecek.",
-                "price": 199.99,
-                "currency": "TRY",
-                "image_urls": [
-                    "https://example.com/image1.jpg",
-                    "https://example.com/image2.jpg"
-                ],
-                "category": "Elektronik",
-                "brand": "Örnek Marka",
-                "features": [
-                    "Özellik 1",
-                    "Özellik 2",
-                    "Özellik 3"
-                ]
-            }
-            
-            return product_detail
-            
+            if self.has_credentials:
+                response = await self._catalog_call(
+                    "search_catalog_items",
+                    identifiers=",".join(asins),
+                    identifiersType="ASIN",
+                    marketplaceIds=self.marketplace.marketplace_id,
+                    includedData=CATALOG_INCLUDED_DATA,
+                    pageSize=SEARCH_CATALOG_MAX_IDENTIFIERS
+                )
+                for item in response.payload.get("items", []):
+                    product = self._parse_catalog_item(item)
+                    found[product["asin"]] = product
+            else:
+                found = {asin: self._simulated_product_detail(asin) for asin in asins}
         except Exception as e:
-            print(f"Amazon API Error for ASIN {asin}: {e}")
-            return None
+            print(f"Amazon API Error for ASINs {','.join(asins)}: {e}")
+        finally:
+            for asin in asins:
+                future = self._inflight.pop(asin, None)
+                if future is not None and not future.done():
+                    future.set_result(found.get(asin))
+
+    def _simulated_product_detail(self, asin: str) -> Dict:
+        # Simulated response for development
+        return {
+            "asin": asin,
+            "title": "Örnek Ürün Detayı",
+            "description": "Detaylı ürün açıklaması buraya gelecek.",
+            "price": 199.99,
+            "currency": "TRY",
+            "image_urls": [
+                "https://example.com/image1.jpg",
+                "https://example.com/image2.jpg"
+            ],
+            "category": "Elektronik",
+            "brand": "Örnek Marka",
+            "features": [
+                "Özellik 1",
+                "Özellik 2",
+                "Özellik 3"
+            ]
+        }
+
+    def _parse_catalog_item(self, item: Dict) -> Dict:
+        """Catalog Items 2022-04-01 yanıtını uygulama ürün formatına dönüştür"""
+        summary = (item.get("summaries") or [{}])[0]
+        attributes = item.get("attributes") or {}
+
+        def first_value(name: str):
+            values = attributes.get(name) or [{}]
+            return values[0].get("value")
+
+        # Her görsel varyantı için en büyük çözünürlüğü al
+        best_images = {}
+        for group in item.get("images") or []:
+            for image in group.get("images") or []:
+                variant = image.get("variant", "MAIN")
+                if variant not in best_images or image.get("height", 0) > best_images[variant].get("height", 0):
+                    best_images[variant] = image
+
+        list_price = (attributes.get("list_price") or [{}])[0]
+        browse = summary.get("browseClassification") or {}
+
+        return {
+            "asin": item.get("asin"),
+            "title": summary.get("itemName", ""),
+            "description": first_value("product_description") or "",
+            "price": list_price.get("value"),
+            "currency": list_price.get("currency", "TRY"),
+            "image_urls": [image["link"] for image in best_images.values()],
+            "category": browse.get("displayName") or summary.get("websiteDisplayGroupName"),
+            "brand": summary.get("brand") or summary.get("brandName"),
+            "features": [b.get("value") for b in attributes.get("bullet_point") or [] if b.get("value")]
+        }
 
-amazon_service = AmazonService()
\ No newline at end of file
+amazon_service = AmazonService()
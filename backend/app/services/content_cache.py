@@ -0,0 +1,78 @@
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.database import get_database
+from app.services.product_sync_service import product_digest
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+import hashlib
+
+# Prompt'a giren ürün alanları; diğer alanlar değişse de cache geçerli kalır
+PROMPT_FIELDS = ("title", "description", "price", "currency", "category", "brand")
+
+class GeneratedContentCache:
+    """Üretilen gönderiler için Mongo tabanlı cache.
+
+    Anahtar; prompt'ta kullanılan ürün alanlarının özeti, platform, stil ve
+    prompt şablon sürümünden oluşur. Kayıtlar `expires_at` üzerindeki TTL
+    indeksiyle silinir.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.counters = {"hits": 0, "misses": 0, "rejected": 0, "writes": 0, "tokens_saved": 0}
+
+    def make_key(self, product: Dict, platform: str, style: str, prompt_version: str) -> str:
+        digest = product_digest(product, PROMPT_FIELDS)
+        raw = f"{digest}|{platform}|{style}|{prompt_version}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str, accept: Optional[Callable[[str], Awaitable[bool]]] = None) -> Optional[str]:
+        """Geçerli kaydın içeriği; `accept` içeriği reddederse kayıt ıska sayılır"""
+        db = get_database()
+        # TTL monitörü dakikada bir çalışır; süresi dolan kayıt okunmamalı
+        entry = await db.generated_content_cache.find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"content": 1, "total_tokens": 1}
+        )
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        if accept is not None and not await accept(entry["content"]):
+            self.counters["misses"] += 1
+            self.counters["rejected"] += 1
+            return None
+        self.counters["hits"] += 1
+        self.counters["tokens_saved"] += entry.get("total_tokens", 0)
+        return entry["content"]
+
+    async def put(self, key: str, content: str, total_tokens: int, platform: str, style: str, prompt_version: str):
+        db = get_database()
+        now = datetime.utcnow()
+        try:
+            await db.generated_content_cache.replace_one(
+                {"_id": key},
+                {
+                    "content": content,
+                    "total_tokens": total_tokens,
+                    "platform": platform,
+                    "style": style,
+                    "prompt_version": prompt_version,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                },
+                upsert=True
+            )
+            self.counters["writes"] += 1
+        except DuplicateKeyError:
+            # Aynı anahtar eşzamanlı yazıldı; ilk kayıt yeterli
+            pass
+
+    def stats(self) -> Dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+generated_content_cache = GeneratedContentCache(ttl_seconds=settings.AI_CONTENT_CACHE_TTL_SECONDS)
@@ -0,0 +1,275 @@
+from app.core.config import settings
+from app.core.database import get_database
+from app.services.search_index import tokenize
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import numpy as np
+import re
+import time
+
+# 32 permütasyon, 4 satırlık 8 bant: Jaccard 0.8 olan çift %98 olasılıkla aday olur
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4  # bayt
+PENDING_MERGE_SIZE = 4096
+
+_rng = np.random.default_rng(20240101)
+# Çarp-kaydır (multiply-shift) hash ailesi: (a·x + b) mod 2^64 değerinin üst 32 biti
+_PERM_A = _rng.integers(1, 1 << 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 1 << 63, size=ROWS, dtype=np.uint64) | np.uint64(1)
+
+_HASHTAG_RE = re.compile(r"#\w+")
+_URL_RE = re.compile(r"https?://\S+")
+
+def normalize(content: Optional[str]) -> str:
+    """Hashtag ve bağlantılar çıkarılmış, Türkçe katlanmış metin"""
+    text = " ".join(tokenize(_URL_RE.sub(" ", _HASHTAG_RE.sub(" ", content or ""))))
+    return text.ljust(SHINGLE_SIZE) if text else ""
+
+def minhash_signatures(contents: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """İçerik listesinin MinHash imzalarını tek vektörel geçişte hesapla.
+
+    Shingle'lar UTF-8 metnin 4 baytlık pencereleridir ve doğrudan 32 bitlik
+    tamsayı olarak kullanılır; ayrı bir hash adımı gerekmez. Tekrarlayan
+    shingle'lar minimumu değiştirmediği için ayıklanmaz. (imzalar, geçerli)
+    döner; boş içerikler imza üretmez.
+    """
+    encoded = [normalize(content).encode("utf-8") for content in contents]
+    lengths = np.fromiter((len(text) for text in encoded), dtype=np.int64, count=len(encoded))
+    valid = lengths > 0
+    if not valid.any():
+        return np.empty((0, NUM_PERM), dtype=np.uint32), valid
+
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    windows = (buffer[:-3] << np.uint64(24)) | (buffer[1:-2] << np.uint64(16)) | (buffer[2:-1] << np.uint64(8)) | buffer[3:]
+    # Metin sınırlarını aşan pencereler atlanır
+    counts = lengths[valid] - (SHINGLE_SIZE - 1)
+    offsets = (np.cumsum(lengths) - lengths)[valid]
+    group_starts = np.cumsum(counts) - counts
+    positions = np.repeat(offsets - group_starts, counts) + np.arange(counts.sum())
+
+    # (permütasyon, shingle) düzeni reduceat'i bitişik bellek üzerinde çalıştırır
+    hashed = ((_PERM_A[:, None] * windows[positions] + _PERM_B[:, None]) >> np.uint64(32)).astype(np.uint32)
+    return np.minimum.reduceat(hashed, group_starts, axis=1).T.copy(), valid
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """Her bandın satırlarını tek bir 64 bitlik anahtara indir"""
+    banded = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    return (banded * _BAND_MULTIPLIERS).sum(axis=2)
+
+class MinHashLSHIndex:
+    """Tek kullanıcının gönderileri için MinHash-LSH indeksi.
+
+    Bant anahtarları sıralı numpy dizilerinde tutulur ve `searchsorted` ile
+    aranır; yeni eklemeler küçük bir sözlükte bekler ve dolunca sıralı
+    dizilere katılır. Silinen gönderilerin satırları birleştirmede atılır.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.signatures = np.empty((1024, NUM_PERM), dtype=np.uint32)
+        self.size = 0
+        self.post_ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.keys = [np.empty(0, dtype=np.uint64) for _ in range(BANDS)]
+        self.key_rows = [np.empty(0, dtype=np.int64) for _ in range(BANDS)]
+        self.pending: List[Dict[int, List[int]]] = [{} for _ in range(BANDS)]
+        self.pending_count = 0
+        self._bulk: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _append_rows(self, post_ids: List[str], signatures: np.ndarray) -> np.ndarray:
+        for post_id in post_ids:
+            if post_id in self.rows:
+                self.remove(post_id)
+        needed = self.size + len(post_ids)
+        if needed > len(self.signatures):
+            grown = np.empty((max(needed, len(self.signatures) * 2), NUM_PERM), dtype=np.uint32)
+            grown[:self.size] = self.signatures[:self.size]
+            self.signatures = grown
+        rows = np.arange(self.size, needed, dtype=np.int64)
+        self.signatures[self.size:needed] = signatures
+        for post_id, row in zip(post_ids, rows.tolist()):
+            self.rows[post_id] = row
+        self.post_ids.extend(post_ids)
+        self.size = needed
+        return rows
+
+    def add_many(self, post_ids: List[str], signatures: np.ndarray, keys: np.ndarray, bulk: bool = False):
+        """Gönderileri ekle; `bulk` açıkken anahtarlar `finish_bulk`'ta tek seferde sıralanır"""
+        rows = self._append_rows(post_ids, signatures)
+        if bulk:
+            self._bulk.append((keys, rows))
+            return
+        for key_row, row in zip(keys.tolist(), rows.tolist()):
+            for band, key in enumerate(key_row):
+                self.pending[band].setdefault(key, []).append(row)
+        self.pending_count += len(rows)
+        if self.pending_count >= PENDING_MERGE_SIZE:
+            self._merge()
+
+    def finish_bulk(self):
+        self._merge()
+
+    def _merge(self):
+        alive = np.fromiter((post_id is not None for post_id in self.post_ids), dtype=bool, count=self.size)
+        for band in range(BANDS):
+            key_parts = [self.keys[band]] + [keys[:, band] for keys, _ in self._bulk]
+            row_parts = [self.key_rows[band]] + [rows for _, rows in self._bulk]
+            pending = self.pending[band]
+            if pending:
+                key_parts.append(np.fromiter(
+                    (key for key, rows in pending.items() for _ in rows), dtype=np.uint64
+                ))
+                row_parts.append(np.fromiter(
+                    (row for rows in pending.values() for row in rows), dtype=np.int64
+                ))
+            keys = np.concatenate(key_parts)
+            rows = np.concatenate(row_parts)
+            keep = alive[rows]
+            keys, rows = keys[keep], rows[keep]
+            order = np.argsort(keys, kind="stable")
+            self.keys[band] = keys[order]
+            self.key_rows[band] = rows[order]
+            self.pending[band] = {}
+        self._bulk = []
+        self.pending_count = 0
+
+    def remove(self, post_id: str):
+        row = self.rows.pop(post_id, None)
+        if row is not None:
+            # Satır bir sonraki birleştirmede dizilerden atılır
+            self.post_ids[row] = None
+
+    def nearest(self, signature: np.ndarray, keys: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Benzerlik eşiğini geçen en benzer gönderi ve tahmini Jaccard benzerliği"""
+        candidates = []
+        for band, key in enumerate(keys):
+            # Anahtar numpy uint64 kalmalı; Python int tüm diziyi float'a çevirtir
+            band_keys_sorted = self.keys[band]
+            lo = np.searchsorted(band_keys_sorted, key, side="left")
+            hi = np.searchsorted(band_keys_sorted, key, side="right")
+            if hi > lo:
+                candidates.append(self.key_rows[band][lo:hi])
+            pending_rows = self.pending[band].get(int(key))
+            if pending_rows:
+                candidates.append(np.array(pending_rows, dtype=np.int64))
+        if not candidates:
+            return None
+        rows = np.unique(np.concatenate(candidates))
+        rows = rows[[self.post_ids[row] is not None for row in rows.tolist()]]
+        if rows.size == 0:
+            return None
+        similarity = (self.signatures[rows] == signature).mean(axis=1)
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.threshold:
+            return None
+        return self.post_ids[int(rows[best])], float(similarity[best])
+
+class DuplicatePostIndex:
+    """Kullanıcı başına gönderi içeriklerinin yakın-kopya indeksi.
+
+    Açılışta `social_media_posts` tek geçişte okunarak paketler halinde
+    toplu kurulur; yeni gönderiler kaydedildikçe eklenir. İndeks hazır
+    olmadan yapılan sorgular kopya bulunmadı olarak döner.
+    """
+
+    def __init__(self, threshold: float, batch_size: int = 2000):
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.indexes: Dict[str, MinHashLSHIndex] = {}
+        self.ready = False
+        self.build_ms: Optional[float] = None
+        self._build_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._build_task is None:
+            self._build_task = asyncio.create_task(self.build())
+
+    async def stop(self):
+        if self._build_task and not self._build_task.done():
+            self._build_task.cancel()
+        self._build_task = None
+
+    def _index(self, user_id) -> MinHashLSHIndex:
+        key = str(user_id)
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = MinHashLSHIndex(self.threshold)
+        return index
+
+    def _sign(self, posts: List[Dict]) -> Tuple[List[Dict], np.ndarray, np.ndarray]:
+        """İmzaları ve bant anahtarlarını hesapla; boş içerikli gönderiler atlanır"""
+        signatures, valid = minhash_signatures([post.get("content") for post in posts])
+        posts = [post for post, is_valid in zip(posts, valid.tolist()) if is_valid]
+        return posts, signatures, band_keys(signatures)
+
+    def _insert(self, posts: List[Dict], signatures: np.ndarray, keys: np.ndarray, bulk: bool = False):
+        by_user: Dict[str, List[int]] = {}
+        for i, post in enumerate(posts):
+            by_user.setdefault(str(post.get("user_id")), []).append(i)
+        for user_id, positions in by_user.items():
+            self._index(user_id).add_many(
+                [str(posts[i]["_id"]) for i in positions], signatures[positions], keys[positions], bulk=bulk
+            )
+
+    async def build(self):
+        """Tüm gönderileri paketler halinde imzalayıp toplu indeksle"""
+        db = get_database()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            cursor = db.social_media_posts.find({}, {"user_id": 1, "content": 1}).batch_size(5000)
+            batch: List[Dict] = []
+            async for post in cursor:
+                batch.append(post)
+                if len(batch) >= self.batch_size:
+                    # İmza hesabı event loop'u bloklamamak için iş parçacığında yapılır
+                    self._insert(*await loop.run_in_executor(None, self._sign, batch), bulk=True)
+                    batch = []
+            if batch:
+                self._insert(*await loop.run_in_executor(None, self._sign, batch), bulk=True)
+            for index in self.indexes.values():
+                index.finish_bulk()
+            self.ready = True
+            self.build_ms = round((time.perf_counter() - started) * 1000, 2)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Duplicate index build error: {e}")
+
+    def add(self, user_id, post_id, content: Optional[str]):
+        self._insert(*self._sign([{"_id": post_id, "user_id": user_id, "content": content}]))
+
+    def remove(self, user_id, post_id):
+        index = self.indexes.get(str(user_id))
+        if index is not None:
+            index.remove(str(post_id))
+
+    def find(self, user_id, content: Optional[str]) -> Optional[Dict]:
+        """İçeriğe yakın kopya bir gönderi varsa kimliğini ve benzerliğini döndür"""
+        index = self.indexes.get(str(user_id))
+        if not self.ready or index is None:
+            return None
+        signatures, valid = minhash_signatures([content])
+        if not valid[0]:
+            return None
+        match = index.nearest(signatures[0], band_keys(signatures)[0])
+        if match is None:
+            return None
+        return {"post_id": match[0], "similarity": round(match[1], 3)}
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "users": len(self.indexes),
+            "posts": sum(len(index) for index in self.indexes.values()),
+            "threshold": self.threshold,
+            "build_ms": self.build_ms
+        }
+
+duplicate_index = DuplicatePostIndex(threshold=settings.DUPLICATE_SIMILARITY_THRESHOLD)
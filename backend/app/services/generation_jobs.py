@@ -0,0 +1,277 @@
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.rate_limit import TokenBucket
+from app.services.ai_service import ai_content_service
+from app.services.duplicate_index import duplicate_index
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import os
+import socket
+
+DUPLICATE_KEY_ERROR = 11000
+
+class LeaseLost(Exception):
+    pass
+
+class GenerationJobRunner:
+    """Ürün filtresi × platform listesi için toplu gönderi üretim işleri.
+
+    İşler `generation_jobs` koleksiyonunda kuyruklanır ve lease ile alınır.
+    Üretimler küresel bir eşzamanlılık sınırı ve dakikalık token bütçesi
+    altında çalışır; gönderiler `social_media_posts`'a toplu eklenir.
+    Yarım kalan bir iş yeniden alındığında bu işte zaten yazılmış
+    (ürün, platform) çiftleri üretilmeden atlanır; (job_id, product_id,
+    platform) benzersiz indeksi yarışta kalan tekrarları engeller. Her
+    sahiplenme ayrı bir claim belirteci taşır; lease'i kaybeden süreç iş
+    dokümanını güncelleyemez ve durur.
+    """
+
+    def __init__(self, concurrency: int, tokens_per_minute: int, tokens_per_post: int,
+                 insert_batch_size: int, lease_seconds: int, poll_seconds: int):
+        self.concurrency = concurrency
+        self.tokens_per_post = tokens_per_post
+        self.insert_batch_size = insert_batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._token_budget = TokenBucket(rate=tokens_per_minute / 60.0, burst=tokens_per_minute)
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+    def _product_query(self, user_id, product_filter: Dict) -> Dict:
+        query = {"user_id": user_id}
+        if product_filter.get("category"):
+            query["category"] = product_filter["category"]
+        if product_filter.get("brand"):
+            query["brand"] = product_filter["brand"]
+        if product_filter.get("asins"):
+            query["asin"] = {"$in": product_filter["asins"]}
+        return query
+
+    async def submit(self, user_id, product_filter: Dict, platforms: List[str], style: str = "engaging") -> Dict:
+        """Yeni bir toplu üretim işi kuyrukla"""
+        db = get_database()
+        product_count = await db.products.count_documents(self._product_query(user_id, product_filter))
+        job = {
+            "user_id": user_id,
+            "product_filter": product_filter,
+            "platforms": platforms,
+            "style": style,
+            "status": "queued",
+            "total": product_count * len(platforms),
+            "completed": 0,
+            "failed": 0,
+            "fallbacks": 0,
+            "duplicates": 0,
+            "tokens_used": 0,
+            "created_at": datetime.utcnow()
+        }
+        result = await db.generation_jobs.insert_one(job)
+        job["_id"] = result.inserted_id
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        db = get_database()
+        if not ObjectId.is_valid(job_id):
+            return None
+        return await db.generation_jobs.find_one({"_id": ObjectId(job_id)}, {"owner": 0, "claim": 0, "lease_until": 0})
+
+    async def _run_forever(self):
+        while True:
+            try:
+                job = await self._claim()
+                if job is None:
+                    await asyncio.sleep(self.poll_seconds)
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Generation job runner error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _claim(self) -> Optional[Dict]:
+        """Kuyruktaki ya da lease'i dolmuş bir işi atomik olarak al"""
+        db = get_database()
+        now = datetime.utcnow()
+        return await db.generation_jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_until": {"$lt": now}}
+            ]},
+            {"$set": {
+                "status": "running",
+                "owner": self.owner,
+                "claim": str(ObjectId()),
+                "started_at": now,
+                "lease_until": now + timedelta(seconds=self.lease_seconds)
+            }},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _run(self, job: Dict):
+        db = get_database()
+        pending: List[Dict] = []
+        progress = {"failed": 0, "fallbacks": 0, "duplicates": 0, "tokens_used": 0}
+        in_flight = set()
+
+        async def generate(product: Dict, platform: str):
+            await self._token_budget.acquire(self.tokens_per_post)
+            async with self._semaphore:
+                result = await ai_content_service.generate_post_result(
+                    product, platform, job["style"], user_id=job["user_id"]
+                )
+            # Tahmin gerçek kullanımdan düşükse farkı bütçeden düş
+            extra = result["usage"]["total_tokens"] - self.tokens_per_post
+            if extra > 0:
+                await self._token_budget.acquire(extra)
+            progress["tokens_used"] += result["usage"]["total_tokens"]
+            if result.get("duplicate_of") or result.get("existing_post"):
+                # Bu ürün için kaydedilmiş gönderinin aynısı tekrar eklenmez
+                progress["duplicates"] += 1
+                return
+            # Aynı işte eşzamanlı üretilen benzer içerikler de birbirine karşı kontrol edilir;
+            # kontrol ile ekleme arasında await olmadığından yarış oluşmaz
+            if duplicate_index.find(job["user_id"], result["content"]):
+                progress["duplicates"] += 1
+                return
+            if result["source"] == "fallback":
+                progress["fallbacks"] += 1
+            post_id = ObjectId()
+            duplicate_index.add(job["user_id"], post_id, result["content"])
+            pending.append({
+                "_id": post_id,
+                "user_id": job["user_id"],
+                "product_id": str(product["_id"]),
+                "platform": platform,
+                "content": result["content"],
+                "ai_generated": result["source"] != "fallback",
+                "posted": False,
+                "job_id": job["_id"],
+                "created_at": datetime.utcnow()
+            })
+
+        async def drain(wait_all: bool = False):
+            if in_flight:
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.ALL_COMPLETED if wait_all else asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    in_flight.discard(task)
+                    if task.exception() is not None:
+                        progress["failed"] += 1
+                        print(f"Bulk generation error in job {job['_id']}: {task.exception()}")
+            if len(pending) >= self.insert_batch_size or (wait_all and pending):
+                await self._flush(db, job, pending, progress)
+
+        async def cancel_in_flight():
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            in_flight.clear()
+            # Yazılmayacak adaylar kopya indeksinden çıkarılır
+            for post in pending:
+                duplicate_index.remove(job["user_id"], post["_id"])
+            pending.clear()
+
+        try:
+            done_pairs = await self._existing_pairs(db, job)
+            cursor = db.products.find(self._product_query(job["user_id"], job["product_filter"]))
+            async for product in cursor:
+                for platform in job["platforms"]:
+                    if (str(product["_id"]), platform) in done_pairs:
+                        # Önceki sahiplenmede yazılmış; yeniden üretilmez
+                        continue
+                    # Bellekte en fazla concurrency * 2 bekleyen üretim tutulur
+                    while len(in_flight) >= self.concurrency * 2:
+                        await drain()
+                    in_flight.add(asyncio.create_task(generate(product, platform)))
+            while in_flight:
+                await drain(wait_all=True)
+            await self._flush(db, job, pending, progress)
+            await db.generation_jobs.update_one(
+                {"_id": job["_id"], "claim": job["claim"]},
+                {"$set": {"status": "completed", "finished_at": datetime.utcnow(), "lease_until": None}}
+            )
+        except (asyncio.CancelledError, LeaseLost) as e:
+            await cancel_in_flight()
+            if isinstance(e, LeaseLost):
+                print(f"Generation job {job['_id']} lease lost; stopping")
+                return
+            raise
+        except Exception as e:
+            # Sahipsiz üretimler semafor ve token bütçesini tüketmeye devam etmesin
+            await cancel_in_flight()
+            await db.generation_jobs.update_one(
+                {"_id": job["_id"], "claim": job["claim"]},
+                {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow(), "lease_until": None}}
+            )
+
+    async def _existing_pairs(self, db, job: Dict) -> Set[Tuple[str, str]]:
+        """Bu işte daha önce yazılmış (ürün, platform) çiftleri"""
+        pairs = set()
+        async for post in db.social_media_posts.find({"job_id": job["_id"]}, {"product_id": 1, "platform": 1}):
+            pairs.add((post["product_id"], post["platform"]))
+        return pairs
+
+    async def _flush(self, db, job: Dict, pending: List[Dict], progress: Dict):
+        """Bekleyen gönderileri tek insert_many ile yaz, ilerlemeyi ve lease'i güncelle"""
+        inserted: List[Dict] = []
+        if pending:
+            batch = pending[:]
+            pending.clear()
+            try:
+                await db.social_media_posts.insert_many(batch, ordered=False)
+                inserted = batch
+            except BulkWriteError as e:
+                # Önceki denemede yazılmış gönderiler tekrar eklenmez
+                write_errors = e.details.get("writeErrors", [])
+                failed_positions = {err["index"] for err in write_errors}
+                inserted = [post for i, post in enumerate(batch) if i not in failed_positions]
+                progress["failed"] += sum(1 for err in write_errors if err.get("code") != DUPLICATE_KEY_ERROR)
+            except Exception:
+                for post in batch:
+                    duplicate_index.remove(job["user_id"], post["_id"])
+                raise
+            # Adaylar üretilince kopya indeksine eklendi; yazılamayanlar çıkarılır
+            inserted_ids = {post["_id"] for post in inserted}
+            for post in batch:
+                if post["_id"] not in inserted_ids:
+                    duplicate_index.remove(job["user_id"], post["_id"])
+
+        increments = {"completed": len(inserted), **progress}
+        for key in progress:
+            progress[key] = 0
+        result = await db.generation_jobs.update_one(
+            {"_id": job["_id"], "claim": job["claim"]},
+            {
+                "$inc": increments,
+                "$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}
+            }
+        )
+        if result.matched_count == 0:
+            # İş başka bir sürece geçti; ilerleme orada sayılır
+            raise LeaseLost()
+
+generation_job_runner = GenerationJobRunner(
+    concurrency=settings.GENERATION_MAX_CONCURRENCY,
+    tokens_per_minute=settings.GENERATION_TOKENS_PER_MINUTE,
+    tokens_per_post=settings.GENERATION_TOKENS_PER_POST_ESTIMATE,
+    insert_batch_size=settings.GENERATION_INSERT_BATCH_SIZE,
+    lease_seconds=settings.GENERATION_JOB_LEASE_SECONDS,
+    poll_seconds=settings.GENERATION_JOB_POLL_SECONDS
+)
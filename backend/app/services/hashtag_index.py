@@ -0,0 +1,300 @@
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_database, id_variants
+from app.services.search_index import turkish_fold
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import heapq
+import re
+
+HASHTAG_RE = re.compile(r"#(\w+)")
+ALL_CATEGORIES = "_all"
+
+# Bayes yumuşatması: az gösterimli hashtag'ler ortalama orana çekilir
+PRIOR_IMPRESSIONS = 500.0
+
+def extract_hashtags(content: Optional[str]) -> Dict[str, str]:
+    """İçerikteki hashtag'ler; anahtar katlanmış biçim, değer ilk görülen yazım"""
+    tags: Dict[str, str] = {}
+    for match in HASHTAG_RE.findall(content or ""):
+        tags.setdefault(turkish_fold(match), f"#{match}")
+    return tags
+
+def _metric(metrics: Dict, *names: str) -> float:
+    for name in names:
+        if metrics.get(name) is not None:
+            try:
+                return float(metrics[name])
+            except (TypeError, ValueError):
+                return 0.0
+    return 0.0
+
+def engagement_of(metrics: Dict) -> Tuple[float, float]:
+    """Analitik kaydından (etkileşim, gösterim) çiftini çıkar; iki adlandırma da desteklenir"""
+    engagement = (
+        _metric(metrics, "likes", "like_count")
+        + _metric(metrics, "retweets", "retweet_count")
+        + _metric(metrics, "replies", "reply_count")
+        + _metric(metrics, "quotes", "quote_count")
+    )
+    return engagement, _metric(metrics, "impressions", "impression_count")
+
+class HashtagPerformanceIndex:
+    """Kategori başına hashtag performans indeksi.
+
+    Yayınlanan gönderilerdeki hashtag'ler `analytics` metrikleriyle
+    birleştirilir. Analitik kayıtları kümülatif anlık görüntüler olduğundan
+    her gönderinin yalnızca en son kaydı sayılır: yeni kayıt geldiğinde
+    gönderinin önceki katkısı çıkarılıp yenisi eklenir. `analytics` yalnızca
+    (collected_at, _id) filigranından sonrası için okunur; indeks bellekte
+    tutulur ve periyodik olarak Mongo'ya yazılır. Top-k sonuçları kategori
+    başına önceden sıralanmış tutulur, böylece istek başına hesaplama yapılmaz.
+    """
+
+    def __init__(self, refresh_seconds: int, snapshot_seconds: int, min_posts: int, batch_size: int = 1000):
+        self.refresh_seconds = refresh_seconds
+        self.snapshot_seconds = snapshot_seconds
+        self.min_posts = min_posts
+        self.batch_size = batch_size
+        # kategori -> katlanmış hashtag -> {tag, posts, engagement, impressions}
+        self.stats: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        # gönderi -> son uygulanan katkı
+        self.post_metrics: Dict[str, Dict] = {}
+        self.watermark: Optional[Tuple[datetime, ObjectId]] = None
+        self._rankings: Dict[str, List[Dict]] = {}
+        self._dirty_tags: Set[Tuple[str, str]] = set()
+        self._dirty_posts: Set[str] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            self._loop_task = None
+        try:
+            await self.snapshot()
+        except Exception as e:
+            print(f"Hashtag index snapshot error: {e}")
+
+    async def _run_forever(self):
+        try:
+            await self.load_snapshot()
+        except Exception as e:
+            print(f"Hashtag index load error: {e}")
+        last_snapshot = asyncio.get_running_loop().time()
+        while True:
+            try:
+                await self.refresh()
+                now = asyncio.get_running_loop().time()
+                if now - last_snapshot >= self.snapshot_seconds:
+                    await self.snapshot()
+                    last_snapshot = now
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Hashtag index refresh error: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def _apply(self, contribution: Optional[Dict], sign: int):
+        if not contribution:
+            return
+        for category in (contribution["category"], ALL_CATEGORIES):
+            bucket = self.stats[category]
+            for key, tag in contribution["tags"].items():
+                entry = bucket.get(key)
+                if entry is None:
+                    entry = bucket[key] = {"tag": tag, "posts": 0, "engagement": 0.0, "impressions": 0.0}
+                entry["posts"] += sign
+                entry["engagement"] += sign * contribution["engagement"]
+                entry["impressions"] += sign * contribution["impressions"]
+                self._dirty_tags.add((category, key))
+                if entry["posts"] <= 0:
+                    del bucket[key]
+
+    async def refresh(self) -> int:
+        """Filigrandan sonraki analitik kayıtlarını indekse uygula"""
+        async with self._lock:
+            db = get_database()
+            applied = 0
+            while True:
+                query = {}
+                if self.watermark is not None:
+                    collected_at, last_id = self.watermark
+                    query = {"$or": [
+                        {"collected_at": {"$gt": collected_at}},
+                        {"collected_at": collected_at, "_id": {"$gt": last_id}}
+                    ]}
+                batch = await db.analytics.find(
+                    query, {"post_id": 1, "metrics": 1, "collected_at": 1}
+                ).sort([("collected_at", 1), ("_id", 1)]).limit(self.batch_size).to_list(self.batch_size)
+                if not batch:
+                    break
+
+                # Toplu birleştirme: gönderiler ve ürün kategorileri tek sorguyla
+                post_ids = {record["post_id"] for record in batch if record.get("post_id") is not None}
+                posts = {
+                    str(post["_id"]): post
+                    async for post in db.social_media_posts.find(
+                        {"_id": {"$in": id_variants(post_ids)}}, {"content": 1, "product_id": 1}
+                    )
+                }
+                product_ids = {post.get("product_id") for post in posts.values() if post.get("product_id")}
+                categories = {
+                    str(product["_id"]): product.get("category") or "Diğer"
+                    async for product in db.products.find(
+                        {"_id": {"$in": id_variants(product_ids)}}, {"category": 1}
+                    )
+                }
+
+                for record in batch:
+                    post = posts.get(str(record.get("post_id")))
+                    if post is None:
+                        continue
+                    tags = extract_hashtags(post.get("content"))
+                    if not tags:
+                        continue
+                    post_key = str(post["_id"])
+                    engagement, impressions = engagement_of(record.get("metrics") or {})
+                    self._apply(self.post_metrics.get(post_key), -1)
+                    contribution = {
+                        "category": categories.get(str(post.get("product_id")), "Diğer"),
+                        "tags": tags,
+                        "engagement": engagement,
+                        "impressions": impressions
+                    }
+                    self.post_metrics[post_key] = contribution
+                    self._apply(contribution, 1)
+                    self._dirty_posts.add(post_key)
+                    applied += 1
+
+                last = batch[-1]
+                self.watermark = (last["collected_at"], last["_id"])
+                if len(batch) < self.batch_size:
+                    break
+
+            if applied:
+                self._rerank()
+            return applied
+
+    def _rerank(self):
+        """Kategori başına sıralamayı yeniden hesapla; okumalar bu listeden yapılır"""
+        global_stats = self.stats.get(ALL_CATEGORIES, {})
+        total_engagement = sum(entry["engagement"] for entry in global_stats.values())
+        total_impressions = sum(entry["impressions"] for entry in global_stats.values())
+        prior_rate = total_engagement / total_impressions if total_impressions else 0.0
+
+        rankings = {}
+        for category, bucket in self.stats.items():
+            ranked = []
+            for entry in bucket.values():
+                if entry["posts"] < self.min_posts:
+                    continue
+                score = (entry["engagement"] + prior_rate * PRIOR_IMPRESSIONS) / (entry["impressions"] + PRIOR_IMPRESSIONS)
+                ranked.append({
+                    "hashtag": entry["tag"],
+                    "posts": entry["posts"],
+                    "engagement_rate": round(entry["engagement"] / entry["impressions"] * 100, 2) if entry["impressions"] else 0.0,
+                    "score": round(score * 100, 4)
+                })
+            rankings[category] = heapq.nlargest(100, ranked, key=lambda item: item["score"])
+        self._rankings = rankings
+
+    def top(self, category: Optional[str] = None, k: int = 10) -> List[Dict]:
+        """Kategorinin en iyi k hashtag'i; eksik kalırsa genel sıralamayla tamamlanır"""
+        ranked = list(self._rankings.get(category or ALL_CATEGORIES, [])[:k])
+        if len(ranked) < k and category:
+            seen = {turkish_fold(item["hashtag"]) for item in ranked}
+            for item in self._rankings.get(ALL_CATEGORIES, []):
+                if len(ranked) >= k:
+                    break
+                if turkish_fold(item["hashtag"]) not in seen:
+                    ranked.append(item)
+        return ranked
+
+    def categories(self) -> List[str]:
+        return [category for category in self._rankings if category != ALL_CATEGORIES]
+
+    async def snapshot(self):
+        """Değişen hashtag istatistiklerini, gönderi katkılarını ve filigranı Mongo'ya yaz"""
+        async with self._lock:
+            db = get_database()
+            dirty_tags, self._dirty_tags = self._dirty_tags, set()
+            dirty_posts, self._dirty_posts = self._dirty_posts, set()
+            try:
+                await self._write_snapshot(db, dirty_tags, dirty_posts)
+            except Exception:
+                # Yazılamayan değişiklikler bir sonraki anlık görüntüde tekrar denenir
+                self._dirty_tags |= dirty_tags
+                self._dirty_posts |= dirty_posts
+                raise
+
+    async def _write_snapshot(self, db, dirty_tags: Set[Tuple[str, str]], dirty_posts: Set[str]):
+        tag_operations = []
+        for category, key in dirty_tags:
+            entry = self.stats.get(category, {}).get(key)
+            doc_id = f"{category}|{key}"
+            if entry is None:
+                tag_operations.append(UpdateOne({"_id": doc_id}, {"$set": {"posts": 0}}))
+            else:
+                tag_operations.append(UpdateOne(
+                    {"_id": doc_id}, {"$set": {"category": category, "key": key, **entry}}, upsert=True
+                ))
+        for i in range(0, len(tag_operations), self.batch_size):
+            await db.hashtag_stats.bulk_write(tag_operations[i:i + self.batch_size], ordered=False)
+
+        post_operations = [
+            UpdateOne({"_id": post_id}, {"$set": self.post_metrics[post_id]}, upsert=True)
+            for post_id in dirty_posts if post_id in self.post_metrics
+        ]
+        for i in range(0, len(post_operations), self.batch_size):
+            await db.hashtag_post_metrics.bulk_write(post_operations[i:i + self.batch_size], ordered=False)
+
+        if self.watermark is not None:
+            await db.hashtag_index_state.replace_one(
+                {"_id": "watermark"},
+                {"collected_at": self.watermark[0], "last_id": self.watermark[1], "updated_at": datetime.utcnow()},
+                upsert=True
+            )
+
+    async def load_snapshot(self):
+        """Son anlık görüntüyü belleğe yükle; ardından yalnızca yeni analitikler işlenir"""
+        async with self._lock:
+            db = get_database()
+            state = await db.hashtag_index_state.find_one({"_id": "watermark"})
+            if state is None:
+                return
+            self.stats = defaultdict(dict)
+            async for doc in db.hashtag_stats.find({"posts": {"$gt": 0}}):
+                self.stats[doc["category"]][doc["key"]] = {
+                    "tag": doc["tag"],
+                    "posts": doc["posts"],
+                    "engagement": doc["engagement"],
+                    "impressions": doc["impressions"]
+                }
+            self.post_metrics = {}
+            async for doc in db.hashtag_post_metrics.find({}):
+                post_id = doc.pop("_id")
+                self.post_metrics[post_id] = doc
+            self.watermark = (state["collected_at"], state["last_id"])
+            self._rerank()
+
+    def stats_summary(self) -> Dict:
+        return {
+            "categories": len(self.categories()),
+            "hashtags": len(self.stats.get(ALL_CATEGORIES, {})),
+            "posts": len(self.post_metrics),
+            "watermark": self.watermark[0] if self.watermark else None
+        }
+
+hashtag_index = HashtagPerformanceIndex(
+    refresh_seconds=settings.HASHTAG_INDEX_REFRESH_SECONDS,
+    snapshot_seconds=settings.HASHTAG_INDEX_SNAPSHOT_SECONDS,
+    min_posts=settings.HASHTAG_MIN_POSTS
+)
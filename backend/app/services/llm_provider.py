@@ -0,0 +1,132 @@
+import openai
+import httpx
+from app.core.config import settings
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import abc
+import asyncio
+import time
+
+class LLMProvider(abc.ABC):
+    """Sohbet tamamlama sağlayıcıları için ortak arayüz.
+
+    `complete` adayları ve token kullanımını döndürür, `stream` içerik
+    parçalarını geldikçe verir, `batch` birden çok isteği sınırlı
+    eşzamanlılıkla çalıştırır. Yeniden deneme ve devre kesici çağıran
+    serviste kalır; sağlayıcı yalnızca taşıma katmanıdır.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def complete(self, messages: List[Dict], max_tokens: int, temperature: float,
+                       n: int = 1, timeout: Optional[float] = None) -> Tuple[List[str], Dict]:
+        ...
+
+    @abc.abstractmethod
+    def stream(self, messages: List[Dict], max_tokens: int, temperature: float,
+               timeout: Optional[float] = None) -> AsyncIterator[str]:
+        ...
+
+    async def batch(self, requests: List[Dict], concurrency: int = 8) -> List[Tuple[object, float]]:
+        """Her biri `complete` argümanlarını içeren istekleri çalıştır.
+
+        Her istek için (sonuç ya da hata, süre) döner; süre devre kesicinin
+        yavaş çağrı takibi ve verim ölçümleri için istek başına ölçülür.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(request: Dict):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    result = await self.complete(**request)
+                except Exception as e:
+                    result = e
+                return result, time.monotonic() - started
+
+        return await asyncio.gather(*(run(request) for request in requests))
+
+    async def close(self):
+        pass
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI ve OpenAI uyumlu uç noktalar (base_url ile yerel stand-in sunucusu dahil)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None, timeout: float = 20.0,
+                 max_connections: int = 100, max_keepalive_connections: int = 20):
+        # Tüm istekler tek bir keep-alive bağlantı havuzunu paylaşır
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=30.0
+            ),
+            timeout=httpx.Timeout(timeout, connect=5.0)
+        )
+        # Yeniden denemeleri servis jitter'lı backoff ile kendisi yönetir
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            http_client=self.http_client,
+            max_retries=0
+        )
+        self.model = model
+        self.timeout = timeout
+
+    async def complete(self, messages: List[Dict], max_tokens: int, temperature: float,
+                       n: int = 1, timeout: Optional[float] = None) -> Tuple[List[str], Dict]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n,
+            timeout=timeout or self.timeout
+        )
+        usage = response.usage
+        return [(choice.message.content or "").strip() for choice in response.choices], {
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0
+        }
+
+    async def stream(self, messages: List[Dict], max_tokens: int, temperature: float,
+                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            timeout=timeout or self.timeout
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Tüketici erken bıraktığında bağlantı havuza geri döner
+            await stream.response.aclose()
+
+    async def close(self):
+        await self.client.close()
+
+PROVIDERS = {
+    "openai": OpenAIProvider
+}
+
+def create_provider() -> LLMProvider:
+    """Ayarlardaki sağlayıcıyı oluştur"""
+    provider_cls = PROVIDERS.get(settings.LLM_PROVIDER)
+    if provider_cls is None:
+        raise ValueError(f"Bilinmeyen LLM sağlayıcısı: {settings.LLM_PROVIDER}")
+    return provider_cls(
+        api_key=settings.OPENAI_API_KEY,
+        model=settings.OPENAI_MODEL,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=settings.OPENAI_TIMEOUT_SECONDS,
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS
+    )
@@ -0,0 +1,171 @@
+from string import Template
+from app.services.prompt_builder import fit_to_limit, platform_config
+from typing import Dict, List, Optional
+import re
+import zlib
+
+# Kategori adlarından şablon grubuna eşleme (küçük harf anahtar kelimeler)
+CATEGORY_GROUPS = {
+    "elektronik": "electronics", "teknoloji": "electronics", "bilgisayar": "electronics", "telefon": "electronics",
+    "giyim": "fashion", "moda": "fashion", "ayakkabı": "fashion", "aksesuar": "fashion",
+    "ev": "home", "mutfak": "home", "yaşam": "home", "bahçe": "home",
+    "kitap": "books", "edebiyat": "books"
+}
+
+CATEGORY_HASHTAGS = {
+    "electronics": ["#teknoloji", "#gadget", "#elektronik", "#innovation"],
+    "fashion": ["#moda", "#stil", "#trend", "#fashion"],
+    "home": ["#ev", "#dekorasyon", "#yaşam", "#home"],
+    "books": ["#kitap", "#okuma", "#edebiyat", "#book"],
+    "general": ["#fırsat", "#alışveriş", "#keşfet"]
+}
+
+CATEGORY_EMOJIS = {
+    "electronics": ["⚡", "📱", "🔋"],
+    "fashion": ["👗", "✨", "👟"],
+    "home": ["🏡", "🛋️", "🍽️"],
+    "books": ["📚", "📖", "☕"],
+    "general": ["🛍️", "✨", "🎁"]
+}
+
+BASE_HASHTAGS = ["#Amazon", "#İndirim", "#Alışveriş"]
+
+# Platform başına hashtag ve emoji üst sınırları
+PLATFORM_RULES = {
+    "twitter": {"hashtags": 3, "emojis": 2},
+    "instagram": {"hashtags": 8, "emojis": 4},
+    "tiktok": {"hashtags": 4, "emojis": 3}
+}
+
+# Stil başına şablon varyasyonları; $e1/$e2 emoji yuvalarıdır
+STYLE_TEMPLATES = {
+    "twitter": {
+        "engaging": [
+            Template("$e1 $title şimdi Amazon'da! $price ile kaçırma $e2"),
+            Template("$e1 Aradığın $noun burada: $title. Amazon'da $price $e2")
+        ],
+        "informative": [
+            Template("$e1 $title – $brand kalitesi Amazon'da $price. Detaylar profilde $e2"),
+            Template("$e1 $title: $highlight. Amazon'da $price $e2")
+        ],
+        "promotional": [
+            Template("$e1 FIRSAT: $title Amazon'da sadece $price! Stoklar tükenmeden al $e2"),
+            Template("$e1 Bugüne özel: $title $price. Hemen Amazon'dan sipariş ver $e2")
+        ]
+    },
+    "instagram": {
+        "engaging": [
+            Template("$e1 $title ile tanış! $e2\n\n$highlight\n\n$e3 Fiyat: $price\n$e4 Amazon'da seni bekliyor, bağlantı profilde!"),
+        ],
+        "informative": [
+            Template("$e1 $title\n\n$highlight\n\nMarka: $brand\nFiyat: $price $e2\n\nAmazon'dan güvenle sipariş ver $e3"),
+        ],
+        "promotional": [
+            Template("$e1 KAÇIRILMAYACAK FIRSAT $e2\n\n$title şimdi $price!\n\n$highlight\n\n$e3 Amazon'da sınırlı stok, hemen incele!"),
+        ]
+    },
+    "tiktok": {
+        "engaging": [Template("$e1 $title Amazon'da $price! $e2")],
+        "informative": [Template("$e1 $title: $highlight $e2")],
+        "promotional": [Template("$e1 Sadece $price! $title Amazon'da, koş $e2")]
+    }
+}
+
+CATEGORY_NOUNS = {
+    "electronics": "teknoloji", "fashion": "stil", "home": "ev konforu", "books": "kitap", "general": "ürün"
+}
+
+class LocalPostGenerator:
+    """Model çağırmadan, şablonlardan anında gönderi üreten yerel motor.
+
+    Şablonlar platform ve stile göre seçilir; emoji ve hashtag'ler ürün
+    kategorisinden gelir ve platform sınırlarına göre eklenir. Aynı ürün için
+    çıktı deterministiktir, `variant` farklı şablon/emoji seçimi sağlar.
+    """
+
+    def category_group(self, category: Optional[str]) -> str:
+        for word in re.findall(r"\w+", (category or "").lower()):
+            if word in CATEGORY_GROUPS:
+                return CATEGORY_GROUPS[word]
+        return "general"
+
+    def _format_price(self, product: Dict) -> str:
+        price = product.get("price")
+        currency = product.get("currency") or "TRY"
+        try:
+            formatted = f"{float(price):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        except (TypeError, ValueError):
+            return "uygun fiyata"
+        return f"{formatted} {'TL' if currency == 'TRY' else currency}"
+
+    def _highlight(self, product: Dict) -> str:
+        """Açıklamanın ilk cümlesi"""
+        description = " ".join(str(product.get("description") or "").split())
+        if not description:
+            return "Kalitesiyle fark yaratıyor"
+        sentence = re.split(r"(?<=[.!?])\s", description, maxsplit=1)[0]
+        return fit_to_limit(sentence, 120).rstrip(".")
+
+    def _brand_hashtag(self, brand: Optional[str]) -> Optional[str]:
+        tag = re.sub(r"\W", "", brand or "")
+        return f"#{tag}" if tag else None
+
+    def hashtags(self, product: Dict, platform: str, extra: Optional[List[str]] = None) -> List[str]:
+        """Platform sınırına göre hashtag listesi; önce verilen ek hashtag'ler"""
+        group = self.category_group(product.get("category"))
+        candidates = list(extra or []) + CATEGORY_HASHTAGS[group] + BASE_HASHTAGS
+        brand_tag = self._brand_hashtag(product.get("brand"))
+        if brand_tag:
+            candidates.insert(len(extra or []) + 1, brand_tag)
+        limit = PLATFORM_RULES.get(platform, PLATFORM_RULES["twitter"])["hashtags"]
+        seen = set()
+        result = []
+        for tag in candidates:
+            if tag.lower() not in seen:
+                seen.add(tag.lower())
+                result.append(tag)
+        return result[:limit]
+
+    def generate(self, product: Dict, platform: str = "twitter", style: str = "engaging", variant: int = 0,
+                 hashtags: Optional[List[str]] = None) -> str:
+        config = platform_config(platform)
+        rules = PLATFORM_RULES.get(platform, PLATFORM_RULES["twitter"])
+        templates = STYLE_TEMPLATES.get(platform, STYLE_TEMPLATES["twitter"])
+        options = templates.get(style, templates["engaging"])
+        group = self.category_group(product.get("category"))
+
+        # Aynı ürün için kararlı, variant ile değişen seçim
+        seed = zlib.crc32(f"{product.get('asin') or product.get('title')}|{style}".encode("utf-8")) + variant
+        template = options[seed % len(options)]
+        emojis = CATEGORY_EMOJIS[group]
+        emoji_slots = {
+            f"e{i + 1}": emojis[(seed + i) % len(emojis)] if i < rules["emojis"] else ""
+            for i in range(4)
+        }
+
+        # Uzun başlık fiyat ve çağrı cümlesini limit dışına itmesin
+        max_chars = config["max_chars"]
+        title = fit_to_limit(" ".join(str(product.get("title") or "Harika ürün").split()), max_chars // 2)
+        body = template.substitute(
+            title=title,
+            brand=product.get("brand") or "Amazon",
+            price=self._format_price(product),
+            highlight=self._highlight(product),
+            noun=CATEGORY_NOUNS[group],
+            **emoji_slots
+        )
+        body = re.sub(r"[ \t]{2,}", " ", body).strip()
+
+        # Hashtag'ler yalnızca karakter limitine sığdıkça eklenir
+        separator = "\n\n" if platform == "instagram" else " "
+        tags = self.hashtags(product, platform, hashtags)
+        body = fit_to_limit(body, max_chars)
+        added = []
+        for tag in tags:
+            candidate = body + separator + " ".join(added + [tag])
+            if len(candidate) > max_chars:
+                break
+            added.append(tag)
+        return body + separator + " ".join(added) if added else body
+
+local_post_generator = LocalPostGenerator()
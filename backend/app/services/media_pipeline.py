@@ -0,0 +1,411 @@
+import httpx
+from PIL import Image, ImageOps
+from app.core.config import settings
+from app.core.database import get_database
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+
+# Platform başına yükleme sınırları; kaynak bu sınırlara uyuyorsa yeniden kodlanmaz
+MEDIA_LIMITS = {
+    "twitter": {
+        "max_bytes": 5 * 1024 * 1024,
+        "max_dimension": 4096,
+        "formats": ("JPEG", "PNG")
+    },
+    "instagram": {
+        "max_bytes": 8 * 1024 * 1024,
+        "max_dimension": 1440,
+        "formats": ("JPEG",)
+    }
+}
+
+JPEG_QUALITY_START = 90
+JPEG_QUALITY_MIN = 60
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png"}
+EXIF_ORIENTATION = 0x0112
+# Yeni kullanılan dosyalar, yüklemeleri sürerken silinmesin diye tahliye edilmez
+EVICTION_GRACE_SECONDS = 300
+
+def _encode(image: Image.Image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+def normalize_image(data: bytes, limits: Dict) -> Tuple[bytes, str]:
+    """Resmi platform boyut ve format sınırlarına getir, (bayt, uzantı) döndür"""
+    max_bytes = limits["max_bytes"]
+    max_dimension = limits["max_dimension"]
+    with Image.open(io.BytesIO(data)) as source:
+        # Sınırlara zaten uyan dosya olduğu gibi kullanılır
+        if (source.format in limits["formats"] and len(data) <= max_bytes
+                and max(source.size) <= max_dimension
+                and source.getexif().get(EXIF_ORIENTATION, 1) == 1):
+            return data, EXTENSIONS[source.format]
+
+        source.seek(0)  # animasyonlu GIF/WebP'de ilk kare
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    if has_alpha:
+        if "PNG" in limits["formats"]:
+            encoded = _encode(image, "PNG", optimize=True)
+            if len(encoded) <= max_bytes:
+                return encoded, "png"
+        # Saydamlık JPEG'e beyaz zeminle düzleştirilir
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+
+    quality = JPEG_QUALITY_START
+    while True:
+        encoded = _encode(image, "JPEG", quality=quality, optimize=True, progressive=True)
+        if len(encoded) <= max_bytes:
+            return encoded, "jpg"
+        if quality > JPEG_QUALITY_MIN:
+            quality -= 10
+        else:
+            image = image.resize((max(1, int(image.width * 0.75)), max(1, int(image.height * 0.75))), Image.LANCZOS)
+
+class MediaDiskCache:
+    """İşlenmiş medya dosyaları için boyut sınırlı disk cache'i.
+
+    Dosyalar kaynak içeriğin özeti ve platformla adlandırılır
+    (`<sha256>-<platform>.<uzantı>`); aynı resim farklı URL'lerden gelse de
+    bir kez dönüştürülür. URL → dosya eşlemesi `url_index.json` içinde
+    tutulur, böylece bilinen bir URL için indirme de yapılmaz. Toplam boyut
+    aşıldığında en uzun süredir kullanılmayan dosyalar silinir.
+    """
+
+    INDEX_FILE = "url_index.json"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.files: Dict[str, List] = {}  # dosya adı -> [boyut, son kullanım]
+        self.url_index: Dict[str, str] = {}
+        self.total_bytes = 0
+        self.loaded = False
+
+    def load(self):
+        """Dizini tara ve URL indeksini oku (executor içinde çağrılır)"""
+        os.makedirs(self.directory, exist_ok=True)
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name != self.INDEX_FILE and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                self.files[entry.name] = [stat.st_size, stat.st_mtime]
+                self.total_bytes += stat.st_size
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), "r", encoding="utf-8") as f:
+                self.url_index = {key: name for key, name in json.load(f).items() if name in self.files}
+        except (OSError, ValueError):
+            self.url_index = {}
+        self.loaded = True
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def touch(self, name: str) -> Optional[str]:
+        entry = self.files.get(name)
+        if entry is None:
+            return None
+        entry[1] = time.time()
+        try:
+            os.utime(self.path(name))  # LRU sırası yeniden başlatmada korunur
+        except OSError:
+            self.files.pop(name, None)
+            self.total_bytes -= entry[0]
+            return None
+        return self.path(name)
+
+    def lookup_url(self, url_key: str) -> Optional[str]:
+        name = self.url_index.get(url_key)
+        return name if name and self.touch(name) else None
+
+    def lookup_source(self, source_hash: str, platform: str) -> Optional[str]:
+        prefix = f"{source_hash}-{platform}."
+        for name in self.files:
+            if name.startswith(prefix) and self.touch(name):
+                return name
+        return None
+
+    def write(self, name: str, data: bytes):
+        """Dosyayı atomik olarak yaz (executor içinde çağrılır)"""
+        tmp_path = self.path(name) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(name))
+
+    def add(self, name: str, size: int):
+        previous = self.files.get(name)
+        if previous is not None:
+            self.total_bytes -= previous[0]
+        self.files[name] = [size, time.time()]
+        self.total_bytes += size
+
+    def link(self, url_key: str, name: str):
+        self.url_index[url_key] = name
+
+    def evict(self) -> List[str]:
+        """Sınır aşıldıysa LRU dosyaları indeksten çıkar, silinecek yolları döndür"""
+        if self.total_bytes <= self.max_bytes:
+            return []
+        target = int(self.max_bytes * 0.9)
+        protected_after = time.time() - EVICTION_GRACE_SECONDS
+        removed = []
+        for name, (size, last_used) in sorted(self.files.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= target or last_used > protected_after:
+                break
+            del self.files[name]
+            self.total_bytes -= size
+            removed.append(self.path(name))
+        if removed:
+            self.url_index = {key: name for key, name in self.url_index.items() if name in self.files}
+        return removed
+
+    def persist(self, removed: List[str], url_index: Dict[str, str]):
+        """Silinen dosyaları kaldır ve URL indeksinin kopyasını kaydet (executor içinde çağrılır)"""
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        tmp_path = self.path(self.INDEX_FILE) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(url_index, f)
+        os.replace(tmp_path, self.path(self.INDEX_FILE))
+
+class MediaPipeline:
+    """Ürün resimlerini indir, platform sınırlarına göre işle ve yüklemeleri yeniden kullan.
+
+    İndirmeler paylaşılan keep-alive istemciyle, sınırlı eşzamanlılıkla ve
+    akış olarak yapılır; aynı URL için eşzamanlı istekler tek indirmeyi
+    bekler. Platform yüklemesinden dönen media_id'ler geçerlilik süresi
+    boyunca `media_uploads` koleksiyonunda saklanır, böylece aynı ürün
+    resmi birçok gönderide yalnızca bir kez indirilir, dönüştürülür ve
+    yüklenir.
+    """
+
+    def __init__(self, cache_dir: str, cache_max_bytes: int, max_concurrency: int,
+                 max_download_bytes: int, timeout: float, media_id_ttl: int, reuse_margin: int):
+        self.cache = MediaDiskCache(cache_dir, cache_max_bytes)
+        self.max_download_bytes = max_download_bytes
+        self.timeout = timeout
+        self.media_id_ttl = media_id_ttl
+        self.reuse_margin = reuse_margin
+        self.max_concurrency = max_concurrency
+        self.client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._load_lock = asyncio.Lock()
+        self._persist_lock = asyncio.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._media_ids: Dict[str, Tuple[str, datetime]] = {}
+        self.counters = {
+            "url_hits": 0, "source_hits": 0, "downloads": 0, "transcodes": 0,
+            "download_bytes": 0, "media_id_hits": 0, "uploads": 0, "errors": 0
+        }
+
+    def _http(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                follow_redirects=True
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _ensure_loaded(self):
+        if self.cache.loaded:
+            return
+        async with self._load_lock:
+            if not self.cache.loaded:
+                await asyncio.get_running_loop().run_in_executor(None, self.cache.load)
+
+    async def _download(self, url: str) -> bytes:
+        """Resmi akış olarak indir; boyut sınırını aşan yanıt erken kesilir"""
+        async with self._semaphore:
+            async with self._http().stream("GET", url) as response:
+                response.raise_for_status()
+                length = response.headers.get("content-length")
+                if length and length.isdigit() and int(length) > self.max_download_bytes:
+                    raise ValueError(f"Resim çok büyük: {length} bayt")
+                data = bytearray()
+                async for chunk in response.aiter_bytes():
+                    data.extend(chunk)
+                    if len(data) > self.max_download_bytes:
+                        raise ValueError(f"Resim {self.max_download_bytes} bayt sınırını aşıyor")
+        self.counters["downloads"] += 1
+        self.counters["download_bytes"] += len(data)
+        return bytes(data)
+
+    def _transcode(self, name_prefix: str, data: bytes, limits: Dict) -> Tuple[str, int]:
+        """Dönüştür ve diske yaz (executor içinde çalışır)"""
+        encoded, extension = normalize_image(data, limits)
+        name = f"{name_prefix}.{extension}"
+        self.cache.write(name, encoded)
+        return name, len(encoded)
+
+    async def _coalesce(self, key: str, factory: Callable[[], Awaitable]):
+        """Aynı anahtar için eşzamanlı çağrılar tek işi bekler"""
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # bekleyen yoksa "never retrieved" uyarısını önle
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _transcode_to_cache(self, name_prefix: str, data: bytes, platform: str) -> str:
+        name, size = await asyncio.get_running_loop().run_in_executor(
+            None, self._transcode, name_prefix, data, MEDIA_LIMITS[platform]
+        )
+        self.cache.add(name, size)
+        self.counters["transcodes"] += 1
+        return name
+
+    async def _prepare(self, url: str, platform: str, url_key: str) -> Dict:
+        data = await self._download(url)
+        source_hash = hashlib.sha256(data).hexdigest()
+
+        # Farklı URL'lerden gelen aynı resim bir kez dönüştürülür
+        name = self.cache.lookup_source(source_hash, platform)
+        if name is not None:
+            self.counters["source_hits"] += 1
+        else:
+            name_prefix = f"{source_hash}-{platform}"
+            name = await self._coalesce(
+                name_prefix, lambda: self._transcode_to_cache(name_prefix, data, platform)
+            )
+
+        self.cache.link(url_key, name)
+        removed = self.cache.evict()
+        async with self._persist_lock:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.cache.persist, removed, dict(self.cache.url_index)
+            )
+        return self._media_entry(name)
+
+    def _media_entry(self, name: str) -> Dict:
+        return {"key": name.rsplit(".", 1)[0], "path": self.cache.path(name), "filename": name}
+
+    async def prepare(self, url: str, platform: str = "twitter") -> Dict:
+        """URL'deki resmi platform için hazırla; cache'teki dosyayı tercih eder"""
+        if platform not in MEDIA_LIMITS:
+            raise ValueError(f"Platform '{platform}' için medya sınırları tanımlı değil")
+        await self._ensure_loaded()
+        url_key = hashlib.sha256(f"{platform}|{url}".encode("utf-8")).hexdigest()
+
+        name = self.cache.lookup_url(url_key)
+        if name is not None:
+            self.counters["url_hits"] += 1
+            return self._media_entry(name)
+        # Aynı URL'yi isteyen eşzamanlı yayınlar tek indirmeyi bekler
+        return await self._coalesce(url_key, lambda: self._prepare(url, platform, url_key))
+
+    async def prepare_many(self, urls: List[str], platform: str = "twitter") -> List[Dict]:
+        """Resimleri eşzamanlı hazırla; başarısız olanlar atlanır, sıra korunur"""
+        results = await asyncio.gather(*(self.prepare(url, platform) for url in urls), return_exceptions=True)
+        entries = []
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                self.counters["errors"] += 1
+                print(f"Media prepare error ({url}): {result}")
+            else:
+                entries.append(result)
+        return entries
+
+    async def _cached_media_id(self, upload_key: str) -> Optional[str]:
+        reuse_until = datetime.utcnow() + timedelta(seconds=self.reuse_margin)
+        cached = self._media_ids.get(upload_key)
+        if cached and cached[1] > reuse_until:
+            return cached[0]
+        try:
+            db = get_database()
+            doc = await db.media_uploads.find_one(
+                {"_id": upload_key, "expires_at": {"$gt": reuse_until}},
+                {"media_id": 1, "expires_at": 1}
+            )
+        except Exception as e:
+            print(f"Media upload cache read error: {e}")
+            return None
+        if doc is None:
+            return None
+        self._media_ids[upload_key] = (doc["media_id"], doc["expires_at"])
+        return doc["media_id"]
+
+    async def _remember_media_id(self, upload_key: str, platform: str, media_id: str, expires_after: Optional[int]):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=expires_after or self.media_id_ttl)
+        self._media_ids[upload_key] = (media_id, expires_at)
+        try:
+            db = get_database()
+            await db.media_uploads.replace_one(
+                {"_id": upload_key},
+                {"media_id": media_id, "platform": platform, "uploaded_at": now, "expires_at": expires_at},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Media upload cache write error: {e}")
+
+    async def media_id_for(self, platform: str, account: str, entry: Dict,
+                           upload: Callable[[Dict], Awaitable[Tuple[str, Optional[int]]]]) -> str:
+        """Geçerli media_id varsa yeniden kullan, yoksa `upload` ile yükle.
+
+        `upload` (media_id, geçerlilik saniyesi) döndürür. media_id'ler
+        yükleyen hesaba aittir, bu yüzden anahtar hesabı da içerir.
+        """
+        upload_key = f"{platform}|{account}|{entry['key']}"
+        media_id = await self._cached_media_id(upload_key)
+        if media_id is not None:
+            self.counters["media_id_hits"] += 1
+            return media_id
+
+        async def upload_once() -> str:
+            media_id, expires_after = await upload(entry)
+            self.counters["uploads"] += 1
+            await self._remember_media_id(upload_key, platform, media_id, expires_after)
+            return media_id
+
+        return await self._coalesce(upload_key, upload_once)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "cached_files": len(self.cache.files),
+            "cached_bytes": self.cache.total_bytes,
+            "cache_max_bytes": self.cache.max_bytes,
+            "known_urls": len(self.cache.url_index)
+        }
+
+media_pipeline = MediaPipeline(
+    cache_dir=settings.MEDIA_CACHE_DIR,
+    cache_max_bytes=settings.MEDIA_CACHE_MAX_BYTES,
+    max_concurrency=settings.MEDIA_DOWNLOAD_CONCURRENCY,
+    max_download_bytes=settings.MEDIA_DOWNLOAD_MAX_BYTES,
+    timeout=settings.MEDIA_DOWNLOAD_TIMEOUT_SECONDS,
+    media_id_ttl=settings.MEDIA_ID_TTL_SECONDS,
+    reuse_margin=settings.MEDIA_ID_REUSE_MARGIN_SECONDS
+)
@@ -0,0 +1,215 @@
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_database
+from app.services.twitter_service import twitter_service
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+
+# Gönderi yaşı -> toplama aralığı (saniye); etkileşim ilk saatlerde hızla değişir
+METRICS_SCHEDULE = [
+    (3600, 900),             # ilk saat: 15 dakikada bir
+    (86400, 3600),           # ilk gün: saatte bir
+    (7 * 86400, 6 * 3600),   # ilk hafta: 6 saatte bir
+    (30 * 86400, 86400)      # ilk ay: günde bir
+]
+TWEETS_PER_REQUEST = 100  # GET /2/tweets kimlik sınırı
+
+def next_collection_at(posted_at, now: datetime) -> Optional[datetime]:
+    """Gönderi yaşına göre bir sonraki toplama zamanı; takip süresi bittiyse None"""
+    if not isinstance(posted_at, datetime):
+        # Eski kayıtlarda posted_at gerçek zaman değil; tek anlık görüntü yeterli
+        return None
+    age = (now - posted_at).total_seconds()
+    for max_age, interval in METRICS_SCHEDULE:
+        if age < max_age:
+            return now + timedelta(seconds=interval)
+    return None
+
+class TweetMetricsCollector:
+    """Yayınlanmış tweet'lerin metriklerini arka planda toplu toplar.
+
+    Her gönderi `metrics_next_at` alanıyla zamanlanır; aralık gönderi
+    yaşlandıkça uzar ve takip süresi bitince alan kaldırılır. Zamanı gelen
+    gönderiler lease ile sahiplenilir (`metrics_next_at` lease süresi kadar
+    ileri alınır), `get_tweets` ile 100'erli gruplar halinde sorgulanır ve
+    anlık görüntüler `analytics` koleksiyonuna toplu eklenir. Son değerler
+    gönderide de tutulur; analitik sayfaları API çağrısı yapmaz. 429
+    yanıtındaki sıfırlanma zamanı `publish_accounts` koleksiyonuna yazılır,
+    böylece tüm süreçler o zamana kadar istek atmaz.
+    """
+
+    def __init__(self, poll_seconds: float, lease_seconds: int, max_batches_per_cycle: int,
+                 rate_limit_fallback_seconds: int):
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_batches_per_cycle = max_batches_per_cycle
+        self.rate_limit_fallback_seconds = rate_limit_fallback_seconds
+        self.blocked_until: Optional[datetime] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self.counters = {"requests": 0, "snapshots": 0, "unavailable": 0, "retired": 0, "rate_limited": 0, "errors": 0}
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+    def _account(self) -> str:
+        # Yayın kuyruğunun hesap kaydından ayrı; metrik uç noktasının limiti ayrıdır
+        return f"twitter_metrics:{twitter_service.account_key()}"
+
+    async def _refresh_blocked(self):
+        db = get_database()
+        account = await db.publish_accounts.find_one({"_id": self._account()})
+        self.blocked_until = account.get("blocked_until") if account else None
+
+    async def _block(self, until: datetime):
+        db = get_database()
+        # Başka bir süreç daha geç bir zaman yazdıysa geri alınmaz
+        await db.publish_accounts.update_one(
+            {"_id": self._account()},
+            {"$max": {"blocked_until": until}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self.blocked_until = max(until, self.blocked_until or until)
+
+    def stats(self) -> Dict:
+        return {
+            "blocked_until": self.blocked_until.isoformat() if self.blocked_until else None,
+            **self.counters
+        }
+
+    async def _run_forever(self):
+        try:
+            await self._backfill()
+        except Exception as e:
+            print(f"Metrics collector backfill error: {e}")
+        while True:
+            try:
+                await self.collect_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _backfill(self):
+        """Toplayıcıdan önce yayınlanmış tweet'leri takibe al"""
+        db = get_database()
+        result = await db.social_media_posts.update_many(
+            {
+                "posted": True,
+                "platform": "twitter",
+                "post_id": {"$ne": None},
+                "metrics_next_at": {"$exists": False},
+                "metrics_status": {"$exists": False}
+            },
+            {"$set": {"metrics_next_at": datetime.utcnow()}}
+        )
+        if result.modified_count:
+            print(f"Metrics collector: {result.modified_count} yayınlanmış gönderi takibe alındı")
+
+    async def collect_due(self):
+        """Zamanı gelen gönderileri 100'lük gruplar halinde topla"""
+        await self._refresh_blocked()
+        for _ in range(self.max_batches_per_cycle):
+            if self.blocked_until and datetime.utcnow() < self.blocked_until:
+                return
+            posts = await self._claim(TWEETS_PER_REQUEST)
+            if not posts:
+                return
+            await self._collect(posts)
+            if len(posts) < TWEETS_PER_REQUEST:
+                return
+
+    async def _claim(self, limit: int) -> List[Dict]:
+        """Zamanı gelmiş gönderileri, toplama zamanını lease kadar ileri alarak sahiplen"""
+        db = get_database()
+        now = datetime.utcnow()
+        candidates = await db.social_media_posts.find(
+            {"metrics_next_at": {"$lte": now}}, {"_id": 1}
+        ).sort("metrics_next_at", 1).limit(limit).to_list(limit)
+        if not candidates:
+            return []
+        claim = str(ObjectId())
+        ids = [candidate["_id"] for candidate in candidates]
+        # Başka bir süreç aynı gönderileri aldıysa koşul eşleşmez
+        await db.social_media_posts.update_many(
+            {"_id": {"$in": ids}, "metrics_next_at": {"$lte": now}},
+            {"$set": {
+                "metrics_next_at": now + timedelta(seconds=self.lease_seconds),
+                "metrics_claim": claim
+            }}
+        )
+        return await db.social_media_posts.find(
+            {"_id": {"$in": ids}, "metrics_claim": claim},
+            {"user_id": 1, "post_id": 1, "posted_at": 1}
+        ).to_list(limit)
+
+    async def _collect(self, posts: List[Dict]):
+        db = get_database()
+        by_tweet = {str(post["post_id"]): post for post in posts}
+        result = await twitter_service.get_tweets_metrics(list(by_tweet))
+        self.counters["requests"] += 1
+
+        if not result["success"]:
+            if result.get("rate_limited"):
+                # Lease dolunca gönderiler yeniden alınır; o zamana kadar istek atılmaz
+                reset = result.get("rate_limit_reset")
+                await self._block(
+                    datetime.utcfromtimestamp(reset) if reset
+                    else datetime.utcnow() + timedelta(seconds=self.rate_limit_fallback_seconds)
+                )
+                self.counters["rate_limited"] += 1
+            else:
+                self.counters["errors"] += 1
+                print(f"Tweet metrics fetch error: {result.get('error')}")
+            return
+
+        now = datetime.utcnow()
+        snapshots = []
+        operations = []
+        for tweet_id, post in by_tweet.items():
+            metrics = result["metrics"].get(tweet_id)
+            if metrics is None:
+                # Silinmiş veya erişilemeyen tweet; takipten çıkar
+                operations.append(UpdateOne(
+                    {"_id": post["_id"]},
+                    {"$set": {"metrics_status": "unavailable"}, "$unset": {"metrics_next_at": "", "metrics_claim": ""}}
+                ))
+                self.counters["unavailable"] += 1
+                continue
+            snapshots.append({
+                "user_id": post.get("user_id"),
+                "post_id": post["_id"],
+                "platform": "twitter",
+                "metrics": metrics,
+                "collected_at": now
+            })
+            update = {"$set": {"last_metrics": metrics, "metrics_collected_at": now}, "$unset": {"metrics_claim": ""}}
+            next_at = next_collection_at(post.get("posted_at"), now)
+            if next_at is None:
+                update["$set"]["metrics_status"] = "complete"
+                update["$unset"]["metrics_next_at"] = ""
+                self.counters["retired"] += 1
+            else:
+                update["$set"]["metrics_next_at"] = next_at
+            operations.append(UpdateOne({"_id": post["_id"]}, update))
+
+        if snapshots:
+            await db.analytics.insert_many(snapshots, ordered=False)
+            self.counters["snapshots"] += len(snapshots)
+        if operations:
+            await db.social_media_posts.bulk_write(operations, ordered=False)
+
+tweet_metrics_collector = TweetMetricsCollector(
+    poll_seconds=settings.METRICS_COLLECTOR_POLL_SECONDS,
+    lease_seconds=settings.METRICS_COLLECTOR_LEASE_SECONDS,
+    max_batches_per_cycle=settings.METRICS_COLLECTOR_MAX_BATCHES_PER_CYCLE,
+    rate_limit_fallback_seconds=settings.METRICS_RATE_LIMIT_FALLBACK_SECONDS
+)
@@ -0,0 +1,212 @@
+from bson import ObjectId
+from app.core.config import settings
+from app.core.database import get_database, id_variants
+from app.services.publish_queue import publish_queue
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import os
+import socket
+
+class PostScheduler:
+    """Gönderileri `due_at` zamanında yayın kuyruğuna aktaran zamanlayıcı.
+
+    Zamanlanan gönderiler `schedule_status: "scheduled"` ve `due_at` alanını
+    taşır. Her süreç kısa aralıklarla önümüzdeki birkaç saniyede zamanı
+    gelecek gönderileri (schedule_status, due_at) indeksi üzerinden toplu
+    olarak lease ile sahiplenir ve bellekteki bir zaman yığınına (heapq)
+    koyar; zamanlayıcı her gönderiyi tam zamanında `publish_queue`'ya
+    ekler. Bir süreç düşerse lease dolunca gönderiler başka bir süreç
+    tarafından yeniden sahiplenilir; yayın kuyruğunun gönderi başına tek
+    aktif iş kuralı aynı gönderinin iki kez kuyruklanmasını önler. Yayın
+    sırasında iş lease'i yenilenir, yani çalışan bir iş başka bir işçiye
+    geçmez; ancak tweet gönderildikten sonra sonuç yazılamadan süreç düşerse
+    iş yeniden denenir ve gönderi ikinci kez yayınlanabilir.
+    """
+
+    def __init__(self, poll_seconds: float, horizon_seconds: float, lease_seconds: int, claim_batch_size: int):
+        self.poll_seconds = poll_seconds
+        self.horizon_seconds = horizon_seconds
+        self.lease_seconds = lease_seconds
+        self.claim_batch_size = claim_batch_size
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._heap: List[Tuple[datetime, int, object, str]] = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._poll_wakeup = asyncio.Event()
+        self._poll_task: Optional[asyncio.Task] = None
+        self._timer_task: Optional[asyncio.Task] = None
+        self._fire_tasks = set()
+        self.counters = {"claimed": 0, "reclaimed": 0, "fired": 0, "late": 0, "skipped": 0}
+
+    def start(self):
+        if self._poll_task is None:
+            self._poll_task = asyncio.create_task(self._poll_forever())
+            self._timer_task = asyncio.create_task(self._timer_forever())
+
+    async def stop(self):
+        for task in (self._poll_task, self._timer_task, *self._fire_tasks):
+            if task:
+                task.cancel()
+        self._poll_task = self._timer_task = None
+        self._fire_tasks.clear()
+        self._heap.clear()
+        # Ateşlenmemiş gönderiler lease dolmasını beklemeden diğer süreçlere bırakılır
+        try:
+            db = get_database()
+            await db.social_media_posts.update_many(
+                {"schedule_status": "claimed", "schedule_owner": self.owner},
+                {
+                    "$set": {"schedule_status": "scheduled"},
+                    "$unset": {"schedule_owner": "", "schedule_claim": "", "schedule_lease_until": ""}
+                }
+            )
+        except Exception as e:
+            print(f"Scheduler release error: {e}")
+
+    async def schedule(self, post_id, due_at: datetime) -> bool:
+        """Gönderiyi zamanla veya zamanını değiştir; yayınlanmış gönderi zamanlanamaz"""
+        db = get_database()
+        result = await db.social_media_posts.update_one(
+            {"_id": {"$in": id_variants([post_id])}, "posted": False},
+            {
+                "$set": {"due_at": due_at, "schedule_status": "scheduled"},
+                "$unset": {"schedule_owner": "", "schedule_claim": "", "schedule_lease_until": ""}
+            }
+        )
+        if result.matched_count and due_at <= datetime.utcnow() + timedelta(seconds=self.horizon_seconds):
+            # Ufuk içindeki yeni zamanlama bir sonraki poll'u beklemez
+            self._poll_wakeup.set()
+        return result.matched_count > 0
+
+    async def cancel(self, post_id) -> bool:
+        db = get_database()
+        result = await db.social_media_posts.update_one(
+            {"_id": {"$in": id_variants([post_id])}, "schedule_status": {"$in": ["scheduled", "claimed"]}},
+            {
+                "$set": {"schedule_status": "cancelled"},
+                "$unset": {"schedule_owner": "", "schedule_claim": "", "schedule_lease_until": ""}
+            }
+        )
+        return result.modified_count > 0
+
+    def stats(self) -> Dict:
+        return {
+            "pending_timers": len(self._heap),
+            "next_due_at": self._heap[0][0].isoformat() if self._heap else None,
+            **self.counters
+        }
+
+    async def _poll_forever(self):
+        while True:
+            self._poll_wakeup.clear()
+            try:
+                if await self._claim_due() >= self.claim_batch_size:
+                    continue  # birikmiş iş var; hemen tekrar sahiplen
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Scheduler poll error: {e}")
+            try:
+                await asyncio.wait_for(self._poll_wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_due(self) -> int:
+        """Ufuk içinde zamanı gelecek gönderileri toplu lease ile sahiplen ve yığına ekle"""
+        db = get_database()
+        now = datetime.utcnow()
+
+        # Düşen süreçlerin lease'i dolmuş sahiplenmeleri geri bırakılır
+        reclaimed = await db.social_media_posts.update_many(
+            {"schedule_status": "claimed", "schedule_lease_until": {"$lt": now}},
+            {
+                "$set": {"schedule_status": "scheduled"},
+                "$unset": {"schedule_owner": "", "schedule_claim": "", "schedule_lease_until": ""}
+            }
+        )
+        self.counters["reclaimed"] += reclaimed.modified_count
+
+        horizon = now + timedelta(seconds=self.horizon_seconds)
+        candidates = await db.social_media_posts.find(
+            {"schedule_status": "scheduled", "due_at": {"$lte": horizon}},
+            {"_id": 1}
+        ).sort("due_at", 1).limit(self.claim_batch_size).to_list(self.claim_batch_size)
+        if not candidates:
+            return 0
+
+        # Aynı adaylar için yarışan süreçlerden yalnızca biri her gönderiyi alır
+        claim = str(ObjectId())
+        ids = [candidate["_id"] for candidate in candidates]
+        await db.social_media_posts.update_many(
+            {"_id": {"$in": ids}, "schedule_status": "scheduled"},
+            {"$set": {
+                "schedule_status": "claimed",
+                "schedule_owner": self.owner,
+                "schedule_claim": claim,
+                "schedule_lease_until": horizon + timedelta(seconds=self.lease_seconds)
+            }}
+        )
+        claimed = 0
+        async for post in db.social_media_posts.find({"_id": {"$in": ids}, "schedule_claim": claim}, {"due_at": 1}):
+            heapq.heappush(self._heap, (post["due_at"], next(self._sequence), post["_id"], claim))
+            claimed += 1
+        if claimed:
+            self.counters["claimed"] += claimed
+            self._wakeup.set()
+        return len(candidates)
+
+    async def _timer_forever(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self.poll_seconds
+            if self._heap:
+                due_at = self._heap[0][0]
+                delay = (due_at - datetime.utcnow()).total_seconds()
+                if delay <= 0:
+                    _, _, post_id, claim = heapq.heappop(self._heap)
+                    if delay < -1:
+                        self.counters["late"] += 1
+                    task = asyncio.create_task(self._fire(post_id, due_at, claim))
+                    self._fire_tasks.add(task)
+                    task.add_done_callback(self._fire_tasks.discard)
+                    continue
+                timeout = min(timeout, delay)
+            # Daha erken bir gönderi eklenirse bekleme erken biter
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, post_id, due_at: datetime, claim: str):
+        """Sahiplenme hâlâ geçerliyse gönderiyi yayın kuyruğuna ekle"""
+        try:
+            db = get_database()
+            # Zamanı değiştirilen veya iptal edilen gönderinin eski zamanlayıcısı atlanır
+            post = await db.social_media_posts.find_one(
+                {"_id": post_id, "schedule_status": "claimed", "schedule_claim": claim, "due_at": due_at}
+            )
+            if post is None:
+                self.counters["skipped"] += 1
+                return
+            job = await publish_queue.submit(post)
+            await db.social_media_posts.update_one(
+                {"_id": post_id, "schedule_claim": claim},
+                {
+                    "$set": {"schedule_status": "enqueued", "publish_job_id": job["_id"]},
+                    "$unset": {"schedule_owner": "", "schedule_claim": "", "schedule_lease_until": ""}
+                }
+            )
+            self.counters["fired"] += 1
+        except Exception as e:
+            # Sahiplenme lease dolunca yeniden alınır
+            print(f"Scheduled post fire error ({post_id}): {e}")
+
+post_scheduler = PostScheduler(
+    poll_seconds=settings.SCHEDULER_POLL_SECONDS,
+    horizon_seconds=settings.SCHEDULER_HORIZON_SECONDS,
+    lease_seconds=settings.SCHEDULER_LEASE_SECONDS,
+    claim_batch_size=settings.SCHEDULER_CLAIM_BATCH_SIZE
+)
@@ -0,0 +1,158 @@
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_database
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import calendar
+import numpy as np
+import time
+
+class PriceHistoryService:
+    """ASIN başına aylık kovalanmış, dizi tabanlı fiyat geçmişi ve toplu indirim taraması.
+
+    Her kova dokümanı {user_id, asin, bucket_start, count, t: [epoch], p: [fiyat]}
+    biçimindedir; gözlem başına ayrı doküman tutulmaz. Senkron yalnızca fiyat
+    değiştiğinde gözlem ekler, bu yüzden geçmiş bir basamak fonksiyonudur.
+    """
+
+    def __init__(self, bucket_size: int):
+        self.bucket_size = bucket_size
+
+    def _bucket_start(self, moment: datetime) -> datetime:
+        return datetime(moment.year, moment.month, 1)
+
+    def append_operations(self, user_id, observations: List[Tuple[str, float]],
+                          observed_at: Optional[datetime] = None) -> List[UpdateOne]:
+        """Fiyat gözlemleri için kovaya ekleme işlemleri üret"""
+        observed_at = observed_at or datetime.utcnow()
+        bucket_start = self._bucket_start(observed_at)
+        timestamp = calendar.timegm(observed_at.utctimetuple())
+        return [
+            UpdateOne(
+                # Dolu kova eşleşmez; upsert aynı ay için yeni kova açar
+                {"user_id": user_id, "asin": asin, "bucket_start": bucket_start,
+                 "count": {"$lt": self.bucket_size}},
+                {"$push": {"t": timestamp, "p": float(price)}, "$inc": {"count": 1}},
+                upsert=True
+            )
+            for asin, price in observations
+        ]
+
+    async def append(self, user_id, observations: List[Tuple[str, float]]):
+        """Fiyat gözlemlerini tek bulk_write ile ekle"""
+        if not observations:
+            return
+        db = get_database()
+        await db.price_history.bulk_write(self.append_operations(user_id, observations), ordered=False)
+
+    async def _load_arrays(self, user_id, since: datetime, asins: Optional[List[str]] = None):
+        """Pencereyi kapsayan kovaları düz numpy dizilerine yükle"""
+        db = get_database()
+        first_bucket = self._bucket_start(since)
+        query = {"user_id": user_id, "bucket_start": {"$gte": first_bucket}}
+        if asins is not None:
+            query["asin"] = {"$in": asins}
+
+        codes: Dict[str, int] = {}
+        code_list: List[int] = []
+        times: List[int] = []
+        prices: List[float] = []
+
+        # Pencere başında geçerli fiyat, ne kadar eski olursa olsun son gözlemdir;
+        # uzun süre sabit kalıp düşen fiyatın referansı bu gözlemden gelir
+        before = {"user_id": user_id, "bucket_start": {"$lt": first_bucket}}
+        if asins is not None:
+            before["asin"] = {"$in": asins}
+        pipeline = [
+            {"$match": before},
+            {"$sort": {"asin": 1, "bucket_start": -1, "_id": -1}},
+            {"$group": {
+                "_id": "$asin",
+                "t": {"$first": {"$arrayElemAt": ["$t", -1]}},
+                "p": {"$first": {"$arrayElemAt": ["$p", -1]}}
+            }}
+        ]
+        async for last in db.price_history.aggregate(pipeline, allowDiskUse=True):
+            code = codes.setdefault(last["_id"], len(codes))
+            code_list.append(code)
+            times.append(last["t"])
+            prices.append(last["p"])
+
+        cursor = db.price_history.find(query, {"_id": 0, "asin": 1, "t": 1, "p": 1}).batch_size(5000)
+        async for bucket in cursor:
+            code = codes.setdefault(bucket["asin"], len(codes))
+            code_list.extend([code] * len(bucket["t"]))
+            times.extend(bucket["t"])
+            prices.extend(bucket["p"])
+
+        asin_by_code = np.array(list(codes), dtype=object)
+        return asin_by_code, np.array(code_list, dtype=np.int64), np.array(times, dtype=np.int64), np.array(prices, dtype=np.float64)
+
+    def detect_drops(self, asin_by_code, codes, times, prices, window_start: int, threshold: float,
+                     limit: Optional[int] = None) -> List[Dict]:
+        """Tüm katalog için tek geçişte, pencere içindeki en yüksek fiyata göre düşüşleri bul"""
+        if codes.size == 0:
+            return []
+
+        order = np.lexsort((times, codes))
+        codes, times, prices = codes[order], times[order], prices[order]
+
+        group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        group_ends = np.r_[group_starts[1:], codes.size] - 1
+
+        # Pencere öncesindeki gözlemlerden yalnızca pencere başında geçerli olan sayılır
+        before = times < window_start
+        same_as_next = np.r_[codes[1:] == codes[:-1], False]
+        next_before = np.r_[before[1:], False]
+        effective = ~before | (before & ~(same_as_next & next_before))
+
+        reference = np.maximum.reduceat(np.where(effective, prices, -np.inf), group_starts)
+        current = prices[group_ends]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drop = np.where(reference > 0, (reference - current) / reference, 0.0)
+
+        flagged = np.flatnonzero(drop >= threshold)
+        flagged = flagged[np.argsort(-drop[flagged])][:limit]
+        return [
+            {
+                "asin": asin_by_code[codes[group_starts[i]]],
+                "current_price": float(current[i]),
+                "reference_price": float(reference[i]),
+                "drop_pct": round(float(drop[i]) * 100, 2),
+                "changed_at": datetime.utcfromtimestamp(int(times[group_ends[i]]))
+            }
+            for i in flagged
+        ]
+
+    async def scan_deals(self, user_id, threshold: float, window_days: int,
+                         asins: Optional[List[str]] = None, limit: Optional[int] = None) -> Dict:
+        """Fiyatı pencere içindeki zirvesine göre eşik kadar düşen ürünleri bul"""
+        since = datetime.utcnow() - timedelta(days=window_days)
+        loaded = time.perf_counter()
+        arrays = await self._load_arrays(user_id, since, asins)
+        scanned = time.perf_counter()
+        deals = self.detect_drops(*arrays, window_start=calendar.timegm(since.utctimetuple()), threshold=threshold, limit=limit)
+        finished = time.perf_counter()
+        return {
+            "deals": deals,
+            "asins_scanned": len(arrays[0]),
+            "load_ms": round((scanned - loaded) * 1000, 2),
+            "scan_ms": round((finished - scanned) * 1000, 2)
+        }
+
+    async def record_deals(self, user_id, deals: List[Dict]):
+        """Senkron sonrası bulunan indirimleri `deals` koleksiyonuna yaz"""
+        if not deals:
+            return
+        db = get_database()
+        now = datetime.utcnow()
+        await db.deals.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "asin": deal["asin"]},
+                {"$set": {**deal, "detected_at": now}},
+                upsert=True
+            )
+            for deal in deals
+        ], ordered=False)
+
+price_history_service = PriceHistoryService(bucket_size=settings.PRICE_HISTORY_BUCKET_SIZE)
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_database
+from app.services.amazon_service import amazon_service
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import calendar
+import time
+
+class ProductDetailCache:
+    """AmazonService.get_product_details önünde iki katmanlı cache.
+
+    Birinci katman süreç içi sınırlı bir LRU, ikinci katman ASIN anahtarlı
+    `product_detail_cache` koleksiyonudur; satıcı kataloglarından ayrı tutulur.
+    searchCatalogItems ürünü her zaman bütün olarak döndürdüğü için kayıtların
+    tek bir ömrü vardır. Süresi dolan kayıtlar hemen döndürülür ve arka planda
+    yenilenir.
+    """
+
+    def __init__(self, loader, max_entries: int, ttl: int, max_stale: int):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()
+        self.counters = {"hits": 0, "l1_hits": 0, "l2_hits": 0, "misses": 0, "stale": 0,
+                         "refreshes": 0, "evictions": 0}
+
+    def _make_entry(self, product: Dict, fetched_at: float) -> Dict:
+        return {"data": product, "fetched_at": fetched_at, "expires_at": fetched_at + self.ttl}
+
+    def _state(self, entry: Dict, now: float) -> str:
+        if now < entry["expires_at"]:
+            return "fresh"
+        if now < entry["expires_at"] + self.max_stale:
+            return "stale"
+        return "expired"
+
+    def _l1_get(self, asin: str) -> Optional[Dict]:
+        entry = self._entries.get(asin)
+        if entry is not None:
+            self._entries.move_to_end(asin)
+        return entry
+
+    def _l1_put(self, asin: str, entry: Dict):
+        self._entries[asin] = entry
+        self._entries.move_to_end(asin)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get(self, asin: str) -> Optional[Dict]:
+        """Tek bir ASIN için cache'li ürün detayı"""
+        asin = asin.strip().upper()
+        return (await self.get_many([asin])).get(asin)
+
+    async def get_many(self, asins: List[str]) -> Dict[str, Optional[Dict]]:
+        """Birden fazla ASIN için cache'li ürün detayları"""
+        now = time.time()
+        normalized = list(dict.fromkeys(a.strip().upper() for a in asins if a and a.strip()))
+        results: Dict[str, Optional[Dict]] = {}
+        stale: List[str] = []
+        l2_lookup: List[str] = []
+
+        for asin in normalized:
+            entry = self._l1_get(asin)
+            state = self._state(entry, now) if entry else "expired"
+            if state == "expired":
+                l2_lookup.append(asin)
+                continue
+            results[asin] = entry["data"]
+            if state == "fresh":
+                self.counters["hits"] += 1
+                self.counters["l1_hits"] += 1
+            else:
+                stale.append(asin)
+
+        missing: List[str] = []
+        if l2_lookup:
+            found = await self._l2_get_many(l2_lookup)
+            for asin in l2_lookup:
+                entry = found.get(asin)
+                state = self._state(entry, now) if entry else "expired"
+                if state == "expired":
+                    missing.append(asin)
+                    continue
+                self._l1_put(asin, entry)
+                results[asin] = entry["data"]
+                if state == "fresh":
+                    self.counters["hits"] += 1
+                    self.counters["l2_hits"] += 1
+                else:
+                    stale.append(asin)
+
+        if missing:
+            self.counters["misses"] += len(missing)
+            loaded = await self._load(missing)
+            for asin in missing:
+                results[asin] = loaded.get(asin)
+
+        if stale:
+            self.counters["stale"] += len(stale)
+            self._schedule_refresh(stale)
+
+        return {asin: results.get(asin) for asin in normalized}
+
+    async def _load(self, asins: List[str]) -> Dict[str, Optional[Dict]]:
+        """Kaynaktan çek ve iki katmana da yaz"""
+        loaded = await self.loader(asins)
+        fetched_at = time.time()
+        entries = {}
+        for asin, product in loaded.items():
+            if product:
+                entries[asin] = self._make_entry(product, fetched_at)
+                self._l1_put(asin, entries[asin])
+        if entries:
+            await self._l2_put_many(entries)
+        return loaded
+
+    def _schedule_refresh(self, asins: List[str]):
+        pending = [asin for asin in asins if asin not in self._refreshing]
+        if not pending:
+            return
+        self._refreshing.update(pending)
+        task = asyncio.create_task(self._refresh(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, asins: List[str]):
+        try:
+            self.counters["refreshes"] += len(asins)
+            await self._load(asins)
+        except Exception as e:
+            print(f"Product cache refresh error: {e}")
+        finally:
+            self._refreshing.difference_update(asins)
+
+    async def _l2_get_many(self, asins: List[str]) -> Dict[str, Dict]:
+        db = get_database()
+        cursor = db.product_detail_cache.find({"_id": {"$in": asins}})
+        entries = {}
+        async for doc in cursor:
+            entries[doc["_id"]] = self._make_entry(doc["data"], calendar.timegm(doc["fetched_at"].utctimetuple()))
+        return entries
+
+    async def _l2_put_many(self, entries: Dict[str, Dict]):
+        db = get_database()
+        operations = [
+            UpdateOne(
+                {"_id": asin},
+                {"$set": {"data": entry["data"], "fetched_at": datetime.utcfromtimestamp(entry["fetched_at"])}},
+                upsert=True
+            )
+            for asin, entry in entries.items()
+        ]
+        await db.product_detail_cache.bulk_write(operations, ordered=False)
+
+    def stats(self) -> Dict:
+        """Cache boyutlandırma için sayaçlar"""
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["stale"]
+        return {
+            **self.counters,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round((self.counters["hits"] + self.counters["stale"]) / lookups, 4) if lookups else 0.0
+        }
+
+product_detail_cache = ProductDetailCache(
+    loader=amazon_service.get_products_details,
+    max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+    ttl=settings.PRODUCT_CACHE_TTL_SECONDS,
+    max_stale=settings.PRODUCT_CACHE_MAX_STALE_SECONDS
+)
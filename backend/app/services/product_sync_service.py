@@ -0,0 +1,153 @@
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.core.database import get_database
+from app.services.price_history import price_history_service
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+import hashlib
+import json
+
+# Özeti (digest) oluşturan normalize alanlar
+DIGEST_FIELDS = ("title", "description", "price", "currency", "image_urls", "category", "brand")
+
+def _normalize_field(name: str, value):
+    if value is None:
+        return None
+    if name == "price":
+        try:
+            return round(float(value), 2)
+        except (TypeError, ValueError):
+            return None
+    if name == "currency":
+        return str(value).strip().upper()
+    if name == "image_urls":
+        return [str(url).strip() for url in value if url]
+    return " ".join(str(value).split())
+
+def product_digest(product: Dict, fields: Iterable[str] = DIGEST_FIELDS) -> str:
+    """Ürünün normalize edilmiş alanlarından kararlı bir SHA-1 özeti üret"""
+    normalized = {field: _normalize_field(field, product.get(field)) for field in fields}
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class ProductSyncService:
+    def __init__(self):
+        self.batch_size = settings.PRODUCT_SYNC_BATCH_SIZE
+        self.max_removal_ratio = settings.PRODUCT_SYNC_MAX_REMOVAL_RATIO
+
+    async def sync_products(self, user_id, products: Iterable[Dict], batch_size: Optional[int] = None,
+                            remove_missing: bool = False) -> Dict:
+        """Ürün listesini özet karşılaştırmasıyla senkronize et"""
+        return await self.sync_product_chunks(
+            user_id, self._chunked(products, batch_size or self.batch_size), batch_size, remove_missing
+        )
+
+    async def sync_product_chunks(self, user_id, chunks: AsyncIterator[List[Dict]],
+                                  batch_size: Optional[int] = None, remove_missing: bool = False) -> Dict:
+        """Akış halinde gelen ürün paketlerini senkronize et ve değişiklik kümesini döndür.
+
+        Yalnızca özeti değişen ürünler yazılır. `remove_missing` açıksa bu
+        senkronda görülmeyen ürünler kullanıcının kataloğundan silinir; silme
+        yalnızca kaynak hatasız ve boş olmayan bir okumayla tamamlandığında
+        ve kataloğun `max_removal_ratio`'dan fazlasını kapsamıyorsa yapılır.
+        """
+        db = get_database()
+        batch_size = batch_size or self.batch_size
+        counts = {"inserted": 0, "modified": 0, "unchanged": 0}
+        changes = {"new": [], "updated": [], "removed": []}
+        seen: Set[str] = set()
+
+        # Kaynak okuma hatası buradan yükselir; yarım okumadan sonra silme yapılmaz
+        async for chunk in chunks:
+            await self._sync_chunk(db, user_id, chunk, batch_size, counts, changes, seen)
+
+        removal_skipped = None
+        if remove_missing:
+            changes["removed"], removal_skipped = await self._remove_missing(db, user_id, seen)
+
+        result = {**counts, "removed": len(changes["removed"]), "changes": changes}
+        if removal_skipped:
+            result["removal_skipped"] = removal_skipped
+        return result
+
+    async def _chunked(self, products: Iterable[Dict], size: int) -> AsyncIterator[List[Dict]]:
+        chunk = []
+        for product in products:
+            chunk.append(product)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def _sync_chunk(self, db, user_id, chunk: List[Dict], batch_size: int,
+                          counts: Dict, changes: Dict, seen: Set[str]):
+        """Bir paketin mevcut özetlerini tek sorguyla okuyup yalnızca değişenleri yaz"""
+        # Aynı pakette tekrar eden ASIN'lerde son kayıt geçerlidir
+        incoming = {product["asin"]: product for product in chunk}
+        projection = {field: 1 for field in DIGEST_FIELDS}
+        projection.update({"_id": 0, "asin": 1, "content_digest": 1})
+        stored = {
+            doc["asin"]: doc
+            async for doc in db.products.find(
+                {"user_id": user_id, "asin": {"$in": list(incoming)}}, projection
+            )
+        }
+
+        now = datetime.utcnow()
+        operations: List[UpdateOne] = []
+        price_observations = []
+        for asin, product in incoming.items():
+            seen.add(asin)
+            fields = {k: v for k, v in product.items() if k not in ("_id", "user_id")}
+            existing = stored.get(asin)
+
+            # Kaynakta olmayan alanlar (ör. raporda kategori) mevcut değerleriyle özetlenir
+            digest = product_digest({**(existing or {}), **fields})
+            if existing and existing.get("content_digest") == digest:
+                counts["unchanged"] += 1
+                continue
+
+            operations.append(UpdateOne(
+                {"user_id": user_id, "asin": asin},
+                {"$set": {**fields, "content_digest": digest, "last_updated": now}},
+                upsert=True
+            ))
+            changes["updated" if existing else "new"].append(asin)
+
+            # Fiyat geçmişine yalnızca fiyat değiştiğinde gözlem eklenir
+            price = _normalize_field("price", fields.get("price"))
+            if price is not None and price != _normalize_field("price", (existing or {}).get("price")):
+                price_observations.append((asin, price))
+
+        for i in range(0, len(operations), batch_size):
+            result = await db.products.bulk_write(operations[i:i + batch_size], ordered=False)
+            counts["inserted"] += result.upserted_count
+            counts["modified"] += result.modified_count
+
+        await price_history_service.append(user_id, price_observations)
+
+    async def _remove_missing(self, db, user_id, seen: Set[str]) -> Tuple[List[str], Optional[str]]:
+        """Senkronda görülmeyen ürünleri sil; şüpheli bir okumada silmeyi reddet"""
+        if not seen:
+            print(f"Product sync for user {user_id}: kaynak boş döndü, silme atlandı")
+            return [], "empty_source"
+
+        total = 0
+        removed = []
+        async for doc in db.products.find({"user_id": user_id}, {"_id": 0, "asin": 1}):
+            total += 1
+            if doc["asin"] not in seen:
+                removed.append(doc["asin"])
+
+        if total and len(removed) / total > self.max_removal_ratio:
+            print(f"Product sync for user {user_id}: {len(removed)}/{total} ürün kaybolacaktı, silme atlandı")
+            return [], "removal_ratio_exceeded"
+
+        for i in range(0, len(removed), self.batch_size):
+            await db.products.delete_many(
+                {"user_id": user_id, "asin": {"$in": removed[i:i + self.batch_size]}}
+            )
+        return removed, None
+
+product_sync_service = ProductSyncService()
@@ -0,0 +1,198 @@
+from string import Template
+from typing import Dict, List, Optional
+import math
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken yoksa yaklaşık sayım kullanılır
+    tiktoken = None
+
+# Platform-specific character limits, styles and input token budgets
+PLATFORM_CONFIGS = {
+    "twitter": {"max_chars": 280, "hashtags": True, "style": "kısa ve çarpıcı", "input_budget": 300},
+    "instagram": {"max_chars": 2200, "hashtags": True, "style": "görsel odaklı", "input_budget": 800},
+    "tiktok": {"max_chars": 150, "hashtags": True, "style": "trend ve eğlenceli", "input_budget": 250}
+}
+
+# Türkçe metinde token başına ortalama karakter (tiktoken yokken ve max_tokens hesabında)
+CHARS_PER_TOKEN = 2.5
+MAX_TOKENS_MARGIN = 16
+MIN_FIELD_TOKENS = 8
+
+POST_SYSTEM_MESSAGE = "Sen Amazon satıcıları için sosyal medya içeriği oluşturan bir AI asistanısın. Türkçe, çekici ve satış odaklı içerikler üretiyorsun."
+TREND_SYSTEM_MESSAGE = "Sen Türkiye pazarını çok iyi bilen bir sosyal medya uzmanısın."
+
+POST_TEMPLATE = Template("""Türkçe bir $platform gönderisi oluştur. Aşağıdaki ürün için $platform_style bir içerik yaz:
+
+Ürün Adı: $title
+Açıklama: $description
+Fiyat: $price $currency
+Kategori: $category
+Marka: $brand
+
+Gereksinimler:
+- Maksimum $max_chars karakter
+- Türkçe dilinde
+- Satış odaklı ve çekici
+- Ürünün öne çıkan özelliklerini vurgula
+- Amazon'da satıldığını belirt
+$hashtag_rule- Emoji kullan ama abartma
+- Call-to-action ekle
+
+Sadece gönderi içeriğini döndür, başka açıklama ekleme.""")
+
+TREND_TEMPLATE = Template("""$title ürünü için güncel Türkiye trendlerini göz önünde bulundurarak $platform gönderisi oluştur.
+
+Ürün Bilgileri:
+- Başlık: $title
+- Fiyat: $price $currency
+- Kategori: $category
+
+Güncel trend faktörleri:
+- Türkiye'deki alışveriş trendleri
+- Mevsimsel özellikler
+- Popüler hashtag'ler
+- Lokal ifadeler ve kültürel referanslar
+
+Maksimum $max_chars karakter. Türkçe, çekici ve trend uyumlu bir gönderi oluştur.""")
+
+class TokenCounter:
+    """tiktoken varsa gerçek, yoksa karakter tabanlı yaklaşık token sayımı"""
+
+    def __init__(self):
+        self._encoding = None
+        self._loaded = False
+
+    @property
+    def encoding(self):
+        """Kodlamayı ilk kullanımda yükle; tiktoken dosyayı ağdan indirebilir"""
+        if not self._loaded:
+            self._loaded = True
+            if tiktoken is not None:
+                for name in ("o200k_base", "cl100k_base"):
+                    try:
+                        self._encoding = tiktoken.get_encoding(name)
+                        break
+                    except Exception as e:
+                        # Ağ hatası veya eski sürüm; karakter tahminine düşülür
+                        print(f"tiktoken encoding {name} unavailable: {e}")
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Metni en fazla max_tokens token olacak şekilde kısalt"""
+        if not text or self.count(text) <= max_tokens:
+            return text or ""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            text = self.encoding.decode(self.encoding.encode(text)[:max_tokens - 1])
+        else:
+            text = text[:int((max_tokens - 1) * CHARS_PER_TOKEN)]
+        # Yarım kalan kelimeyi at
+        if " " in text:
+            text = text[:text.rfind(" ")]
+        return text.rstrip(" ,.;:") + "…"
+
+token_counter = TokenCounter()
+
+def platform_config(platform: str) -> Dict:
+    return PLATFORM_CONFIGS.get(platform, PLATFORM_CONFIGS["twitter"])
+
+def max_tokens_for(max_chars: int) -> int:
+    """Platform karakter limitinden çıktı token limiti"""
+    return math.ceil(max_chars / CHARS_PER_TOKEN) + MAX_TOKENS_MARGIN
+
+def _fit_fields(fields: Dict[str, str], budget: int, trim_order: List[str]) -> Dict[str, str]:
+    """Alanları toplam bütçeye sığdır; önce en az önemli alan kısaltılır"""
+    fields = dict(fields)
+    counts = {name: token_counter.count(value) for name, value in fields.items()}
+    overflow = sum(counts.values()) - budget
+    for name in trim_order:
+        if overflow <= 0:
+            break
+        allowed = max(MIN_FIELD_TOKENS, counts[name] - overflow)
+        if allowed < counts[name]:
+            fields[name] = token_counter.truncate(fields[name], allowed)
+            new_count = token_counter.count(fields[name])
+            overflow -= counts[name] - new_count
+            counts[name] = new_count
+    return fields
+
+def _product_fields(product: Dict) -> Dict[str, str]:
+    return {
+        "title": str(product.get("title") or ""),
+        "description": " ".join(str(product.get("description") or "").split()),
+        "category": str(product.get("category") or ""),
+        "brand": str(product.get("brand") or "")
+    }
+
+def _hashtag_rule(config: Dict, hashtags: Optional[List[str]]) -> str:
+    if not config["hashtags"]:
+        return ""
+    if hashtags:
+        return f"- Uygun hashtag'ler ekle; en iyi performans gösterenler: {' '.join(hashtags)}\n"
+    return "- Uygun hashtag'ler ekle\n"
+
+def build_post_prompt(product: Dict, platform: str, style: str = "engaging",
+                      hashtags: Optional[List[str]] = None) -> Dict:
+    """Gönderi prompt'unu platform bütçesine göre kur; mesajlar ve max_tokens döndürür"""
+    config = platform_config(platform)
+    fields = _fit_fields(_product_fields(product), config["input_budget"], ["description", "title"])
+    prompt = POST_TEMPLATE.substitute(
+        platform=platform,
+        platform_style=config["style"],
+        price=product.get("price", ""),
+        currency=product.get("currency", "TRY"),
+        max_chars=config["max_chars"],
+        hashtag_rule=_hashtag_rule(config, hashtags),
+        **fields
+    )
+    messages = [
+        {"role": "system", "content": POST_SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+    return {
+        "messages": messages,
+        "max_tokens": max_tokens_for(config["max_chars"]),
+        "max_chars": config["max_chars"],
+        "prompt_tokens": sum(token_counter.count(m["content"]) for m in messages)
+    }
+
+def build_trend_prompt(product: Dict, platform: str) -> Dict:
+    """Trend odaklı gönderi prompt'u"""
+    config = platform_config(platform)
+    fields = _fit_fields(_product_fields(product), config["input_budget"], ["title"])
+    prompt = TREND_TEMPLATE.substitute(
+        platform=platform,
+        title=fields["title"],
+        category=fields["category"],
+        price=product.get("price", ""),
+        currency=product.get("currency", "TRY"),
+        max_chars=config["max_chars"]
+    )
+    messages = [
+        {"role": "system", "content": TREND_SYSTEM_MESSAGE},
+        {"role": "user", "content": prompt}
+    ]
+    return {
+        "messages": messages,
+        "max_tokens": max_tokens_for(config["max_chars"]),
+        "max_chars": config["max_chars"],
+        "prompt_tokens": sum(token_counter.count(m["content"]) for m in messages)
+    }
+
+def fit_to_limit(content: str, max_chars: int) -> str:
+    """Model limiti aştıysa içeriği kelime sınırında kısalt"""
+    if len(content) <= max_chars:
+        return content
+    cut = content[:max_chars - 1]
+    if " " in cut:
+        cut = cut[:cut.rfind(" ")]
+    return cut.rstrip() + "…"
@@ -0,0 +1,307 @@
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.database import get_database, id_variants
+from app.services.twitter_service import twitter_service
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import os
+import random
+import socket
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class PublishQueue:
+    """Sosyal medya yayınları için Mongo tabanlı kalıcı iş kuyruğu.
+
+    Yayın istekleri `publish_jobs` koleksiyonuna yazılır ve HTTP isteği
+    beklemeden döner. Her süreçte birkaç işçi işleri lease ile atomik olarak
+    alır; lease yayın çağrısı sürdükçe yenilenir, sahibi düşen iş lease
+    dolunca başka bir işçi tarafından yeniden alınır. Her sahiplenme ayrı bir
+    claim belirteci taşır; işi kaybeden işçi sonucu yazamaz. 429
+    yanıtında hesabın `x-rate-limit-reset` zamanı `publish_accounts`
+    koleksiyonuna yazılır ve o zamana kadar o hesabın hiçbir işi alınmaz;
+    bekleyen işler sıfırlanma anına jitter ile yayılır. Diğer hatalar
+    tam jitter'lı üstel backoff ile yeniden denenir.
+    """
+
+    def __init__(self, concurrency: int, lease_seconds: int, poll_seconds: float, max_attempts: int,
+                 retry_base_seconds: float, retry_max_seconds: float, rate_limit_jitter_seconds: float,
+                 rate_limit_fallback_seconds: int):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.rate_limit_jitter_seconds = rate_limit_jitter_seconds
+        self.rate_limit_fallback_seconds = rate_limit_fallback_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._blocked: Dict[str, datetime] = {}
+        self._blocked_checked_at: Optional[datetime] = None
+        self.counters = {"published": 0, "retried": 0, "rate_limited": 0, "failed": 0}
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._run_worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        self._workers = []
+
+    async def submit(self, post: Dict, run_at: Optional[datetime] = None) -> Dict:
+        """Gönderi için yayın işi kuyrukla; aktif bir iş varsa onu döndür"""
+        db = get_database()
+        now = datetime.utcnow()
+        job = {
+            "post_id": post["_id"],
+            "platform": post["platform"],
+            "account": self._account_for(post["platform"]),
+            "status": "queued",
+            "active": True,  # gönderi başına tek aktif iş (kısmi benzersiz indeks)
+            "attempts": 0,
+            "available_at": run_at or now,
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            result = await db.publish_jobs.insert_one(job)
+            job["_id"] = result.inserted_id
+        except DuplicateKeyError:
+            job = await db.publish_jobs.find_one({"post_id": post["_id"], "active": True})
+            if job is None:
+                # Aktif iş bu arada bitti; durumunu döndür
+                job = await self.latest_for_post(post["_id"])
+            return job
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        db = get_database()
+        if not ObjectId.is_valid(job_id):
+            return None
+        return await db.publish_jobs.find_one({"_id": ObjectId(job_id)}, {"owner": 0, "claim": 0, "lease_until": 0})
+
+    async def latest_for_post(self, post_id) -> Optional[Dict]:
+        db = get_database()
+        return await db.publish_jobs.find_one(
+            # İşler gönderinin _id'sini olduğu gibi (çoğunlukla ObjectId) saklar
+            {"post_id": {"$in": id_variants([post_id])}}, {"owner": 0, "claim": 0, "lease_until": 0},
+            sort=[("created_at", -1)]
+        )
+
+    async def stats(self) -> Dict:
+        db = get_database()
+        counts = {status: 0 for status in ("queued", "running", "published", "failed")}
+        async for row in db.publish_jobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        await self._refresh_blocked(force=True)
+        return {
+            "jobs": counts,
+            "blocked_accounts": {account: until.isoformat() for account, until in self._blocked.items()},
+            "workers": len(self._workers),
+            **self.counters
+        }
+
+    def _account_for(self, platform: str) -> str:
+        if platform == "twitter":
+            return f"twitter:{twitter_service.account_key()}"
+        return platform
+
+    async def _refresh_blocked(self, force: bool = False):
+        """Rate limit'e takılmış hesapları oku; işçiler arasında poll aralığıyla paylaşılır"""
+        now = datetime.utcnow()
+        if (not force and self._blocked_checked_at is not None
+                and (now - self._blocked_checked_at).total_seconds() < self.poll_seconds):
+            return
+        db = get_database()
+        blocked = {}
+        async for account in db.publish_accounts.find({"blocked_until": {"$gt": now}}):
+            blocked[account["_id"]] = account["blocked_until"]
+        self._blocked = blocked
+        self._blocked_checked_at = now
+
+    async def _run_worker(self):
+        while True:
+            try:
+                job = await self._claim()
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Publish worker error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _claim(self) -> Optional[Dict]:
+        """Zamanı gelmiş ya da lease'i dolmuş bir işi, engelli hesapları atlayarak al"""
+        db = get_database()
+        await self._refresh_blocked()
+        now = datetime.utcnow()
+        blocked = [account for account, until in self._blocked.items() if until > now]
+        query = {"$or": [
+            {"status": "queued", "available_at": {"$lte": now}},
+            {"status": "running", "lease_until": {"$lt": now}}
+        ]}
+        if blocked:
+            query["account"] = {"$nin": blocked}
+        return await db.publish_jobs.find_one_and_update(
+            query,
+            {
+                "$set": {
+                    "status": "running",
+                    "owner": self.owner,
+                    "claim": str(ObjectId()),
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _finish(self, job: Dict, status: str, fields: Dict):
+        db = get_database()
+        await db.publish_jobs.update_one(
+            {"_id": job["_id"], "claim": job["claim"]},
+            {
+                "$set": {"status": status, "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow(), **fields},
+                "$unset": {"active": "", "lease_until": "", "owner": "", "claim": ""}
+            }
+        )
+
+    async def _requeue(self, job: Dict, available_at: datetime, error: str, attempts_delta: int = 0):
+        db = get_database()
+        update = {
+            "$set": {
+                "status": "queued",
+                "available_at": available_at,
+                "last_error": error,
+                "updated_at": datetime.utcnow()
+            },
+            "$unset": {"lease_until": "", "owner": "", "claim": ""}
+        }
+        if attempts_delta:
+            update["$inc"] = {"attempts": attempts_delta}
+        await db.publish_jobs.update_one({"_id": job["_id"], "claim": job["claim"]}, update)
+
+    async def _heartbeat(self, job: Dict):
+        """İş sürdükçe lease'i uzat; yavaş bir yayın çağrısı işi başka işçiye düşürmez"""
+        db = get_database()
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await db.publish_jobs.update_one(
+                    {"_id": job["_id"], "claim": job["claim"]},
+                    {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                print(f"Publish job heartbeat error ({job['_id']}): {e}")
+                continue
+            if result.matched_count == 0:
+                print(f"Publish job {job['_id']} lease lost")
+                return
+
+    async def _block_account(self, account: str, until: datetime):
+        db = get_database()
+        # Başka bir işçi daha geç bir zaman yazdıysa geri alınmaz
+        await db.publish_accounts.update_one(
+            {"_id": account},
+            {"$max": {"blocked_until": until}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self._blocked[account] = max(until, self._blocked.get(account, until))
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Tam jitter'lı üstel backoff; eşzamanlı hatalar aynı anda yeniden denenmez"""
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempts)))
+
+    async def _run(self, job: Dict):
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._publish(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _publish(self, job: Dict):
+        db = get_database()
+        post = await db.social_media_posts.find_one({"_id": job["post_id"]})
+        if post is None:
+            await self._finish(job, "failed", {"error": "Gönderi bulunamadı"})
+            self.counters["failed"] += 1
+            return
+        if post.get("posted"):
+            # Önceki bir deneme yayınladıktan sonra lease'i kaybetmiş olabilir
+            await self._finish(job, "published", {"result": {"tweet_id": post.get("post_id")}})
+            return
+
+        if job["platform"] != "twitter":
+            await self._finish(job, "failed", {"error": f"Platform '{job['platform']}' henüz desteklenmiyor"})
+            self.counters["failed"] += 1
+            return
+
+        # Gönderiler product_id'yi string tutar; ürün _id'si ObjectId olabilir
+        product = await db.products.find_one({"_id": {"$in": id_variants([post["product_id"]])}}, {"image_urls": 1})
+        image_urls = (product or {}).get("image_urls") or []
+        result = await twitter_service.post_tweet(post["content"], image_urls)
+
+        if result["success"]:
+            now = datetime.utcnow()
+            await db.social_media_posts.update_one(
+                {"_id": post["_id"]},
+                {"$set": {
+                    "posted": True,
+                    "post_id": result["tweet_id"],
+                    "posted_at": now,
+                    # Metrik toplayıcı ilk anlık görüntüyü bu zamanda alır
+                    "metrics_next_at": now + timedelta(seconds=settings.METRICS_FIRST_COLLECTION_DELAY_SECONDS)
+                }}
+            )
+            await self._finish(job, "published", {
+                "result": {"tweet_id": result["tweet_id"], "tweet_url": result["tweet_url"]}
+            })
+            self.counters["published"] += 1
+            return
+
+        error = result.get("error", "Bilinmeyen hata")
+        if result.get("rate_limited"):
+            # Sıfırlanma anına kadar hesap engellenir; deneme hakkından düşülmez
+            reset = result.get("rate_limit_reset")
+            until = (datetime.utcfromtimestamp(reset) if reset
+                     else datetime.utcnow() + timedelta(seconds=self.rate_limit_fallback_seconds))
+            await self._block_account(job["account"], until)
+            available_at = until + timedelta(seconds=random.uniform(0, self.rate_limit_jitter_seconds))
+            await self._requeue(job, available_at, error, attempts_delta=-1)
+            self.counters["rate_limited"] += 1
+            return
+
+        if job["attempts"] >= self.max_attempts:
+            await self._finish(job, "failed", {"error": error})
+            self.counters["failed"] += 1
+            return
+        delay = self._retry_delay(job["attempts"])
+        await self._requeue(job, datetime.utcnow() + timedelta(seconds=delay), error)
+        self.counters["retried"] += 1
+
+publish_queue = PublishQueue(
+    concurrency=settings.PUBLISH_WORKER_CONCURRENCY,
+    lease_seconds=settings.PUBLISH_JOB_LEASE_SECONDS,
+    poll_seconds=settings.PUBLISH_POLL_SECONDS,
+    max_attempts=settings.PUBLISH_MAX_ATTEMPTS,
+    retry_base_seconds=settings.PUBLISH_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.PUBLISH_RETRY_MAX_SECONDS,
+    rate_limit_jitter_seconds=settings.PUBLISH_RATE_LIMIT_JITTER_SECONDS,
+    rate_limit_fallback_seconds=settings.PUBLISH_RATE_LIMIT_FALLBACK_SECONDS
+)
@@ -0,0 +1,262 @@
+from pymongo import ReturnDocument
+from app.core.config import settings
+from app.core.database import get_database
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+import asyncio
+import bisect
+import heapq
+import math
+import re
+import time
+
+# Alan ağırlıkları: başlıktaki eşleşme açıklamadakinden daha değerlidir
+FIELD_WEIGHTS = {"title": 3.0, "brand": 2.0, "category": 1.5, "description": 1.0}
+RESULT_FIELDS = ("asin", "title", "brand", "category", "price", "currency", "image_urls")
+PREFIX_MATCH_FACTOR = 0.7
+MAX_PREFIX_EXPANSIONS = 64
+MIN_PREFIX_LENGTH = 2
+MAX_LOGGED_CHANGES = 50000  # daha büyük değişiklik kümelerinde diğer süreçler indeksi yeniden kurar
+
+_TURKISH_FOLD = str.maketrans({"ı": "i", "ş": "s", "ğ": "g", "ü": "u", "ö": "o", "ç": "c",
+                               "â": "a", "î": "i", "û": "u"})
+_TOKEN_RE = re.compile(r"\w+")
+
+def turkish_fold(text: str) -> str:
+    """Türkçe büyük/küçük harf dönüşümü ve aksan katlama (İ→i, I→ı→i, ş→s, ğ→g ...)"""
+    text = text.replace("İ", "i").replace("I", "ı").lower()
+    return text.translate(_TURKISH_FOLD)
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(turkish_fold(text))
+
+class ProductSearchIndex:
+    """Tek bir kullanıcının ürünleri için artımlı güncellenen ters indeks"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.doc_terms: Dict[str, Set[str]] = {}
+        self.documents: Dict[str, Dict] = {}
+        self._sorted_terms: List[str] = []
+        self._terms_dirty = False
+        # Uygulanan son değişiklik sürümü (search_index_changes)
+        self.version = 0
+        self.checked_at = 0.0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def upsert(self, product: Dict):
+        asin = product["asin"]
+        self.remove(asin)
+
+        weights: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product.get(field)):
+                weights[term] += weight
+
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self._terms_dirty = True
+            self.postings[term][asin] = weight
+        self.doc_terms[asin] = set(weights)
+        self.documents[asin] = {field: product.get(field) for field in RESULT_FIELDS}
+
+    def remove(self, asin: str):
+        for term in self.doc_terms.pop(asin, ()):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(asin, None)
+            if not posting:
+                del self.postings[term]
+                self._terms_dirty = True
+        self.documents.pop(asin, None)
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Sorgu terimini tam eşleşme ve önek eşleşmelerine genişlet"""
+        matches = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        if len(token) < MIN_PREFIX_LENGTH:
+            return matches
+
+        if self._terms_dirty:
+            self._sorted_terms = sorted(self.postings)
+            self._terms_dirty = False
+
+        start = bisect.bisect_left(self._sorted_terms, token)
+        end = bisect.bisect_left(self._sorted_terms, token + "\U0010ffff", start)
+        # Kısa öneklerde en çok belgede geçen genişletmeler tutulur (alfabetik ilkler değil)
+        candidates = (self._sorted_terms[i] for i in range(start, end) if self._sorted_terms[i] != token)
+        for term in heapq.nlargest(MAX_PREFIX_EXPANSIONS, candidates, key=lambda term: len(self.postings[term])):
+            matches[term] = PREFIX_MATCH_FACTOR
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Tüm sorgu terimlerini içeren ürünleri skora göre sırala"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        total_docs = len(self.documents) or 1
+        token_scores: List[Dict[str, float]] = []
+        for token in tokens:
+            scores: Dict[str, float] = {}
+            for term, factor in self._expand(token).items():
+                for asin, weight in self.postings[term].items():
+                    score = weight * factor
+                    if score > scores.get(asin, 0.0):
+                        scores[asin] = score
+            if not scores:
+                return []
+            # IDF sorgu terimi başına hesaplanır; tam eşleşme önek eşleşmesinin önünde kalır
+            idf = math.log(1 + total_docs / len(scores))
+            token_scores.append({asin: score * idf for asin, score in scores.items()})
+
+        # En seçici terimden başlayarak kesişim al
+        token_scores.sort(key=len)
+        ranked = {}
+        for asin, score in token_scores[0].items():
+            total = score
+            for scores in token_scores[1:]:
+                other = scores.get(asin)
+                if other is None:
+                    break
+                total += other
+            else:
+                ranked[asin] = total
+
+        best = heapq.nlargest(limit, ranked.items(), key=lambda item: item[1])
+        return [{**self.documents[asin], "score": round(score, 4)} for asin, score in best]
+
+class SearchIndexService:
+    """Kullanıcı başına arama indekslerini yönetir; ilk sorguda Mongo'dan kurulur.
+
+    İndeks her süreçte ayrı tutulur. Senkron değişiklik kümeleri kullanıcı
+    başına artan bir sürümle `search_index_changes` koleksiyonuna yazılır;
+    diğer süreçler sorgu sırasında (en fazla refresh_seconds aralıkla)
+    kendi sürümlerinden sonraki kayıtları okuyup uygular. Kayıtlarda boşluk
+    varsa (eski kayıtlar TTL ile silinmişse) indeks yeniden kurulur.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._indexes: Dict[str, ProductSearchIndex] = {}
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+
+    async def get_index(self, user_id) -> ProductSearchIndex:
+        key = str(user_id)
+        index = self._indexes.get(key)
+        if index is not None and time.monotonic() - index.checked_at < self.refresh_seconds:
+            return index
+
+        lock = self._build_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(key)
+            if index is None:
+                self._indexes[key] = await self._build(user_id)
+            elif time.monotonic() - index.checked_at >= self.refresh_seconds:
+                if not await self._catch_up(user_id, index):
+                    self._indexes[key] = await self._build(user_id)
+        return self._indexes[key]
+
+    async def _current_version(self, user_id) -> int:
+        db = get_database()
+        state = await db.search_index_versions.find_one({"_id": str(user_id)})
+        return state["version"] if state else 0
+
+    async def _build(self, user_id) -> ProductSearchIndex:
+        db = get_database()
+        index = ProductSearchIndex()
+        # Sürüm kurulumdan önce okunur; kurulum sırasında yazılan değişiklikler tekrar uygulanır
+        index.version = await self._current_version(user_id)
+        projection = {field: 1 for field in (*FIELD_WEIGHTS, *RESULT_FIELDS)}
+        projection["_id"] = 0
+        count = 0
+        async for product in db.products.find({"user_id": user_id}, projection):
+            index.upsert(product)
+            count += 1
+            if count % 1000 == 0:
+                # Büyük kataloglarda event loop'u uzun süre tutma
+                await asyncio.sleep(0)
+        index.checked_at = time.monotonic()
+        return index
+
+    async def _catch_up(self, user_id, index: ProductSearchIndex) -> bool:
+        """Başka süreçlerin yazdığı değişiklikleri uygula; yeniden kurulum gerekiyorsa False"""
+        db = get_database()
+        cursor = db.search_index_changes.find(
+            {"user_id": str(user_id), "version": {"$gt": index.version}}
+        ).sort("version", 1)
+        async for change in cursor:
+            if change["version"] != index.version + 1 or change.get("rebuild"):
+                return False
+            await self._apply(user_id, index, change)
+            index.version = change["version"]
+        index.checked_at = time.monotonic()
+        return True
+
+    async def _apply(self, user_id, index: ProductSearchIndex, changes: Dict):
+        for asin in changes.get("removed", []):
+            index.remove(asin)
+
+        changed = changes.get("new", []) + changes.get("updated", [])
+        db = get_database()
+        projection = {field: 1 for field in (*FIELD_WEIGHTS, *RESULT_FIELDS)}
+        projection["_id"] = 0
+        for i in range(0, len(changed), 1000):
+            cursor = db.products.find({"user_id": user_id, "asin": {"$in": changed[i:i + 1000]}}, projection)
+            async for product in cursor:
+                index.upsert(product)
+
+    async def search(self, user_id, query: str, limit: int = 20) -> List[Dict]:
+        index = await self.get_index(user_id)
+        return index.search(query, limit)
+
+    async def apply_changes(self, user_id, changes: Dict):
+        """Senkron değişiklik kümesini diğer süreçler için kaydet ve yüklü indekse uygula"""
+        new = changes.get("new", [])
+        updated = changes.get("updated", [])
+        removed = changes.get("removed", [])
+        if not (new or updated or removed):
+            return
+
+        db = get_database()
+        state = await db.search_index_versions.find_one_and_update(
+            {"_id": str(user_id)},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        version = state["version"]
+        record = {"user_id": str(user_id), "version": version, "created_at": datetime.utcnow()}
+        if len(new) + len(updated) + len(removed) > MAX_LOGGED_CHANGES:
+            record["rebuild"] = True
+        else:
+            record.update({"new": new, "updated": updated, "removed": removed})
+        await db.search_index_changes.insert_one(record)
+
+        key = str(user_id)
+        if key not in self._indexes:
+            # İndeks henüz kurulmadıysa ilk sorguda güncel veriden kurulacak
+            return
+        lock = self._build_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(key)
+            if index is None:
+                return
+            if index.version == version - 1 and not record.get("rebuild"):
+                await self._apply(user_id, index, record)
+                index.version = version
+            else:
+                # Araya başka değişiklikler girdi; sıradaki sorgu indeksi yeniden kurar
+                self._indexes.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {key: len(index) for key, index in self._indexes.items()}
+
+product_search_service = SearchIndexService(refresh_seconds=settings.SEARCH_INDEX_REFRESH_SECONDS)
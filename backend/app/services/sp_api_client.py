@@ -0,0 +1,84 @@
+from sp_api.base.exceptions import SellingApiRequestThrottledException
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.rate_limit import TokenBucket
+from typing import Dict, Tuple
+import asyncio
+import functools
+import hashlib
+
+# SP-API operasyon limitleri: (istek/saniye, burst)
+# https://developer-docs.amazon.com/sp-api/docs/usage-plans-and-rate-limits-in-the-sp-api
+OPERATION_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "get_catalog_item": (2, 2),
+    "search_catalog_items": (2, 2),
+    "create_report": (0.0167, 15),
+    "get_report": (2, 15),
+    "get_report_document": (0.0167, 15),
+}
+DEFAULT_RATE_LIMIT = (1, 1)
+
+class SPAPIClientPool:
+    """SP-API client'larını yeniden kullanan, bloklayan çağrıları sınırlı bir
+    executor'da çalıştıran ve operasyon limitlerini token bucket ile uygulayan katman"""
+
+    def __init__(self, max_workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sp-api")
+        self._clients = {}
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _credentials_key(self, credentials: Dict) -> str:
+        # Limitler satıcı + uygulama çifti başına uygulanır
+        raw = f"{credentials.get('lwa_app_id', '')}:{credentials.get('refresh_token', '')}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    def get_client(self, api_cls, credentials: Dict, marketplace, **client_kwargs):
+        """Aynı kimlik bilgileri için tek client örneği döndür.
+
+        Client örneği kendi AccessTokenClient'ını tuttuğundan LWA access token'ı
+        süresi dolana kadar yeniden kullanılır; her çağrıda token alınmaz.
+        """
+        key = (
+            api_cls.__name__,
+            self._credentials_key(credentials),
+            marketplace.name,
+            tuple(sorted(client_kwargs.items()))
+        )
+        client = self._clients.get(key)
+        if client is None:
+            client = api_cls(credentials=credentials, marketplace=marketplace, **client_kwargs)
+            self._clients[key] = client
+        return client
+
+    def _bucket(self, operation: str, credentials: Dict) -> TokenBucket:
+        key = (operation, self._credentials_key(credentials))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = OPERATION_RATE_LIMITS.get(operation, DEFAULT_RATE_LIMIT)
+            bucket = TokenBucket(rate, burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Bloklayan bir fonksiyonu SP-API executor'ında çalıştır"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def call(self, api_cls, operation: str, credentials: Dict, marketplace,
+                   client_kwargs: Dict = None, max_retries: int = 2, **kwargs):
+        """Rate limit'e uyarak bir SP-API operasyonunu event loop'u bloklamadan çağır"""
+        client = self.get_client(api_cls, credentials, marketplace, **(client_kwargs or {}))
+        bucket = self._bucket(operation, credentials)
+
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                return await self.run_blocking(getattr(client, operation), **kwargs)
+            except SellingApiRequestThrottledException:
+                # Kova sunucu tarafıyla senkron değilse bir sonraki token'ı bekle
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+
+sp_api_client = SPAPIClientPool(max_workers=settings.AMAZON_MAX_WORKERS)
@@ -0,0 +1,240 @@
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.database import get_database
+from app.services.amazon_service import AmazonService
+from app.services.product_sync_service import product_sync_service
+from app.services.search_index import product_search_service
+from app.services.price_history import price_history_service
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import asyncio
+import os
+import random
+import socket
+import time
+
+SYNC_HISTORY_LENGTH = 20
+
+class SyncAlreadyRunning(Exception):
+    """Satıcı için başka bir senkron zaten çalışıyor"""
+
+class CatalogSyncScheduler:
+    """Bağlı her satıcının kataloğunu arka planda periyodik olarak senkronize eder.
+
+    Çalışmalar sınırlı bir havuzda yürür; aynı satıcı için süreç içinde
+    asyncio.Lock, süreçler arasında `sync_jobs` koleksiyonundaki lease ile
+    tek bir senkron çalışır. Durum ve süre bilgisi aynı dokümanda tutulur.
+    """
+
+    def __init__(self, interval: int, jitter: int, max_workers: int, lease: int, tick: int, mode: str):
+        self.interval = interval
+        self.jitter = jitter
+        self.lease = lease
+        self.tick = tick
+        self.mode = mode
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._next_run: Dict[str, float] = {}
+        self._tasks = set()
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            self._loop_task = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _jittered(self, base: float) -> float:
+        return base + random.uniform(-self.jitter, self.jitter)
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self._dispatch_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Catalog sync scheduler error: {e}")
+            await asyncio.sleep(self.tick)
+
+    async def _dispatch_due(self):
+        """Zamanı gelen satıcılar için senkron başlat"""
+        db = get_database()
+        now = time.time()
+        sellers = db.users.find(
+            {"is_active": True, "amazon_credentials": {"$ne": None}},
+            {"amazon_credentials": 1, "amazon_seller_id": 1}
+        )
+        async for user in sellers:
+            key = str(user["_id"])
+            if key not in self._next_run:
+                # İlk görüşte çalışmaları aralığa yay; hepsi aynı anda başlamasın
+                self._next_run[key] = now + random.uniform(0, self.interval)
+                continue
+            if self._next_run[key] > now or self._lock(key).locked():
+                continue
+
+            self._next_run[key] = now + self._jittered(self.interval)
+            task = asyncio.create_task(self._run_scheduled(user))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_scheduled(self, user: Dict):
+        amazon = AmazonService.for_seller(user["amazon_credentials"])
+        try:
+            async with self._semaphore:
+                await self.run_sync(user["_id"], amazon, user.get("amazon_seller_id") or "", self.mode, trigger="scheduled")
+        except SyncAlreadyRunning:
+            pass
+        except Exception as e:
+            print(f"Catalog sync error for user {user['_id']}: {e}")
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def run_sync(self, user_id, amazon: AmazonService, seller_id: str, mode: str,
+                       batch_size: Optional[int] = None, trigger: str = "manual") -> Dict:
+        """Satıcı için tek bir senkron çalıştır ve durumunu kaydet"""
+        lock = self._lock(str(user_id))
+        if lock.locked():
+            raise SyncAlreadyRunning()
+
+        async with lock:
+            started_at, claim = await self._claim(user_id, trigger)
+            started = time.monotonic()
+            lease_lost = asyncio.Event()
+            heartbeat = asyncio.create_task(self._heartbeat(user_id, claim, lease_lost))
+            try:
+                if mode == "report":
+                    chunks = self._guarded(
+                        amazon.iter_listing_chunks(seller_id, batch_size or product_sync_service.batch_size),
+                        lease_lost
+                    )
+                    result = await product_sync_service.sync_product_chunks(
+                        user_id, chunks, batch_size, remove_missing=settings.PRODUCT_SYNC_REMOVE_MISSING
+                    )
+                else:
+                    products = await amazon.get_products(seller_id)
+                    if lease_lost.is_set():
+                        raise RuntimeError("Senkron lease'i kaybedildi")
+                    result = await product_sync_service.sync_products(
+                        user_id, products, batch_size, remove_missing=settings.PRODUCT_SYNC_REMOVE_MISSING
+                    )
+            except BaseException as e:
+                heartbeat.cancel()
+                await self._finish(user_id, claim, started_at, started, trigger, "failed", error=str(e) or type(e).__name__)
+                raise
+            heartbeat.cancel()
+            await self._finish(user_id, claim, started_at, started, trigger, "succeeded", result=result)
+            await self._after_sync(user_id, result)
+            return result
+
+    async def _heartbeat(self, user_id, claim: str, lease_lost: asyncio.Event):
+        """Senkron sürdükçe lease'i uzat; rapor beklemesi lease'ten uzun sürebilir"""
+        db = get_database()
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                result = await db.sync_jobs.update_one(
+                    {"user_id": user_id, "claim": claim},
+                    {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease)}}
+                )
+            except Exception as e:
+                print(f"Catalog sync heartbeat error for user {user_id}: {e}")
+                continue
+            if result.matched_count == 0:
+                print(f"Catalog sync lease lost for user {user_id}")
+                lease_lost.set()
+                return
+
+    async def _guarded(self, chunks, lease_lost: asyncio.Event):
+        """Lease başka bir sürece geçtiyse paketler arasında senkronu durdur"""
+        async for chunk in chunks:
+            if lease_lost.is_set():
+                raise RuntimeError("Senkron lease'i kaybedildi")
+            yield chunk
+
+    async def _after_sync(self, user_id, result: Dict):
+        """Senkron sonrası türetilmiş verileri değişiklik kümesiyle güncelle"""
+        try:
+            await product_search_service.apply_changes(user_id, result["changes"])
+        except Exception as e:
+            print(f"Search index update error for user {user_id}: {e}")
+
+        changed = result["changes"]["new"] + result["changes"]["updated"]
+        if not changed:
+            return
+        try:
+            scan = await price_history_service.scan_deals(
+                user_id, settings.DEAL_DROP_THRESHOLD, settings.DEAL_WINDOW_DAYS, asins=changed
+            )
+            await price_history_service.record_deals(user_id, scan["deals"])
+            result["deals"] = [deal["asin"] for deal in scan["deals"]]
+        except Exception as e:
+            print(f"Deal scan error for user {user_id}: {e}")
+
+    async def _claim(self, user_id, trigger: str) -> Tuple[datetime, str]:
+        """Süreçler arası lease al; başka bir süreç çalışıyorsa SyncAlreadyRunning"""
+        db = get_database()
+        now = datetime.utcnow()
+        claim = str(ObjectId())
+        try:
+            await db.sync_jobs.find_one_and_update(
+                {"user_id": user_id, "$or": [{"status": {"$ne": "running"}}, {"lease_until": {"$lt": now}}]},
+                {"$set": {
+                    "status": "running",
+                    "trigger": trigger,
+                    "owner": self.owner,
+                    "claim": claim,
+                    "started_at": now,
+                    "lease_until": now + timedelta(seconds=self.lease)
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            raise SyncAlreadyRunning()
+        return now, claim
+
+    async def _finish(self, user_id, claim: str, started_at: datetime, started: float, trigger: str,
+                      status: str, result: Dict = None, error: str = None):
+        db = get_database()
+        finished_at = datetime.utcnow()
+        duration_ms = int((time.monotonic() - started) * 1000)
+        counts = {k: result[k] for k in ("inserted", "modified", "unchanged", "removed")} if result else None
+        run = {
+            "status": status,
+            "trigger": trigger,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "duration_ms": duration_ms,
+            "result": counts,
+            "error": error
+        }
+        await db.sync_jobs.update_one(
+            {"user_id": user_id, "claim": claim},
+            {
+                "$set": {**run, "lease_until": None},
+                "$push": {"history": {"$each": [run], "$slice": -SYNC_HISTORY_LENGTH}}
+            }
+        )
+
+catalog_sync_scheduler = CatalogSyncScheduler(
+    interval=settings.CATALOG_SYNC_INTERVAL_SECONDS,
+    jitter=settings.CATALOG_SYNC_JITTER_SECONDS,
+    max_workers=settings.CATALOG_SYNC_MAX_WORKERS,
+    lease=settings.CATALOG_SYNC_LEASE_SECONDS,
+    tick=settings.CATALOG_SYNC_TICK_SECONDS,
+    mode=settings.CATALOG_SYNC_MODE
+)
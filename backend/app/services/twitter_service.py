@@ -1,12 +1,19 @@
+import aiohttp
 import tweepy
+from tweepy.asynchronous import AsyncClient
 from app.core.config import settings
-from typing import Dict, Optional
+from app.services.media_pipeline import media_pipeline
+from typing import Dict, List, Optional, Tuple
 import asyncio
+import functools
+import hashlib
 
 class TwitterService:
     def __init__(self):
         self.api_v1 = None
         self.api_v2 = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(settings.TWITTER_MAX_CONCURRENCY)
         self.setup_apis()
 
     def setup_apis(self):
@@ -21,8 +28,8 @@ class TwitterService:
             )
             self.api_v1 = tweepy.API(auth)
 
-            # API v2 for tweets
-            self.api_v2 = tweepy.Client(
+            # API v2 for tweets; event loop'u bloklamayan async istemci
+            self.api_v2 = AsyncClient(
                 consumer_key=settings.TWITTER_CONSUMER_KEY,
                 consumer_secret=settings.TWITTER_CONSUMER_SECRET,
                 access_token=settings.TWITTER_ACCESS_TOKEN,
@@ -32,6 +39,68 @@ class TwitterService:
         except Exception as e:
             print(f"Twitter API setup error: {e}")
 
+    def _client(self) -> AsyncClient:
+        """Paylaşılan keep-alive oturumunu ilk kullanımda (çalışan event loop içinde) bağla"""
+        if self.session is None or self.session.closed:
+            # tweepy oturum verilmezse her istekte yeni bağlantı açar
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=settings.TWITTER_MAX_CONNECTIONS,
+                    keepalive_timeout=settings.TWITTER_KEEPALIVE_SECONDS,
+                    enable_cleanup_closed=True
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.TWITTER_TIMEOUT_SECONDS,
+                    connect=settings.TWITTER_CONNECT_TIMEOUT_SECONDS
+                )
+            )
+            self.api_v2.session = self.session
+        return self.api_v2
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    def _rate_limit_info(self, error: Exception) -> Dict:
+        """429 yanıtından limitin sıfırlanacağı zamanı (epoch saniye) çıkar"""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        reset = headers.get("x-rate-limit-reset")
+        return {
+            "rate_limited": True,
+            "rate_limit_reset": int(reset) if reset and str(reset).isdigit() else None,
+            "rate_limit_remaining": headers.get("x-rate-limit-remaining")
+        }
+
+    def account_key(self) -> str:
+        # media_id'ler yükleyen hesaba aittir
+        return hashlib.sha256(settings.TWITTER_ACCESS_TOKEN.encode("utf-8")).hexdigest()[:16]
+
+    async def _upload_media(self, entry: Dict) -> Tuple[str, Optional[int]]:
+        """İşlenmiş dosyayı v1.1 media/upload ile yükle (tweepy.API bloklayıcıdır)"""
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            media = await loop.run_in_executor(
+                None, functools.partial(self.api_v1.media_upload, filename=entry["path"])
+            )
+        return media.media_id_string, getattr(media, "expires_after_secs", None)
+
+    async def upload_images(self, image_urls: List[str]) -> List[str]:
+        """Resimleri hazırla ve yükle; geçerli media_id'ler yeniden kullanılır"""
+        entries = await media_pipeline.prepare_many(image_urls, "twitter")
+        account = self.account_key()
+        results = await asyncio.gather(
+            *(media_pipeline.media_id_for("twitter", account, entry, self._upload_media) for entry in entries),
+            return_exceptions=True
+        )
+        media_ids = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Image upload error: {result}")
+            else:
+                media_ids.append(result)
+        return media_ids
+
     async def post_tweet(self, content: str, image_urls: list = None) -> Optional[Dict]:
         """Tweet gönder"""
         try:
@@ -39,20 +108,15 @@ class TwitterService:
             
             # Resim varsa yükle
             if image_urls and self.api_v1:
-                for image_url in image_urls[:4]:  # Twitter max 4 resim
-                    try:
-                        # Gerçek implementasyonda image_url'den resmi indirip yüklemek gerekir
-                        # Şimdilik simulated response
-                        pass
-                    except Exception as e:
-                        print(f"Image upload error: {e}")
+                media_ids = await self.upload_images(image_urls[:4])  # Twitter max 4 resim
             
             # Tweet gönder
             if self.api_v2:
-                response = self.api_v2.create_tweet(
-                    text=content,
-                    media_ids=media_ids if media_ids else None
-                )
+                async with self._semaphore:
+                    response = await self._client().create_tweet(
+                        text=content,
+                        media_ids=media_ids if media_ids else None
+                    )
                 
                 return {
                     "success": True,
@@ -67,6 +131,13 @@ class TwitterService:
                     "tweet_url": "https://twitter.com/user/status/simulated_tweet_id_123"
                 }
                 
+        except tweepy.TooManyRequests as e:
+            print(f"Tweet posting rate limited: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                **self._rate_limit_info(e)
+            }
         except Exception as e:
             print(f"Tweet posting error: {e}")
             return {
@@ -78,10 +149,11 @@ class TwitterService:
         """Tweet analitik verilerini çek"""
         try:
             if self.api_v2:
-                tweet = self.api_v2.get_tweet(
-                    tweet_id,
-                    tweet_fields=['public_metrics', 'created_at']
-                )
+                async with self._semaphore:
+                    tweet = await self._client().get_tweet(
+                        tweet_id,
+                        tweet_fields=['public_metrics', 'created_at']
+                    )
                 
                 if tweet.data:
                     metrics = tweet.data.public_metrics
@@ -110,25 +182,43 @@ class TwitterService:
             print(f"Twitter analytics error: {e}")
             return None
 
-    async def schedule_tweet(self, content: str, schedule_time: str) -> Dict:
-        """Tweet zamanlama (Pro özellik)"""
-        # Twitter API'da doğrudan zamanlama özelliği yok
-        # Bu özellik için üçüncü parti servis veya kendi zamanlama sistemimiz gerekir
-        
-        return {
-            "success": False,
-            "message": "Tweet zamanlama özelliği henüz desteklenmiyor"
-        }
+    async def get_tweets_metrics(self, tweet_ids: List[str]) -> Dict:
+        """En fazla 100 tweet'in public_metrics değerlerini tek istekte çek"""
+        try:
+            async with self._semaphore:
+                response = await self._client().get_tweets(
+                    ids=tweet_ids[:100],
+                    tweet_fields=['public_metrics']
+                )
+            # Silinmiş veya korumalı tweet'ler yanıtta yer almaz, errors içinde döner
+            return {
+                "success": True,
+                "metrics": {str(tweet.id): tweet.public_metrics for tweet in (response.data or [])}
+            }
+        except tweepy.TooManyRequests as e:
+            print(f"Tweet metrics rate limited: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                **self._rate_limit_info(e)
+            }
+        except Exception as e:
+            print(f"Tweet metrics error: {e}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
 
-    def validate_credentials(self) -> bool:
+    async def validate_credentials(self) -> bool:
         """Twitter API kimlik bilgilerini doğrula"""
         try:
             if self.api_v2:
-                user = self.api_v2.get_me()
+                async with self._semaphore:
+                    user = await self._client().get_me()
                 return user.data is not None
             return False
         except Exception as e:
             print(f"Twitter credential validation error: {e}")
             return False
 
-twitter_service = TwitterService()
\ No newline at end of file
+twitter_service = TwitterService()
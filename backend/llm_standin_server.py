@@ -0,0 +1,181 @@
+"""Yük ve dayanıklılık testleri için OpenAI uyumlu yerel stand-in sunucusu.
+
+Ağ erişimi ve API maliyeti olmadan üretim yollarını ölçmek için
+`/v1/chat/completions` uç noktasını (n ve stream dahil) taklit eder.
+Gecikme, jitter, token başına akış gecikmesi ve hata oranı ayarlanabilir.
+
+Çalıştırma:
+    python llm_standin_server.py --port 8100 --latency-ms 400 --error-rate 0.05
+
+Backend'i sunucuya yönlendirmek için:
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=standin
+
+Ayarlar çalışırken `PUT /_config` ile değiştirilebilir.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+import uvicorn
+
+STANDIN_CONFIG = {
+    "latency_ms": float(os.getenv("LLM_STANDIN_LATENCY_MS", "300")),
+    "jitter_ms": float(os.getenv("LLM_STANDIN_JITTER_MS", "100")),
+    "token_delay_ms": float(os.getenv("LLM_STANDIN_TOKEN_DELAY_MS", "15")),
+    "error_rate": float(os.getenv("LLM_STANDIN_ERROR_RATE", "0")),
+    "rate_limit_share": float(os.getenv("LLM_STANDIN_RATE_LIMIT_SHARE", "0.5")),  # hataların 429 olan kısmı
+}
+
+STATS = {"requests": 0, "errors": 0, "streams": 0, "completion_tokens": 0}
+
+OPENINGS = ["🔥 Kaçırma!", "✨ Yeni keşif:", "🛍️ Fırsat:", "⚡ Şimdi Amazon'da:"]
+CLOSINGS = ["Hemen incele!", "Stoklar sınırlı, acele et!", "Bağlantı profilde!", "Sepete ekle!"]
+
+app = FastAPI(title="LLM stand-in")
+
+def _product_title(messages: List[Dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") != "user":
+            continue
+        for line in str(message.get("content", "")).splitlines():
+            if line.strip().startswith("Ürün Adı:") or line.strip().startswith("- Başlık:"):
+                return line.split(":", 1)[1].strip()
+    return "Bu ürün"
+
+def _completion_text(messages: List[Dict], index: int, max_tokens: int) -> str:
+    title = _product_title(messages)
+    text = (
+        f"{OPENINGS[(index + random.randrange(4)) % 4]} {title} Amazon'da seni bekliyor. "
+        f"{CLOSINGS[(index + random.randrange(4)) % 4]} #Amazon #İndirim #Fırsat"
+    )
+    # Kelime ≈ token; max_tokens'a göre kırp
+    words = text.split(" ")
+    return " ".join(words[:max(1, max_tokens)])
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text.split()))
+
+async def _simulated_latency():
+    delay = STANDIN_CONFIG["latency_ms"] + random.uniform(0, STANDIN_CONFIG["jitter_ms"])
+    await asyncio.sleep(delay / 1000)
+
+def _simulated_error():
+    if random.random() >= STANDIN_CONFIG["error_rate"]:
+        return None
+    STATS["errors"] += 1
+    if random.random() < STANDIN_CONFIG["rate_limit_share"]:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached (stand-in)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+            headers={"retry-after": "1"}
+        )
+    return JSONResponse(
+        status_code=500,
+        content={"error": {"message": "Internal error (stand-in)", "type": "server_error", "code": None}}
+    )
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "standin", "object": "model", "owned_by": "standin"}]}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    STATS["requests"] += 1
+    messages = body.get("messages", [])
+    model = body.get("model", "standin")
+    n = int(body.get("n") or 1)
+    max_tokens = int(body.get("max_tokens") or 256)
+    prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    await _simulated_latency()
+    error = _simulated_error()
+    if error is not None:
+        return error
+
+    texts = [_completion_text(messages, i, max_tokens) for i in range(n)]
+
+    if body.get("stream"):
+        STATS["streams"] += 1
+
+        def chunk(delta: Dict, finish_reason=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            words = texts[0].split(" ")
+            for i, word in enumerate(words):
+                await asyncio.sleep(STANDIN_CONFIG["token_delay_ms"] / 1000)
+                yield chunk({"content": word if i == 0 else " " + word})
+            STATS["completion_tokens"] += len(words)
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    completion_tokens = sum(_count_tokens(text) for text in texts)
+    # Akışsız yanıt, tüm token'ların üretim süresini bir kerede bekler
+    await asyncio.sleep(STANDIN_CONFIG["token_delay_ms"] * (completion_tokens / n) / 1000)
+    STATS["completion_tokens"] += completion_tokens
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [
+            {"index": i, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+            for i, text in enumerate(texts)
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+@app.get("/_config")
+async def get_config():
+    return {"config": STANDIN_CONFIG, "stats": STATS}
+
+@app.put("/_config")
+async def update_config(request: Request):
+    """Gecikme ve hata oranını çalışırken değiştir"""
+    updates = await request.json()
+    for key, value in updates.items():
+        if key in STANDIN_CONFIG:
+            STANDIN_CONFIG[key] = float(value)
+    return {"config": STANDIN_CONFIG}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI uyumlu yerel stand-in sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=STANDIN_CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=STANDIN_CONFIG["jitter_ms"])
+    parser.add_argument("--token-delay-ms", type=float, default=STANDIN_CONFIG["token_delay_ms"])
+    parser.add_argument("--error-rate", type=float, default=STANDIN_CONFIG["error_rate"])
+    parser.add_argument("--rate-limit-share", type=float, default=STANDIN_CONFIG["rate_limit_share"])
+    args = parser.parse_args()
+    STANDIN_CONFIG.update({
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "token_delay_ms": args.token_delay_ms,
+        "error_rate": args.error_rate,
+        "rate_limit_share": args.rate_limit_share
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -3,6 +3,17 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.routes import api_router
+from app.core.database import connect_to_mongo, close_mongo_connection
+from app.services.sync_scheduler import catalog_sync_scheduler
+from app.services.ai_service import ai_content_service
+from app.services.generation_jobs import generation_job_runner
+from app.services.hashtag_index import hashtag_index
+from app.services.duplicate_index import duplicate_index
+from app.services.twitter_service import twitter_service
+from app.services.media_pipeline import media_pipeline
+from app.services.publish_queue import publish_queue
+from app.services.post_scheduler import post_scheduler
+from app.services.metrics_collector import tweet_metrics_collector
 
 app = FastAPI(
     title="Amazon Dealer Social Media Integration",
@@ -19,6 +30,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_event():
+    await connect_to_mongo()
+    if settings.CATALOG_SYNC_ENABLED:
+        catalog_sync_scheduler.start()
+    if settings.GENERATION_JOBS_ENABLED:
+        generation_job_runner.start()
+    if settings.HASHTAG_INDEX_ENABLED:
+        hashtag_index.start()
+    if settings.DUPLICATE_INDEX_ENABLED:
+        duplicate_index.start()
+    if settings.PUBLISH_QUEUE_ENABLED:
+        publish_queue.start()
+    if settings.SCHEDULER_ENABLED:
+        post_scheduler.start()
+    if settings.METRICS_COLLECTOR_ENABLED:
+        tweet_metrics_collector.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await catalog_sync_scheduler.stop()
+    await generation_job_runner.stop()
+    await hashtag_index.stop()
+    await duplicate_index.stop()
+    await tweet_metrics_collector.stop()
+    await post_scheduler.stop()
+    await publish_queue.stop()
+    await ai_content_service.close()
+    await twitter_service.close()
+    await media_pipeline.close()
+    await close_mongo_connection()
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
@@ -42,6 +42,7 @@ from datetime import datetime
   "image_urls": ["url1", "url2"],
   "category": "Electronics",
   "brand": "Brand Name",
+  "content_digest": "sha1 of normalized fields",
   "last_updated": datetime
 }
 """
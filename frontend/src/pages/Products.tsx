@@ -21,9 +21,10 @@ const Products = () => {
   const { data: products, isLoading, refetch } = useQuery<Product[]>(
     'products',
     async () => {
-      const response = await fetch('/api/products/')
+      const response = await fetch('/api/products/?limit=100')
       if (!response.ok) throw new Error('Ürünler yüklenemedi')
-      return response.json()
+      const page = await response.json()
+      return page.items
     }
   )
 